@@ -12,6 +12,13 @@ sjg276
 from consts import *
 from game2d import *
 from wave import *
+from replay import *
+from labels import *
+from profiler import *
+from spectate import *
+from leaderboard import *
+import sys
+import time
 
 
 # PRIMARY RULE: Invaders can only access attributes in wave.py via getters/setters
@@ -60,7 +67,8 @@ class Invaders(GameApp):
     #
     # Attribute _wave: the subcontroller for a single wave, managing aliens
     # Invariant: _wave is a Wave object, or None if there is no wave currently
-    # active. It is only None if _state is STATE_INACTIVE.
+    # active. It is only None if _state is STATE_INACTIVE. If RECORD_PATH is
+    # not None, the Wave is wrapped in a Recorder.
     #
     # Attribute _text: the currently active message
     # Invariant: _text is a GLabel object, or None if there is no message to
@@ -73,13 +81,52 @@ class Invaders(GameApp):
     # Invariant: _last is an int >= 0
     #
     # Attribute: _scoretext: the score of the current game
-    # Invariant: _scoretext is a GLabel object
+    # Invariant: _scoretext is a GLabel object, or None if no score was shown yet
     #
     # Attribute: _pausetext: the text shown during a pause
     # Invariant: _pausetext is a GLabel object
     #
     # Attribute: _endtext: the text shown at the end of a game
-    # Invariant: _endtext is a GLabel object
+    # Invariant: _endtext is a GLabel object, or None if the game is not over
+    #
+    # Attribute: _labels: the labels made so far, for reuse
+    # Invariant: _labels is a LabelCache object
+    #
+    # Attribute: _shownScore: the score _scoretext shows
+    # Invariant: _shownScore is an int, or None if no score was shown yet
+    #
+    # Attribute: _shownState: the state _endtext was chosen for
+    # Invariant: _shownState is one of the STATE constants, or None
+    #
+    # Attribute: _accum: the time that has passed but not been simulated yet
+    # Invariant: _accum is a float >= 0 and < FIXED_STEP between frames
+    #
+    # Attribute: _profiler: the profiler recording the frame times of each wave
+    # Invariant: _profiler is a FrameProfiler object, or None if PROFILE_PATH
+    # is None and PROFILE_OVERLAY is False
+    #
+    # Attribute: _overlaytext: the frame times shown on screen
+    # Invariant: _overlaytext is a GLabel object, or None if there is no overlay
+    #
+    # Attribute: _overlayFrame: the frame count of the profiler when
+    # _overlaytext was made
+    # Invariant: _overlayFrame is an int >= 0
+    #
+    # Attribute: _config: the size and speed of every wave, from the command
+    # line (see parseConfig in config.py)
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute: _spectators: the server streaming every wave to spectators
+    # Invariant: _spectators is a started SpectatorServer object, or None if
+    # SPECTATE_PORT is None
+    #
+    # Attribute: _leaderboard: the leaderboard the result of every wave is
+    # added to
+    # Invariant: _leaderboard is a Leaderboard object, or None if
+    # LEADERBOARD_PATH is None
+    #
+    # Attribute: _frames: the number of updates of the current wave
+    # Invariant: _frames is an int >= 0
 
     def start(self):
         """
@@ -97,11 +144,30 @@ class Invaders(GameApp):
         """
         self._last = 0
         self._state = STATE_INACTIVE
+        self._labels = LabelCache()
+        self._scoretext = None
+        self._shownScore = None
+        self._endtext = None
+        self._shownState = None
+        self._accum = 0.0
+        self._profiler = None
+        self._overlaytext = None
+        self._overlayFrame = 0
+        self._config = parseConfig(sys.argv)
+        self._spectators = None
+        if SPECTATE_PORT is not None:
+            self._spectators = SpectatorServer(port=SPECTATE_PORT)
+            self._spectators.start()
+        self._leaderboard = None
+        if LEADERBOARD_PATH is not None:
+            self._leaderboard = Leaderboard(LEADERBOARD_PATH)
+        self._frames = 0
+        self._pausetext = self._labels.getLabel("Press \'S\' to Resume",
+        'RetroGame.ttf',50,x=GAME_WIDTH/2,y=GAME_HEIGHT/2)
         if self._state == STATE_INACTIVE:
             self._wave = None
-            self._text = GLabel(text="Press \'S\' to Play",
-            font_size=48,font_name = 'RetroGame.ttf',
-             x=GAME_WIDTH/2, y=GAME_HEIGHT/2)
+            self._text = self._labels.getLabel("Press \'S\' to Play",
+            'RetroGame.ttf',48,x=GAME_WIDTH/2,y=GAME_HEIGHT/2)
 
         else:
             self._text = None
@@ -131,9 +197,10 @@ class Invaders(GameApp):
 
         STATE_NEWWAVE: This is the state creates a new wave and shows it on
         the screen. The application switches to this state if the state was
-        STATE_INACTIVE in the previous frame, and the player pressed a key.
-        This state only lasts one animation frame before switching to
-        STATE_ACTIVE.
+        STATE_INACTIVE or STATE_COMPLETE in the previous frame, and the player
+        pressed a key. After the first wave, the wave is reset in place (see
+        Wave.reset) instead of made again. This state only lasts one animation
+        frame before switching to STATE_ACTIVE.
 
         STATE_ACTIVE: This is a session of normal gameplay.  The player can
         move the ship and fire laser bolts.  All of this should be handled
@@ -149,7 +216,13 @@ class Invaders(GameApp):
         in the previous frame, and the player pressed a key. This state only
         lasts one animation frame before switching to STATE_ACTIVE.
 
-        STATE_COMPLETE: The wave is over, and is either won or lost.
+        STATE_COMPLETE: The wave is over, and is either won or lost. Pressing
+        a key starts a new wave.
+
+        The wave is always updated in steps of FIXED_STEP seconds, whatever dt
+        is. The time not yet simulated is kept in _accum, and each frame takes
+        as many steps as fit in it, up to MAX_CATCHUP. This way the game plays
+        the same at any frame rate, and a slow frame cannot change it.
 
         You are allowed to add more states if you wish. Should you do so, you should
         describe them here.
@@ -161,13 +234,42 @@ class Invaders(GameApp):
 
         self._determineState()
         if self._state == STATE_NEWWAVE:
-            self._wave = Wave()
+            self._accum = 0.0
+            self._frames = 0
+            if self._wave is not None:
+                self._wave.reset()
+            else:
+                self._wave = Wave(config=self._config)
+                if self._spectators is not None:
+                    self._wave.setFeed(SpectatorFeed(self._spectators))
+                if RECORD_PATH is not None:
+                    self._wave = Recorder(self._wave)
+            if PROFILE_PATH is not None or PROFILE_OVERLAY:
+                self._profiler = FrameProfiler()
+                self._wave.setProfiler(self._profiler)
         elif self._state == STATE_ACTIVE:
-            self._wave.update(self.input,dt)
-            if self._wave.getGameDone():
-                self._state = STATE_COMPLETE
-            elif self._wave.getIsPaused():
-                self._state = STATE_PAUSED
+            self._accum += dt
+            steps = 0
+            while (self._state == STATE_ACTIVE and self._accum >= FIXED_STEP and
+            steps < MAX_CATCHUP):
+                self._wave.update(self.input,FIXED_STEP)
+                self._accum -= FIXED_STEP
+                self._frames += 1
+                steps += 1
+                if self._wave.getGameDone():
+                    self._state = STATE_COMPLETE
+                    if self._leaderboard is not None:
+                        self._leaderboard.add(self._wave,self._frames)
+                    if RECORD_PATH is not None:
+                        self._wave.getRecording().save(RECORD_PATH)
+                    if PROFILE_PATH is not None:
+                        self._profiler.save(PROFILE_PATH)
+                elif self._wave.getIsPaused():
+                    self._state = STATE_PAUSED
+            if self._state != STATE_ACTIVE:
+                self._accum = 0.0
+            elif self._accum >= FIXED_STEP:
+                self._accum %= FIXED_STEP
         elif self._state == STATE_CONTINUE:
             self._wave.createShip()
             self._state = STATE_ACTIVE
@@ -185,6 +287,25 @@ class Invaders(GameApp):
         getters for these attributes or you need to add a draw method to
         class Wave.  We suggest the latter.  See the example subcontroller.py
         from class.
+
+        The labels are only looked up again when the score or the state has
+        changed since the last frame, so drawing them costs almost nothing.
+
+        If the wave is being profiled, the time this takes is recorded too,
+        and the overlay is drawn on top if PROFILE_OVERLAY is True.
+        """
+        if self._profiler is None:
+            self._drawState()
+            return
+        start = time.perf_counter()
+        self._drawState()
+        self._profiler.recordDraw(start,time.perf_counter())
+        if PROFILE_OVERLAY:
+            self._overlayLabel()
+
+    def _drawState(self):
+        """
+        Draws the game objects and messages for the current state.
         """
         if self._state == STATE_INACTIVE:
             self._text.draw(self.view)
@@ -193,26 +314,18 @@ class Invaders(GameApp):
             self._wave.draw(self.view)
         elif self._state == STATE_ACTIVE:
             self._scoreLabel()
-            self._wave.draw(self.view)
+            self._wave.draw(self.view,self._accum/FIXED_STEP)
         elif self._state == STATE_PAUSED:
-            self._pausetext = GLabel(text="Press \'S\' to Resume",
-                        font_size=50,font_name = 'RetroGame.ttf',
-                         x=GAME_WIDTH/2, y=GAME_HEIGHT/2)
             self._scoreLabel()
             self._wave.draw(self.view)
             self._pausetext.draw(self.view)
         elif self._state == STATE_COMPLETE:
             self._scoreLabel()
-            if self._wave.getGameWon() == True:
-                self._endtext = GLabel(text="Congragulations! You Won!",
-                            font_size=60,font_name = 'Arcade.ttf',
-                             x=GAME_WIDTH/2, y=GAME_HEIGHT/2)
-                self._endtext.draw(self.view)
-            elif self._wave.getGameWon() == False:
-                self._endtext = GLabel(text="Oh no you lost! :()",
-                            font_size=40,font_name = 'Arcade.ttf',
-                             x=GAME_WIDTH/2, y=GAME_HEIGHT/2)
+            if self._shownState != STATE_COMPLETE:
+                self._endLabel()
+            if self._endtext is not None:
                 self._endtext.draw(self.view)
+        self._shownState = self._state
 
     def _determineState(self):
         """
@@ -236,6 +349,9 @@ class Invaders(GameApp):
             self._state = STATE_NEWWAVE
             # State changed; reset factor
             self._text = None
+        elif change and self._state == STATE_COMPLETE:
+            self._state = STATE_NEWWAVE
+            self._endtext = None
         elif change and self._state == STATE_PAUSED:
             self._wave.setIsPaused(False)
             self._state = STATE_CONTINUE
@@ -244,20 +360,50 @@ class Invaders(GameApp):
 
     def _scoreLabel(self):
         """
-        Creates a _scoretext attribute to display the score and draws it on the
-        screen.
+        Draws the score on the screen.
+
+        The label in _scoretext is only replaced when the score has changed
+        since it was last drawn.
+        """
+        score = self._wave.getScore()
+        if score != self._shownScore:
+            if score > 500:
+                color = 'green'
+            elif score > 100:
+                color = 'red'
+            else:
+                color = None
+            self._scoretext = self._labels.getLabel("Score: "+str(score),
+            'Arcade.ttf',40,color,x=GAME_WIDTH/8,y=(15*GAME_HEIGHT)/16)
+            self._shownScore = score
+        self._scoretext.draw(self.view)
+
+    def _overlayLabel(self):
         """
-        if self._wave.getScore() > 500:
-            self._scoretext = GLabel(text="Score: "+str(self._wave.getScore()),
-                        font_size=40,font_name = 'Arcade.ttf',
-                         x=GAME_WIDTH/8, y=(15*GAME_HEIGHT)/16,linecolor = 'green')
-        elif self._wave.getScore() > 100:
-            self._scoretext = GLabel(text="Score: "+str(self._wave.getScore()),
-                        font_size=40,font_name = 'Arcade.ttf',
-                         x=GAME_WIDTH/8, y=(15*GAME_HEIGHT)/16,linecolor = 'red')
+        Draws the frame times of the profiler in the corner of the screen.
 
+        The text only changes every OVERLAY_FRAMES frames, so that it can be
+        read and is not laid out again every frame.
+        """
+        frames = self._profiler.getFrameCount()
+        if self._overlaytext is None or frames-self._overlayFrame >= OVERLAY_FRAMES:
+            self._overlayFrame = frames
+            self._overlaytext = GLabel(text=self._profiler.getOverlayText(),
+            font_size=14,font_name='RetroGame.ttf',
+            x=(3*GAME_WIDTH)/4,y=(7*GAME_HEIGHT)/8)
+        self._overlaytext.draw(self.view)
+
+    def _endLabel(self):
+        """
+        Chooses the message in _endtext for the end of the game.
+
+        _endtext is None if the game is somehow over without being won or lost.
+        """
+        if self._wave.getGameWon() == True:
+            self._endtext = self._labels.getLabel("Congragulations! You Won!",
+            'Arcade.ttf',60,x=GAME_WIDTH/2,y=GAME_HEIGHT/2)
+        elif self._wave.getGameWon() == False:
+            self._endtext = self._labels.getLabel("Oh no you lost! :()",
+            'Arcade.ttf',40,x=GAME_WIDTH/2,y=GAME_HEIGHT/2)
         else:
-            self._scoretext = GLabel(text="Score: "+str(self._wave.getScore()),
-                        font_size=40,font_name = 'Arcade.ttf',
-                         x=GAME_WIDTH/8, y=(15*GAME_HEIGHT)/16)
-        self._scoretext.draw(self.view)
+            self._endtext = None
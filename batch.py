@@ -0,0 +1,191 @@
+"""
+Sprite batch module for Alien Invaders
+
+Every GImage and GRectangle is its own canvas instruction, so drawing a wave
+one model at a time costs one draw submission per alien and per bolt. This
+module contains the class SpriteBatch, which draws many sprites of the same
+size and image as a single Kivy Mesh.
+
+A batch keeps one vertex buffer with four corners for each sprite. The
+texture coordinates and the triangle indices are only written when the batch
+has to grow, so each frame only the corner positions change. Wave keeps one
+batch for each alien image and one for the bolts, which makes the number of
+draw submissions the same for a 1x1 wave as for a 10x15 one.
+
+In a headless run there is no Kivy, so a batch only fills its vertex buffer
+and drawing it does nothing.
+
+Like the models, this module may only access consts.py and the backend.
+
+sjg276
+"""
+from consts import *
+import array
+if not HEADLESS:
+    from kivy.graphics import Color, InstructionGroup, Mesh
+    from kivy.core.image import Image as CoreImage
+    from kivy.utils import colormap
+
+
+# the number of floats for each corner of a sprite: x, y, u and v
+VERTEX_SIZE = 4
+
+# the number of floats for each sprite
+SPRITE_SIZE = 4*VERTEX_SIZE
+
+
+class SpriteBatch(object):
+    """
+    A class to draw many sprites of the same size and look in one draw call.
+
+    Each frame, call begin, then add once for every sprite, then draw. The
+    sprites are drawn in the order they were added.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _source: the image file of the sprites
+    # Invariant: _source is a string, or None for solid rectangles
+    #
+    # Attribute _width: the width of every sprite
+    # Invariant: _width is an int or float > 0
+    #
+    # Attribute _height: the height of every sprite
+    # Invariant: _height is an int or float > 0
+    #
+    # Attribute _color: the color of the sprites
+    # Invariant: _color is a color name string
+    #
+    # Attribute _vertices: the x, y, u and v of every corner of every sprite
+    # Invariant: _vertices is an array of floats whose length is a multiple of
+    # SPRITE_SIZE
+    #
+    # Attribute _indices: the corners of the two triangles of every sprite
+    # Invariant: _indices is a list of ints, 6 for every sprite in _vertices
+    #
+    # Attribute _count: the number of sprites added since begin
+    # Invariant: _count is an int between 0 and len(_vertices)//SPRITE_SIZE
+    #
+    # Attribute _drawn: the number of sprites the mesh drew last time
+    # Invariant: _drawn is an int >= 0
+    #
+    # Attribute _mesh: the mesh holding the sprites
+    # Invariant: _mesh is a Kivy Mesh, or None in a headless run
+    #
+    # Attribute _group: the instructions to draw the mesh in its color
+    # Invariant: _group is a Kivy InstructionGroup, or None in a headless run
+
+    def getCount(self):
+        """
+        Returns the number of sprites added since begin
+        """
+        return self._count
+
+    def getVertices(self):
+        """
+        Returns the x, y, u and v of every corner of the sprites added since
+        begin, as a memoryview of floats
+        """
+        return memoryview(self._vertices)[:self._count*SPRITE_SIZE]
+
+    def __init__(self,source,width,height,color='white'):
+        """
+        Initializes an empty batch.
+
+        Parameter source: the image file of the sprites
+        Precondition: source is a string, or None for solid rectangles
+
+        Parameter width: the width of every sprite
+        Precondition: width is an int or float > 0
+
+        Parameter height: the height of every sprite
+        Precondition: height is an int or float > 0
+
+        Parameter color: the color of the sprites, which tints an image
+        Precondition: color is a color name string
+        """
+        assert source is None or type(source) == str,repr(source)+\
+        ' is not a valid image'
+        assert type(width) in [int,float] and width > 0,repr(width)+\
+        ' is not a valid width'
+        assert type(height) in [int,float] and height > 0,repr(height)+\
+        ' is not a valid height'
+        self._source = source
+        self._width = width
+        self._height = height
+        self._color = color
+        self._vertices = array.array('f')
+        self._indices = []
+        self._count = 0
+        self._drawn = 0
+        self._mesh = None
+        self._group = None
+        if not HEADLESS:
+            texture = None if source is None else CoreImage(source).texture
+            self._mesh = Mesh(mode='triangles',texture=texture)
+            self._group = InstructionGroup()
+            self._group.add(Color(*colormap[color]))
+            self._group.add(self._mesh)
+
+    def begin(self):
+        """
+        Empties the batch so the sprites of a new frame can be added
+        """
+        self._count = 0
+
+    def add(self,x,y):
+        """
+        Adds a sprite centered at (x,y).
+
+        Parameter x: the horizontal coordinate of the sprite center
+        Precondition: x is an int or float
+
+        Parameter y: the vertical coordinate of the sprite center
+        Precondition: y is an int or float
+        """
+        pos = self._count*SPRITE_SIZE
+        if pos == len(self._vertices):
+            self._grow()
+        left = x-self._width/2
+        right = x+self._width/2
+        bottom = y-self._height/2
+        top = y+self._height/2
+        vertices = self._vertices
+        vertices[pos] = left
+        vertices[pos+1] = bottom
+        vertices[pos+4] = right
+        vertices[pos+5] = bottom
+        vertices[pos+8] = right
+        vertices[pos+9] = top
+        vertices[pos+12] = left
+        vertices[pos+13] = top
+        self._count += 1
+
+    def draw(self,view):
+        """
+        Draws every sprite added since begin as a single mesh.
+
+        Parameter view: the game view, used in drawing
+        Precondition: view is an instance of GView
+        """
+        if self._mesh is None or self._count == 0:
+            return
+        self._mesh.vertices = self._vertices
+        if self._count != self._drawn:
+            self._mesh.indices = self._indices[:6*self._count]
+            self._drawn = self._count
+        view.draw(self._group)
+
+    def _grow(self):
+        """
+        Doubles the room for sprites, writing the texture coordinates and the
+        indices of the new sprites.
+        """
+        start = len(self._vertices)//SPRITE_SIZE
+        if self._mesh is not None and self._mesh.texture is not None:
+            coords = self._mesh.texture.tex_coords
+        else:
+            coords = (0,0,1,0,1,1,0,1)
+        for sprite in range(start,max(2*start,1)):
+            for corner in range(4):
+                self._vertices.extend((0,0,coords[2*corner],coords[2*corner+1]))
+            first = 4*sprite
+            self._indices.extend((first,first+1,first+2,first+2,first+3,first))
@@ -0,0 +1,420 @@
+"""
+Benchmark module for Alien Invaders
+
+This module measures how the cost of a frame grows with the size and speed
+of the wave. Each benchmark runs headless and times every call on its own, so
+the results include percentiles and not only an average:
+
+    construct   Wave.__init__, which builds every alien
+    reset       Wave.reset, from a wave with only the top right alien left
+    steady      Wave.update in normal play, with the sweep policy
+    step        Wave.update when every frame is an alien step
+    bolts       Wave.update with BENCH_BOLTS alien bolts on screen
+    endwave     Wave.update with only the top right alien left
+
+The bolts and endwave benchmarks start every run from a savestate (see
+Wave.saveState) that has been edited to hold exactly that load.
+
+Every wave is given the GameConfig of its configuration, so the whole grid
+is measured in one warm Python process. Everything is seeded, so two runs of
+the same commit on the same machine play the same frames. The results are
+saved as JSON, and a saved file can be compared against a new run:
+
+    python bench.py --out=before.json
+    python bench.py --out=after.json --compare=before.json
+
+A single configuration can be measured by giving it first, as for the game
+(python bench.py 10 15 1.0), or by setting INVADERS_SWARM. Write the options
+with '=' so that their values are not mistaken for these.
+
+sjg276
+"""
+import os
+# the benchmarks measure the game logic, so they run headless unless
+# INVADERS_HEADLESS is set to 0. This has to happen before consts.py is read
+os.environ.setdefault('INVADERS_HEADLESS','1')
+from consts import *
+from wave import *
+from policies import *
+import headless
+import argparse
+import json
+import platform
+import struct
+import subprocess
+import sys
+import time
+
+# the benchmarks, in the order they are run
+SCENARIOS = ('construct','reset','steady','step','bolts','endwave')
+
+# the numbers of rows, aliens in a row and alien speeds of the default grid
+BENCH_ROWS = (1,2,5,10)
+BENCH_PER_ROW = (1,5,10,15)
+BENCH_SPEEDS = (0.25,1.0)
+
+# the number of bolts on screen in the bolts benchmark
+BENCH_BOLTS = 64
+
+# the number of frames between restarts of the bolts benchmark, before the
+# bolts have moved far
+BENCH_BOLT_FRAMES = 20
+
+# the percentiles reported for every benchmark
+BENCH_PERCENTILES = (50,90,99)
+
+
+def summarize(times):
+    """
+    Returns the statistics of a list of times, as a dictionary.
+
+    The dictionary has the number of calls, the calls per second, and the
+    mean, the percentiles in BENCH_PERCENTILES and the largest time in
+    microseconds.
+
+    Parameter times: the time in seconds of every call
+    Precondition: times is a nonempty list of floats
+    """
+    times = sorted(times)
+    total = sum(times)
+    result = {'count': len(times), 'perSecond': len(times)/total if total else 0.0,
+              'mean': 1e6*total/len(times), 'max': 1e6*times[-1]}
+    for percentile in BENCH_PERCENTILES:
+        pos = min(len(times)-1,int(len(times)*percentile/100))
+        result['p'+str(percentile)] = 1e6*times[pos]
+    return result
+
+
+def _editState(data,bolts=None,keep=None):
+    """
+    Returns a copy of a savestate with other bolts or fewer aliens.
+
+    Parameter data: the savestate to edit
+    Precondition: data is a savestate made by Wave.saveState
+
+    Parameter bolts: the bolts of the new state, as (x,y,velocity) triples
+    Precondition: bolts is a list of tuples of three floats, or None to keep
+    the bolts of data
+
+    Parameter keep: the cells whose aliens stay alive, as (row,col) pairs
+    Precondition: keep is a set of live cells of data, or None to keep them all
+    """
+    header = list(SAVE_HEADER.unpack_from(data))
+    rows,cols,boltCount,liveCount = header[2],header[3],header[19],header[20]
+    pos = SAVE_HEADER.size
+    alive = bytearray(data[pos:pos+(rows*cols+7)//8])
+    pos += len(alive)
+    cells = [(row,col) for row in range(rows) for col in range(cols)
+             if alive[(row*cols+col) >> 3] >> ((row*cols+col) & 7) & 1]
+    scores = struct.unpack_from('<%dH' % len(cells),data,pos)
+    pos += 2*len(cells)
+    live = struct.unpack_from('<%dH' % liveCount,data,pos)
+    pos += 2*liveCount
+    oldBolts = data[pos:pos+24*boltCount]
+    words = data[pos+24*boltCount:]
+
+    if keep is not None:
+        scores = [scores[index] for index in range(len(cells)) if cells[index] in keep]
+        alive = bytearray(len(alive))
+        for row,col in keep:
+            alive[(row*cols+col) >> 3] |= 1 << ((row*cols+col) & 7)
+        live = [col for col in live if any(cell[1] == col for cell in keep)]
+    if bolts is not None:
+        oldBolts = b''.join(struct.pack('<3d',*bolt) for bolt in bolts)
+        header[19] = len(bolts)
+    header[20] = len(live)
+    return b''.join((SAVE_HEADER.pack(*header),bytes(alive),
+    struct.pack('<%dH' % len(scores),*scores),
+    struct.pack('<%dH' % len(live),*live),oldBolts,words))
+
+
+def benchConstruct(frames,seed,config):
+    """
+    Returns the time in seconds of each of frames calls of Wave.__init__
+
+    Parameter frames: the number of waves to build
+    Precondition: frames is an int > 0
+
+    Parameter seed: the seed of the first wave; the others count up from it
+    Precondition: seed is an int >= 0
+
+    Parameter config: the size and speed of the waves
+    Precondition: config is a GameConfig object
+    """
+    times = []
+    clock = time.perf_counter
+    for pos in range(frames):
+        start = clock()
+        Wave(seed+pos,config)
+        times.append(clock()-start)
+    return times
+
+
+def benchReset(frames,seed,config):
+    """
+    Returns the time in seconds of each of frames calls of Wave.reset
+
+    Before each call the wave is loaded (untimed) from a savestate with only
+    the top right alien left, so every reset has to bring the whole
+    formation back.
+
+    Parameter frames: the number of resets to time
+    Precondition: frames is an int > 0
+
+    Parameter seed: the seed of the first wave; the others count up from it
+    Precondition: seed is an int >= 0
+
+    Parameter config: the size and speed of the waves
+    Precondition: config is a GameConfig object
+    """
+    wave = Wave(seed,config)
+    data = _editState(wave.saveState(),
+    keep={(config.getRows()-1,config.getAliensInRow()-1)})
+    times = []
+    clock = time.perf_counter
+    for pos in range(frames):
+        wave.loadState(data)
+        start = clock()
+        wave.reset(seed+pos)
+        times.append(clock()-start)
+    return times
+
+
+def benchUpdate(frames,makeWave,dt,policy,restart=None):
+    """
+    Returns the time in seconds of each of frames calls of Wave.update
+
+    Only the calls of update are timed. A new wave is made with makeWave
+    whenever the game is over or restart frames have been played, and the ship
+    is restored at once when it is destroyed, as in headless.runWave.
+
+    Parameter frames: the number of updates to time
+    Precondition: frames is an int > 0
+
+    Parameter makeWave: makes the wave to play
+    Precondition: makeWave is a callable taking the number of waves made so
+    far and returning a Wave object
+
+    Parameter dt: the time in seconds of each frame
+    Precondition: dt is a float > 0
+
+    Parameter policy: the player choosing the keys (see policies.py)
+    Precondition: policy is a callable taking the wave and the frame number
+
+    Parameter restart: the number of frames to play each wave for at most
+    Precondition: restart is an int > 0, or None to play each wave to the end
+    """
+    times = []
+    clock = time.perf_counter
+    input = headless.GInput()
+    waves = 0
+    while len(times) < frames:
+        wave = makeWave(waves)
+        waves += 1
+        frame = 0
+        while (not wave.getGameDone() and len(times) < frames and
+        (restart is None or frame < restart)):
+            input.setKeys(policy(wave,frame))
+            start = clock()
+            wave.update(input,dt)
+            times.append(clock()-start)
+            frame += 1
+            if wave.getIsPaused() and not wave.getGameDone():
+                wave.setIsPaused(False)
+                wave.createShip()
+    return times
+
+
+def runScenario(name,frames,seed,config):
+    """
+    Returns the time in seconds of each call of one benchmark, for one wave
+    size and speed
+
+    Parameter name: the benchmark to run
+    Precondition: name is in SCENARIOS
+
+    Parameter frames: the number of calls to time
+    Precondition: frames is an int > 0
+
+    Parameter seed: the seed of the first wave
+    Precondition: seed is an int >= 0
+
+    Parameter config: the size and speed of the wave
+    Precondition: config is a GameConfig object
+    """
+    assert name in SCENARIOS,repr(name)+' is not a benchmark'
+    if name == 'construct':
+        return benchConstruct(frames,seed,config)
+    if name == 'reset':
+        return benchReset(frames,seed,config)
+    if name == 'steady':
+        return benchUpdate(frames,lambda waves: Wave(seed+waves,config),1/60,
+        sweepPolicy)
+    if name == 'step':
+        return benchUpdate(frames,lambda waves: Wave(seed+waves,config),
+        config.getSpeed(),idlePolicy)
+
+    wave = Wave(seed,config)
+    if name == 'bolts':
+        bolts = [(20+(pos*37) % (GAME_WIDTH-40),150+(pos*53) % (GAME_HEIGHT-250),
+                  float(-BOLT_SPEED)) for pos in range(BENCH_BOLTS)]
+        data = _editState(wave.saveState(),bolts=bolts)
+        restart = BENCH_BOLT_FRAMES
+        policy = idlePolicy
+    else:
+        data = _editState(wave.saveState(),
+        keep={(config.getRows()-1,config.getAliensInRow()-1)})
+        restart = None
+        policy = sweepPolicy
+
+    def makeWave(waves):
+        wave.loadState(data)
+        return wave
+    return benchUpdate(frames,makeWave,1/60,policy,restart)
+
+
+def runConfig(frames,seed,config,scenarios=SCENARIOS):
+    """
+    Returns the statistics of the benchmarks for one wave size and speed, as
+    a dictionary from benchmark name to summarize result
+
+    Parameter frames: the number of calls to time in each benchmark
+    Precondition: frames is an int > 0
+
+    Parameter seed: the seed of the first wave
+    Precondition: seed is an int >= 0
+
+    Parameter config: the size and speed of the wave
+    Precondition: config is a GameConfig object
+
+    Parameter scenarios: the benchmarks to run
+    Precondition: scenarios is a list or tuple of names in SCENARIOS
+    """
+    return {name: summarize(runScenario(name,frames,seed,config))
+            for name in scenarios}
+
+
+def runGrid(configs,frames,seed,scenarios=SCENARIOS):
+    """
+    Returns the results of the benchmarks for every configuration, all run in
+    this process, as a list of dictionaries
+
+    Parameter configs: the configurations to measure
+    Precondition: configs is a list of GameConfig objects
+
+    Parameter frames: the number of calls to time in each benchmark
+    Precondition: frames is an int > 0
+
+    Parameter seed: the seed of the first wave
+    Precondition: seed is an int >= 0
+
+    Parameter scenarios: the benchmarks to run
+    Precondition: scenarios is a list or tuple of names in SCENARIOS
+    """
+    results = []
+    for config in configs:
+        rows,perrow,speed,swarm = config.getKey()
+        results.append({'rows': rows, 'perrow': perrow, 'speed': speed,
+                        'swarm': swarm,
+                        'scenarios': runConfig(frames,seed,config,scenarios)})
+        print('%2d x %2d at %.2fs: %s' % (rows,perrow,speed,
+        '  '.join('%s %.0f/s' % (name,stats['perSecond'])
+        for name,stats in results[-1]['scenarios'].items())),flush=True)
+    return results
+
+
+def compareResults(old,new):
+    """
+    Prints the change in the median time of every benchmark in both results.
+
+    Parameter old: the earlier results, as saved by main
+    Precondition: old is a dictionary with the key 'results'
+
+    Parameter new: the later results, as saved by main
+    Precondition: new is a dictionary with the key 'results'
+    """
+    before = {}
+    for entry in old['results']:
+        for name,stats in entry['scenarios'].items():
+            before[(entry['rows'],entry['perrow'],entry['speed'],
+                    entry.get('swarm',False),name)] = stats
+    print('%-22s %-10s %10s %10s %8s' % ('config','benchmark','old p50','new p50','change'))
+    for entry in new['results']:
+        for name,stats in entry['scenarios'].items():
+            key = (entry['rows'],entry['perrow'],entry['speed'],
+                   entry.get('swarm',False),name)
+            if key in before and before[key]['p50'] > 0:
+                label = '%d x %d at %.2fs' % key[:3]+(' swarm' if key[3] else '')
+                print('%-22s %-10s %8.1fus %8.1fus %+7.1f%%' % (label,name,
+                before[key]['p50'],stats['p50'],
+                100*(stats['p50']/before[key]['p50']-1)))
+
+
+def _commit():
+    """
+    Returns the git commit of the working tree, or None if it is unknown
+    """
+    try:
+        return subprocess.run(['git','rev-parse','HEAD'],capture_output=True,
+        text=True,check=True,cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """
+    Runs the benchmarks from the command line.
+
+    With a wave size and speed, this measures only that configuration.
+    Otherwise it measures the default grid, or every size with --full, and
+    saves the results to --out.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark Wave across sizes.')
+    parser.add_argument('rows',nargs='?',type=int,
+    help='the number of rows of aliens (see parseConfig)')
+    parser.add_argument('perrow',nargs='?',type=int,
+    help='the number of aliens in a row (see parseConfig)')
+    parser.add_argument('speed',nargs='?',type=float,
+    help='the seconds between alien steps (see parseConfig)')
+    parser.add_argument('--frames',type=int,default=2000,
+    help='the number of calls to time in each benchmark')
+    parser.add_argument('--seed',type=int,default=0,
+    help='the seed of the first wave')
+    parser.add_argument('--scenarios',default=','.join(SCENARIOS),
+    help='the benchmarks to run, separated by commas')
+    parser.add_argument('--full',action='store_true',
+    help='measure every size from 1 x 1 to 10 x 15')
+    parser.add_argument('--out',default='bench.json',
+    help='the file to save the results to')
+    parser.add_argument('--compare',metavar='FILE',
+    help='results saved earlier to compare against')
+    args = parser.parse_args()
+    scenarios = tuple(name for name in args.scenarios.split(',') if name)
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(repr(name)+' is not a benchmark')
+
+    default = parseConfig(sys.argv)
+    if args.rows is not None or default.isSwarm():
+        configs = [default]
+    elif args.full:
+        configs = [GameConfig(rows,perrow,speed) for rows in range(1,11)
+                   for perrow in range(1,16) for speed in BENCH_SPEEDS]
+    else:
+        configs = [GameConfig(rows,perrow,speed) for rows in BENCH_ROWS
+                   for perrow in BENCH_PER_ROW for speed in BENCH_SPEEDS]
+
+    results = {'commit': _commit(), 'python': platform.python_version(),
+               'machine': platform.machine(), 'platform': platform.platform(),
+               'frames': args.frames, 'seed': args.seed,
+               'results': runGrid(configs,args.frames,args.seed,scenarios)}
+    with open(args.out,'w') as file:
+        json.dump(results,file,indent=1)
+    print('saved to '+args.out)
+    if args.compare is not None:
+        with open(args.compare) as file:
+            compareResults(json.load(file),results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Game configuration module for Alien Invaders
+
+The size and speed of a wave used to be module globals in consts.py, read
+from the command line when consts.py was imported. Every wave in a process
+then had to share them, so a sweep over wave sizes needed a new process for
+every size.
+
+This module contains the class GameConfig, which holds everything about a
+wave that can change from game to game: the rows, the aliens in a row, the
+seconds between alien steps, and the sizes, gaps and steps of the aliens
+that follow from them. A Wave (and its Formation and aliens) is given a
+GameConfig when it is made, so any number of differently configured games
+can run side by side in one process.
+
+The function parseConfig is the command line parser. It only builds the
+default configuration of a run, from
+
+    python invaders 3 4 0.5
+
+and the environment variable INVADERS_SWARM (see the swarm constants in
+consts.py).
+
+Like the models, this module may only access consts.py.
+
+sjg276
+"""
+from consts import *
+import os
+
+
+class GameConfig(object):
+    """
+    A class to represent the size and speed of a wave.
+
+    A GameConfig never changes once made, so one can be shared by any number
+    of waves. Two configurations are equal when they make the same wave.
+
+    A normal wave has 1..10 rows of 1..15 aliens of the sizes in consts.py. A
+    swarm may have many more, which are shrunk to fit the window.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _rows: the number of rows of aliens
+    # Invariant: _rows is an int > 0, at most 10 if not _swarm
+    #
+    # Attribute _perrow: the number of aliens in a row
+    # Invariant: _perrow is an int > 0, at most 15 if not _swarm
+    #
+    # Attribute _speed: the number of seconds between alien steps
+    # Invariant: _speed is a float > 0 and <= 3
+    #
+    # Attribute _swarm: whether the aliens are shrunk to fit a swarm
+    # Invariant: _swarm is a bool
+    #
+    # Attribute _width: the width of an alien
+    # Invariant: _width is an int > 0
+    #
+    # Attribute _height: the height of an alien
+    # Invariant: _height is an int > 0
+    #
+    # Attribute _hsep: the horizontal separation between aliens
+    # Invariant: _hsep is an int >= 0
+    #
+    # Attribute _vsep: the vertical separation between aliens
+    # Invariant: _vsep is an int >= 0
+    #
+    # Attribute _hwalk: the number of horizontal pixels to move an alien
+    # Invariant: _hwalk is an int > 0
+    #
+    # Attribute _vwalk: the number of vertical pixels to move an alien
+    # Invariant: _vwalk is an int > 0
+
+    def getRows(self):
+        """
+        Returns the number of rows of aliens
+        """
+        return self._rows
+
+    def getAliensInRow(self):
+        """
+        Returns the number of aliens in a row
+        """
+        return self._perrow
+
+    def getSpeed(self):
+        """
+        Returns the number of seconds between alien steps
+        """
+        return self._speed
+
+    def isSwarm(self):
+        """
+        Returns True if the aliens are shrunk to fit a swarm
+        """
+        return self._swarm
+
+    def getAlienWidth(self):
+        """
+        Returns the width of an alien
+        """
+        return self._width
+
+    def getAlienHeight(self):
+        """
+        Returns the height of an alien
+        """
+        return self._height
+
+    def getHSep(self):
+        """
+        Returns the horizontal separation between aliens
+        """
+        return self._hsep
+
+    def getVSep(self):
+        """
+        Returns the vertical separation between aliens
+        """
+        return self._vsep
+
+    def getHWalk(self):
+        """
+        Returns the number of horizontal pixels an alien moves in a step
+        """
+        return self._hwalk
+
+    def getVWalk(self):
+        """
+        Returns the number of vertical pixels an alien moves down at an edge
+        """
+        return self._vwalk
+
+    def getKey(self):
+        """
+        Returns the tuple (rows,aliens in a row,speed,swarm), which is enough
+        to make this configuration again with GameConfig(*key)
+        """
+        return (self._rows,self._perrow,self._speed,self._swarm)
+
+    def __init__(self,rows=ALIEN_ROWS,perrow=ALIENS_IN_ROW,speed=ALIEN_SPEED,
+                 swarm=False):
+        """
+        Initializes a configuration.
+
+        A swarm that would not fit the window with its aliens SWARM_MIN_PITCH
+        apart is cut down to the largest one that does.
+
+        Parameter rows: the number of rows of aliens
+        Precondition: rows is an int in 1..10, or any int > 0 for a swarm
+
+        Parameter perrow: the number of aliens in a row
+        Precondition: perrow is an int in 1..15, or any int > 0 for a swarm
+
+        Parameter speed: the number of seconds between alien steps
+        Precondition: speed is an int or float > 0 and <= 3
+
+        Parameter swarm: whether to shrink the aliens to fit a swarm
+        Precondition: swarm is a bool
+        """
+        assert type(swarm) == bool,repr(swarm)+' is not a bool'
+        assert type(rows) == int and (rows >= 1 and (swarm or rows <= 10)),\
+        repr(rows)+' is not a valid number of rows'
+        assert type(perrow) == int and (perrow >= 1 and (swarm or perrow <= 15)),\
+        repr(perrow)+' is not a valid number of aliens in a row'
+        assert type(speed) in [int,float] and speed > 0 and speed <= 3,\
+        repr(speed)+' is not a valid speed'
+        self._speed = float(speed)
+        self._swarm = swarm
+        if not swarm:
+            self._rows = rows
+            self._perrow = perrow
+            self._width = ALIEN_WIDTH
+            self._height = ALIEN_HEIGHT
+            self._hsep = ALIEN_H_SEP
+            self._vsep = ALIEN_V_SEP
+            self._hwalk = ALIEN_H_WALK
+            self._vwalk = ALIEN_V_WALK
+            return
+
+        height = GAME_HEIGHT-ALIEN_CEILING-DEFENSE_LINE-SWARM_ROOM
+        rows = min(rows,height//SWARM_MIN_PITCH)
+        perrow = min(perrow,(GAME_WIDTH-ALIEN_H_SEP)//SWARM_MIN_PITCH)
+        pitch = min(ALIEN_WIDTH+ALIEN_H_SEP,height//rows,
+                    (GAME_WIDTH-ALIEN_H_SEP)//perrow)
+        self._rows = rows
+        self._perrow = perrow
+        self._width = max(pitch*ALIEN_WIDTH//(ALIEN_WIDTH+ALIEN_H_SEP),
+                          SWARM_MIN_PITCH-2)
+        self._height = self._width
+        self._hsep = pitch-self._width
+        self._vsep = pitch-self._height
+        self._hwalk = max(self._width//4,1)
+        self._vwalk = max(self._height//2,1)
+
+    def __eq__(self,other):
+        """
+        Returns True if other is a configuration that makes the same wave
+
+        Parameter other: the value to compare to
+        Precondition: NONE (other can be anything)
+        """
+        return isinstance(other,GameConfig) and self.getKey() == other.getKey()
+
+    def __hash__(self):
+        """
+        Returns a hash of the configuration, so it can be a dictionary key
+        """
+        return hash(self.getKey())
+
+    def __repr__(self):
+        """
+        Returns a string that makes this configuration again
+        """
+        return 'GameConfig(%d,%d,%r,%r)' % self.getKey()
+
+
+def parseConfig(argv,environ=os.environ):
+    """
+    Returns the default configuration of a run, from the command line and
+    the environment.
+
+    sys.argv is a list of the command line arguments when you run Python.
+    These arguments are everything after the word python. So if you start the
+    game typing
+
+        python invaders 3 4 0.5
+
+    Python puts ['invaders', '3', '4', '0.5'] into sys.argv, and this returns
+    a configuration with 3 rows of 4 aliens that step every 0.5 seconds. A
+    value that is missing or out of range is left at its value in consts.py.
+
+    If the environment variable INVADERS_SWARM is ROWSxCOLUMNS, as in
+
+        INVADERS_SWARM=40x60 python invaders
+
+    the configuration is a swarm of that size instead (see GameConfig).
+
+    Parameter argv: the command line arguments
+    Precondition: argv is a list of strings
+
+    Parameter environ: the environment variables
+    Precondition: environ is a dictionary from strings to strings
+    """
+    rows = ALIEN_ROWS
+    perrow = ALIENS_IN_ROW
+    speed = ALIEN_SPEED
+    try:
+        value = int(argv[1])
+        if value >= 1 and value <= 10:
+            rows = value
+    except (IndexError,ValueError):
+        pass # Use original value
+
+    try:
+        value = int(argv[2])
+        if value >= 1 and value <= 15:
+            perrow = value
+    except (IndexError,ValueError):
+        pass # Use original value
+
+    try:
+        value = float(argv[3])
+        if value > 0 and value <= 3:
+            speed = value
+    except (IndexError,ValueError):
+        pass # Use original value
+
+    try:
+        value = environ.get('INVADERS_SWARM','').lower().split('x')
+        swarmRows,swarmPerrow = int(value[0]),int(value[1])
+        if swarmRows >= 1 and swarmPerrow >= 1 and len(value) == 2:
+            return GameConfig(swarmRows,swarmPerrow,speed,True)
+    except (IndexError,ValueError):
+        pass # Not a swarm
+    return GameConfig(rows,perrow,speed)
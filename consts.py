@@ -8,8 +8,58 @@ allows all modules to access them.
 
 sjg276
 """
-import introcs
-import sys
+import os
+import importlib.util
+try:
+    import introcs
+except ImportError:
+    pass # Not needed for a headless run
+
+### BACKEND CONSTANTS ###
+
+# whether to run without a window, using the classes in headless.py instead of
+# game2d. This is True if the environment variable INVADERS_HEADLESS is set to
+# anything other than 0, or if game2d is not installed
+HEADLESS = os.environ.get('INVADERS_HEADLESS','0') not in ('','0') or \
+    importlib.util.find_spec('game2d') is None
+
+# how much checking to do while playing (see contracts.py): 'strict' checks
+# every precondition and every invariant of the wave after each update,
+# 'normal' checks the preconditions of the model setters, and 'fast' checks
+# nothing. It is taken from the environment variable INVADERS_CHECKS
+CHECK_MODE = os.environ.get('INVADERS_CHECKS','normal')
+if CHECK_MODE not in ('strict','normal','fast'):
+    CHECK_MODE = 'normal'
+
+# the path of the file to record each wave to (see replay.py), taken from the
+# environment variable INVADERS_RECORD, or None to not record
+RECORD_PATH = os.environ.get('INVADERS_RECORD') or None
+
+# the path of the Chrome trace file to save the frame times of each wave to
+# (see profiler.py), taken from the environment variable INVADERS_PROFILE, or
+# None to not profile
+PROFILE_PATH = os.environ.get('INVADERS_PROFILE') or None
+
+# whether to show the frame times on screen, which also turns on profiling.
+# This is True if the environment variable INVADERS_OVERLAY is set to
+# anything other than 0
+PROFILE_OVERLAY = os.environ.get('INVADERS_OVERLAY','0') not in ('','0')
+
+# the number of frames between changes of the text of the overlay
+OVERLAY_FRAMES = 30
+
+# the port to stream every wave to spectators on (see spectate.py), taken from
+# the environment variable INVADERS_SPECTATE, or None to not stream
+try:
+    SPECTATE_PORT = int(os.environ.get('INVADERS_SPECTATE','')) or None
+except ValueError:
+    SPECTATE_PORT = None
+
+# the path of the SQLite database to add the result of each wave to (see
+# leaderboard.py), taken from the environment variable INVADERS_LEADERBOARD,
+# or None to not keep the results
+LEADERBOARD_PATH = os.environ.get('INVADERS_LEADERBOARD') or None
+
 
 ### WINDOW CONSTANTS (all coordinates are in pixels) ###
 
@@ -52,15 +102,18 @@ ALIEN_H_WALK  = ALIEN_WIDTH // 4
 ALIEN_V_WALK  = ALIEN_HEIGHT // 2
 # The distance of the top alien from the top of the window
 ALIEN_CEILING = 100
-# the number of rows of aliens, in range 1..10
+# the number of rows of aliens, in range 1..10, unless the game is given
+# another GameConfig (see config.py)
 ALIEN_ROWS     = 5
-# the number of aliens per row
+# the number of aliens per row, in range 1..15, unless the game is given
+# another GameConfig
 ALIENS_IN_ROW  = 12
 # the image files for the aliens (bottom to top)
 ALIEN_IMAGES   = ('alien1.png','alien2.png','alien3.png')
 # the image file for the ship
 SHIP_IMAGE = ('ship.png')
-# the number of seconds (0 < float <= 1) between alien steps
+# the number of seconds (0 < float <= 3) between alien steps, unless the game
+# is given another GameConfig
 ALIEN_SPEED = 1.0
 
 
@@ -75,6 +128,9 @@ BOLT_HEIGHT = 16
 BOLT_SPEED  = 10
 # the number of ALIEN STEPS (not frames) between bolts
 BOLT_RATE   = 5
+# how far past the top or bottom of the screen a bolt center may get before
+# it is removed: up to half a bolt past the edge, and then one more move
+BOLT_MARGIN = max(2*BOLT_HEIGHT,BOLT_HEIGHT//2+BOLT_SPEED)
 
 
 ### GAME CONSTANTS ###
@@ -92,37 +148,39 @@ STATE_CONTINUE = 4
 #: state when the game is complete (won or lost)
 STATE_COMPLETE = 5
 
+# the number of labels (score, messages) to keep for reuse (see labels.py)
+LABEL_CACHE_SIZE = 32
 
-### USE COMMAND LINE ARGUMENTS TO CHANGE NUMBER OF ALIENS IN A ROW
-"""
-sys.argv is a list of the command line arguments when you run Python. These
-arguments are everything after the word python. So if you start the game typing
+# the time in seconds of one update of the wave. The game is always simulated
+# in steps of exactly this length, however fast the screen is redrawn
+FIXED_STEP = 1/60
 
-    python invaders 3 4 0.5
+# the largest number of steps to simulate in one frame to catch up after a
+# slow frame. Any more time than that is dropped, so the game slows down
+# instead of falling further and further behind
+MAX_CATCHUP = 5
 
-Python puts ['breakout.py', '3', '4', '0.5'] into sys.argv. Below, we take
-advantage of this fact to change the constants ALIEN_ROWS, ALIENS_IN_ROW, and
-ALIEN_SPEED.
-"""
-try:
-    rows = int(sys.argv[1])
-    if rows >= 1 and rows <= 10:
-        ALIEN_ROWS = rows
-except:
-    pass # Use original value
 
-try:
-    perrow = int(sys.argv[2])
-    if perrow >= 1 and perrow <= 15:
-        ALIENS_IN_ROW = perrow
-except:
-    pass # Use original value
+### ADD MORE CONSTANTS (PROPERLY COMMENTED) AS NECESSARY ###
 
-try:
-    speed = float(sys.argv[3])
-    if speed > 0 and speed <= 3:
-        ALIEN_SPEED = speed
-except:
-    pass # Use original value
 
-### ADD MORE CONSTANTS (PROPERLY COMMENTED) AS NECESSARY ###
+### SWARM MODE ###
+"""
+A swarm is a wave far bigger than the 10 by 15 limit above, for stress tests
+and the swarm game mode. It is turned on by setting the environment variable
+INVADERS_SWARM to ROWSxCOLUMNS, as in
+
+    INVADERS_SWARM=40x60 python invaders
+
+or by making a GameConfig with swarm=True (see config.py). The aliens (and the
+gaps between them) are then shrunk so that the whole swarm fits between
+ALIEN_CEILING and SWARM_ROOM above the defense line, and across the window.
+Aliens are never made smaller than SWARM_MIN_PITCH pixels apart, so a swarm
+that would not fit is cut down to the largest one that does. The ship and the
+bolts keep their size.
+"""
+# the smallest distance in pixels between the centers of neighboring aliens
+SWARM_MIN_PITCH = 6
+
+# the room in pixels left between the bottom of a swarm and the defense line
+SWARM_ROOM = 100
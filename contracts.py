@@ -0,0 +1,61 @@
+"""
+Contracts module for Alien Invaders
+
+The model setters are called for every bolt on every frame, and each call
+used to check the type and range of its argument. This module lets a run
+choose how much of that checking it pays for, with CHECK_MODE in consts.py
+(set from the environment variable INVADERS_CHECKS):
+
+    strict   every setter checks its precondition, and Wave checks all of the
+             invariants in its class comments at the end of every update
+    normal   every setter checks its precondition (the default)
+    fast     nothing is checked at all
+
+A setter opts in with the decorator checked, which is given a function that
+asserts the precondition. In fast mode the decorator hands back the setter
+itself, so a checked setter costs exactly as much as an unchecked one.
+
+Like the models, this module may only access consts.py.
+
+sjg276
+"""
+from consts import *
+import functools
+
+# whether preconditions are checked
+CHECKED = CHECK_MODE != 'fast'
+
+# whether the invariants of the whole wave are checked after every update
+STRICT = CHECK_MODE == 'strict'
+
+
+def checked(precondition):
+    """
+    Returns a decorator that checks precondition before calling a method.
+
+    When CHECKED is False, the decorator returns the method unchanged.
+
+    Parameter precondition: asserts that the arguments of the method are valid
+    Precondition: precondition is a function taking the same arguments as the
+    method (including self)
+    """
+    def decorate(method):
+        if not CHECKED:
+            return method
+
+        @functools.wraps(method)
+        def check(self,*args):
+            precondition(self,*args)
+            return method(self,*args)
+        return check
+    return decorate
+
+
+def isNumber(value):
+    """
+    Returns True if value is an int or a float (but not a bool)
+
+    Parameter value: the value to check
+    Precondition: value is any value
+    """
+    return type(value) == int or type(value) == float
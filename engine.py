@@ -0,0 +1,1277 @@
+"""
+Array engine module for Alien Invaders
+
+This module contains ArrayWave, a drop-in replacement for Wave that keeps the
+state of the aliens and the bolts in NumPy arrays instead of in model objects.
+Every phase of a frame (marching, descending, moving bolts, removing bolts and
+collisions) is then a handful of whole-array operations instead of a Python
+call per alien or per bolt.
+
+The rules of the game are exactly the ones in Wave, and the two classes draw
+the same random numbers in the same order. Started from the same seed and
+given the same input, they play the same game.
+
+No Alien or Bolt objects are built at all. When the wave is drawn, the
+positions in the arrays are copied into sprite batches (see batch.py), one
+for each alien image and one for the bolts.
+
+This module also contains VectorWave, which plays a whole batch of games in
+lockstep for bot training. Its state has one more axis, for the game, so a
+single call advances every game at once.
+
+NumPy is optional. The rest of the game runs without it; only creating an
+ArrayWave or a VectorWave needs it.
+
+sjg276
+"""
+from consts import *
+from models import *
+from config import *
+from formation import *
+from batch import *
+from observation import *
+import random
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# PRIMARY RULE: ArrayWave follows the same rules as Wave. It can only access
+# attributes in models.py via getters/setters, and it may not access app.py.
+
+
+def _sweep(prevY,y):
+    """
+    Returns the tuple (bottom,top) of arrays of the vertical ranges the bolts
+    covered in their last moves, as Bolt.getSweep does for one bolt.
+
+    Parameter prevY: the vertical coordinate of each bolt center before its
+    last move
+    Precondition: prevY is a float array
+
+    Parameter y: the vertical coordinate of each bolt center
+    Precondition: y is a float array of the shape of prevY
+    """
+    move = y-prevY
+    back = np.maximum(abs(move)-BOLT_HEIGHT,0)
+    return (y-BOLT_HEIGHT/2-np.where(move > 0,back,0),
+            y+BOLT_HEIGHT/2+np.where(move > 0,0,back))
+
+
+class ArrayWave(object):
+    """
+    This class controls a single wave of Alien Invaders using NumPy arrays.
+
+    It has the same public methods as Wave, so Invaders or a headless runner
+    can use either one. The aliens are stored as arrays of shape
+    (rows,cols), with row 0 at the bottom as in Wave. The bolts
+    are stored as arrays of positions and velocities, in the order they were
+    fired. Only the first _boltCount entries of the bolt arrays are in use.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _alienX: the horizontal coordinate of each alien center
+    # Invariant: _alienX is a float array of shape (rows,cols)
+    #
+    # Attribute _alienY: the vertical coordinate of each alien center
+    # Invariant: _alienY is a float array of shape (rows,cols)
+    #
+    # Attribute _startX, _startY: where each alien center is at the start
+    # Invariant: each is a float array of shape (rows,cols) that never changes
+    #
+    # Attribute _alive: which aliens have not been destroyed
+    # Invariant: _alive is a bool array of shape (rows,cols).
+    # A destroyed alien keeps the position it had when it was destroyed.
+    #
+    # Attribute _formation: the index of which aliens are alive
+    # Invariant: _formation is a Formation object whose cell (row,col) is alive
+    # exactly when _alive[row,col] is True. It is moved along with the live
+    # aliens at the end of every update, but only its index and its position
+    # are used; the alien positions are the ones in _alienX and _alienY.
+    #
+    # Attribute _alienScore: the score value of each alien
+    # Invariant: _alienScore is an int array of shape (rows,cols)
+    #
+    # Attribute _boltX: the horizontal coordinate of each bolt center
+    # Invariant: _boltX is a float array whose length is the bolt capacity
+    #
+    # Attribute _boltY: the vertical coordinate of each bolt center
+    # Invariant: _boltY is a float array whose length is the bolt capacity
+    #
+    # Attribute _boltV: the velocity of each bolt (> 0 for player bolts)
+    # Invariant: _boltV is a float array whose length is the bolt capacity
+    #
+    # Attribute _boltPrevY: the vertical coordinate of each bolt center before
+    # its last move (see Bolt.getPrevY)
+    # Invariant: _boltPrevY is a float array whose length is the bolt capacity
+    #
+    # Attribute _boltCount: the number of bolts on screen
+    # Invariant: _boltCount is an int between 0 and the bolt capacity
+    #
+    # Attribute _shipX: the horizontal coordinate of the ship center
+    # Invariant: _shipX is an int or float
+    #
+    # Attribute _hasShip: whether the ship is on screen
+    # Invariant: _hasShip is a boolean
+    #
+    # Attribute _shooter: the (row,col) of the alien that will shoot next
+    # Invariant: _shooter is a tuple of two ints, or None
+    #
+    # Attribute _alienBatches: the batches that draw the aliens, one for each
+    # image in ALIEN_IMAGES
+    # Invariant: _alienBatches is a list of SpriteBatch objects, or None if the
+    # wave has never been drawn
+    #
+    # Attribute _boltBatch: the batch that draws the bolts
+    # Invariant: _boltBatch is a SpriteBatch object, or None if the wave has
+    # never been drawn
+    #
+    # Attribute _shipBatch: the batch that draws the ship
+    # Invariant: _shipBatch is a SpriteBatch object, or None if the wave has
+    # never been drawn
+    #
+    # Attribute _moveX, _moveY: how far the live aliens moved in the last update
+    # Invariant: _moveX and _moveY are ints or floats
+    #
+    # Attribute _prevShipX: where the ship was before the last update
+    # Invariant: _prevShipX is an int or float, or None if there was no ship
+    #
+    # Attribute _dline: the defensive line being protected
+    # Invariant : _dline is a GPath object
+    #
+    # Attribute _config: the size and speed of this wave
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute _observation: the buffer the state is written to after every
+    # update
+    # Invariant: _observation is an Observation object for a wave of this
+    # size, or None to not write one
+    #
+    # The attributes _lives, _time, _direction, _newBolt, _alienRate,
+    # _stepaccum, _isPaused, _gameDone, _gameWon, _score, _seed and _rng are
+    # the same as in Wave.
+
+    def getGameWon(self):
+        """
+        Returns whether or not the game has been won. This method assumes that
+        the game has been completed.
+        """
+        return self._gameWon
+
+    def getGameDone(self):
+        """
+        Returns whether or not the game is done
+        """
+        return self._gameDone
+
+    def getIsPaused(self):
+        """
+        Returns whether or not the game is paused
+        """
+        return self._isPaused
+
+    def setIsPaused(self,value):
+        """
+        Sets self._isPaused to follow whether or not the game is paused
+
+        Parameter: value is whether or not the game is paused
+        Precondition: value is a boolean
+        """
+        assert type(value) == bool,repr(value)+' is not a valid type'
+        self._isPaused = value
+
+    def getLives(self):
+        """
+        Returns self._lives, the current amount of lives the player has
+        """
+        return self._lives
+
+    def getScore(self):
+        """
+        Returns self._score, the score value a player has
+        """
+        return self._score
+
+    def getSeed(self):
+        """
+        Returns self._seed, the seed this wave's random numbers started from
+        """
+        return self._seed
+
+    def getConfig(self):
+        """
+        Returns the GameConfig giving the size and speed of this wave
+        """
+        return self._config
+
+    def getObservation(self):
+        """
+        Returns the observation buffer the wave writes to, or None
+        """
+        return self._observation
+
+    def setObservation(self,value):
+        """
+        Sets the observation buffer the wave writes its state to after every
+        update, and writes the current state to it
+
+        Parameter value: the new observation buffer
+        Precondition: value is an Observation object for a wave of this size,
+        or None to stop writing one
+        """
+        assert value is None or isinstance(value,Observation),repr(value)+\
+        ' is not an Observation'
+        self._observation = value
+        if value is not None:
+            assert (value.getRows() == self._config.getRows() and
+            value.getAliensInRow() == self._config.getAliensInRow()),\
+            'the observation is for a wave of another size'
+            self._writeObservation(True)
+
+    def __init__(self,seed=None,config=None):
+        """
+        Initializes the wave with the same layout as Wave.
+
+        This method raises ImportError if NumPy is not installed.
+
+        Parameter seed: the seed for this wave's random numbers
+        Precondition: seed is an int in 0..2**64-1, or None to pick a random
+        seed
+
+        Parameter config: the size and speed of the wave
+        Precondition: config is a GameConfig object, or None for the sizes in
+        consts.py
+        """
+        if np is None:
+            raise ImportError('ArrayWave needs NumPy, which is not installed')
+        assert seed is None or (type(seed) == int and 0 <= seed < 2**64),\
+        repr(seed)+' is not a valid seed'
+        assert config is None or isinstance(config,GameConfig),repr(config)+\
+        ' is not a GameConfig'
+        if seed is None:
+            seed = random.getrandbits(64)
+        if config is None:
+            config = GameConfig()
+        self._seed = seed
+        self._config = config
+        self._rng = random.Random(seed)
+        shape = (config.getRows(),config.getAliensInRow())
+        width = config.getAlienWidth()
+        height = config.getAlienHeight()
+        rows = np.arange(shape[0])
+        cols = np.arange(shape[1])
+        bottom = ALIEN_CEILING+height*(shape[0]-0.5)+config.getVSep()*(shape[0]-1)
+        self._startX = np.empty(shape)
+        self._startX[:] = config.getHSep()+width//2+cols*(config.getHSep()+width)
+        self._startY = np.empty(shape)
+        self._startY[:] = (GAME_HEIGHT-bottom+rows*(config.getVSep()+height))[:,None]
+        self._alienX = self._startX.copy()
+        self._alienY = self._startY.copy()
+        self._alive = np.ones(shape,dtype=bool)
+        self._formation = Formation(config,
+        float(self._alienX[0,0]),float(self._alienY[0,0]))
+        self._alienScore = np.empty(shape,dtype=np.int64)
+        self._alienScore[:] = (20+20*(rows//2))[:,None]
+
+        self._boltX = np.empty(8)
+        self._boltY = np.empty(8)
+        self._boltV = np.empty(8)
+        self._boltPrevY = np.empty(8)
+        self._boltCount = 0
+
+        self._shipX = GAME_WIDTH/2
+        self._hasShip = True
+        self._alienBatches = None
+        self._boltBatch = None
+        self._shipBatch = None
+        self._observation = None
+        self._moveX = 0
+        self._moveY = 0
+        self._prevShipX = self._shipX
+        self._dline = GPath(points=[0,DEFENSE_LINE,GAME_WIDTH,DEFENSE_LINE],
+        linewidth=2,linecolor='black')
+
+        self._time = 0
+        self._direction = 'right'
+        self._newBolt = True
+        self._alienRate = self._rng.randint(1,BOLT_RATE)
+        self._shooter = None
+        self._stepaccum = 0
+        self._lives = 3
+        self._isPaused = False
+        self._gameDone = False
+        self._gameWon = None
+        self._score = 0
+
+    def reset(self,seed=None):
+        """
+        Starts a new wave in place of this one, as Wave.reset does.
+
+        The arrays are refilled from the start of the formation instead of
+        being made again. The observation stays attached and is sent the new
+        state.
+
+        Parameter seed: the seed for the new wave's random numbers
+        Precondition: seed is an int in 0..2**64-1, or None to pick a random
+        seed
+        """
+        assert seed is None or (type(seed) == int and 0 <= seed < 2**64),\
+        repr(seed)+' is not a valid seed'
+        if seed is None:
+            seed = random.getrandbits(64)
+        self._seed = seed
+        self._rng.seed(seed)
+        self._alienX[:] = self._startX
+        self._alienY[:] = self._startY
+        self._alive[:] = True
+        self._formation.reset(float(self._startX[0,0]),float(self._startY[0,0]))
+        self._boltCount = 0
+        self._shipX = GAME_WIDTH/2
+        self._hasShip = True
+        self._moveX = 0
+        self._moveY = 0
+        self._prevShipX = self._shipX
+        self._time = 0
+        self._direction = 'right'
+        self._newBolt = True
+        self._alienRate = self._rng.randint(1,BOLT_RATE)
+        self._shooter = None
+        self._stepaccum = 0
+        self._lives = 3
+        self._isPaused = False
+        self._gameDone = False
+        self._gameWon = None
+        self._score = 0
+        if self._observation is not None:
+            self._writeObservation(True)
+
+    def createShip(self):
+        """
+        Puts the ship back at the center of the screen
+        """
+        self._shipX = GAME_WIDTH/2
+        self._hasShip = True
+        if self._observation is not None:
+            self._writeObservation()
+
+    def update(self,input,dt):
+        """
+        Animates a single frame of the wave.
+
+        Parameter input: Allows functionality with user input
+        Precondition: input is an instance of GInput
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        self._moveX = 0
+        self._moveY = 0
+        self._prevShipX = self._shipX if self._hasShip else None
+        if self._observation is not None:
+            fields = self._observation.getFields()
+            fields[0] += 1
+            fields[1] += 1
+        self._gameOver()
+        self._changeShip(input)
+        self._changeAlien(dt)
+        self._verticalMove()
+        self._createBolt(input)
+        self._changeBolt()
+        self._removeBolt()
+        self._oneBolt()
+        if self._stepaccum == 0:
+            self._chooseAlien()
+        self._alienBolt()
+        self._collision()
+        if self._moveX != 0 or self._moveY != 0:
+            self._formation.move(self._moveX,self._moveY)
+        if self._observation is not None:
+            self._writeObservation()
+
+    def draw(self,view,alpha=1.0):
+        """
+        Draws a single frame of the wave, filling the sprite batches from the
+        arrays.
+
+        As in Wave, alpha says how far between the last two updates to draw.
+
+        Parameter view: the game view, used in drawing
+        Precondition: view is an instance of GView
+
+        Parameter alpha: how far to draw between the last two updates
+        Precondition: alpha is a float between 0 and 1; 1 draws the wave as
+        it is now
+        """
+        if self._alienBatches is None:
+            self._alienBatches = [SpriteBatch(source,self._config.getAlienWidth(),
+            self._config.getAlienHeight()) for source in ALIEN_IMAGES]
+            self._boltBatch = SpriteBatch(None,BOLT_WIDTH,BOLT_HEIGHT,'black')
+            self._shipBatch = SpriteBatch(SHIP_IMAGE,SHIP_WIDTH,SHIP_HEIGHT)
+        back = 1.0-alpha
+        dx = -self._moveX*back
+        dy = -self._moveY*back
+        for batch in self._alienBatches:
+            batch.begin()
+        for row,col in zip(*np.nonzero(self._alive)):
+            self._alienBatches[(row//2) % len(ALIEN_IMAGES)].add(
+            float(self._alienX[row,col])+dx,float(self._alienY[row,col])+dy)
+        for batch in self._alienBatches:
+            batch.draw(view)
+        self._shipBatch.begin()
+        if self._hasShip:
+            x = self._shipX
+            if self._prevShipX is not None:
+                x += (self._prevShipX-x)*back
+            self._shipBatch.add(x,SHIP_BOTTOM+SHIP_HEIGHT/2)
+        self._shipBatch.draw(view)
+        self._dline.draw(view)
+        self._boltBatch.begin()
+        for pos in range(self._boltCount):
+            y = self._boltY[pos]
+            self._boltBatch.add(float(self._boltX[pos]),
+            float(y+(self._boltPrevY[pos]-y)*back))
+        self._boltBatch.draw(view)
+
+    def _gameOver(self):
+        """
+        Checks whether or not the game is over and whether or not the player won.
+
+        The player loses if an alien reaches the defense line or if they run out
+        of lives. The player wins if every alien is destroyed.
+        """
+        if (self._alienY[self._alive]-self._config.getAlienHeight()/2 <=
+        DEFENSE_LINE).any():
+            self._gameDone = True
+            self._gameWon = False
+        if self._lives == 0:
+            self._gameDone = True
+            self._gameWon = False
+        elif self._formation.getAliveCount() == 0:
+            self._gameDone = True
+            self._gameWon = True
+
+    def _changeShip(self,input):
+        """
+        Moves the ship left or right, keeping it on the screen.
+
+        Parameter input: Allows functionality with user input to move ship
+        Precondition: input is an instance of GInput
+        """
+        da = 0
+        if input.is_key_down('left'):
+            if self._hasShip and self._shipX <= SHIP_WIDTH/2:
+                da = 0
+            else:
+                da -= SHIP_MOVEMENT
+        if input.is_key_down('right'):
+            if self._hasShip and self._shipX >= GAME_WIDTH-SHIP_WIDTH/2:
+                da = 0
+            else:
+                da += SHIP_MOVEMENT
+        if self._hasShip:
+            self._shipX += da
+
+    def _changeAlien(self,dt):
+        """
+        Moves every live alien the horizontal walk in the current direction
+        once the speed of the GameConfig has passed, keeping the time past the
+        step as in Wave.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        speed = self._config.getSpeed()
+        walk = self._config.getHWalk()
+        self._time += dt
+        if self._time >= speed:
+            if self._direction == 'right':
+                self._alienX[self._alive] += walk
+                self._moveX += walk
+            else:
+                self._alienX[self._alive] -= walk
+                self._moveX -= walk
+            self._stepaccum += 1
+            self._time = (self._time-speed) % speed
+
+    def _verticalMove(self):
+        """
+        Moves the wave down the vertical walk and turns it around when the
+        leftmost or rightmost live alien is too close to the edge of the screen.
+        """
+        config = self._config
+        live = self._alienX[self._alive]
+        if live.size == 0:
+            return
+        hwalk = config.getHWalk()
+        vwalk = config.getVWalk()
+        rightBoundary = GAME_WIDTH-live.max()-config.getAlienWidth()//2
+        leftBoundary = live.min()-config.getAlienWidth()//2
+        if config.getHSep() > rightBoundary:
+            self._alienY[self._alive] -= vwalk
+            self._alienX[self._alive] -= hwalk
+            self._moveX -= hwalk
+            self._moveY -= vwalk
+            self._direction = 'left'
+        if leftBoundary < config.getHSep():
+            self._alienY[self._alive] -= vwalk
+            self._alienX[self._alive] += hwalk
+            self._moveX += hwalk
+            self._moveY -= vwalk
+            self._direction = 'right'
+
+    def _addBolt(self,x,y,velocity):
+        """
+        Adds a bolt after the last one on screen, growing the arrays if full.
+
+        Parameter x: the horizontal coordinate of the bolt center
+        Precondition: x is an int or float
+
+        Parameter y: the vertical coordinate of the bolt center
+        Precondition: y is an int or float
+
+        Parameter velocity: the velocity of the bolt
+        Precondition: velocity is an int or float
+        """
+        if self._boltCount == len(self._boltX):
+            size = 2*len(self._boltX)
+            self._boltX = np.resize(self._boltX,size)
+            self._boltY = np.resize(self._boltY,size)
+            self._boltV = np.resize(self._boltV,size)
+            self._boltPrevY = np.resize(self._boltPrevY,size)
+        self._boltX[self._boltCount] = x
+        self._boltY[self._boltCount] = y
+        self._boltV[self._boltCount] = velocity
+        self._boltPrevY[self._boltCount] = y
+        self._boltCount += 1
+
+    def _keepBolts(self,keep):
+        """
+        Removes every bolt whose entry in keep is False, in a single pass.
+
+        The bolts that are kept stay in the order they were fired.
+
+        Parameter keep: which bolts to keep
+        Precondition: keep is a bool array of length _boltCount
+        """
+        count = int(keep.sum())
+        if count < self._boltCount:
+            n = self._boltCount
+            self._boltX[:count] = self._boltX[:n][keep]
+            self._boltY[:count] = self._boltY[:n][keep]
+            self._boltV[:count] = self._boltV[:n][keep]
+            self._boltPrevY[:count] = self._boltPrevY[:n][keep]
+            self._boltCount = count
+
+    def _createBolt(self,input):
+        """
+        Fires a player bolt from the ship if 'up' is down and the player may fire.
+
+        Parameter input: Allows functionality with user input to create a bolt
+        Precondition: input is an instance of GInput
+        """
+        if self._hasShip and input.is_key_down('up') and self._newBolt:
+            self._addBolt(self._shipX,SHIP_BOTTOM+SHIP_HEIGHT+BOLT_HEIGHT/2,
+            BOLT_SPEED)
+
+    def _changeBolt(self):
+        """
+        Moves every bolt by its velocity, remembering where it was.
+        """
+        n = self._boltCount
+        self._boltPrevY[:n] = self._boltY[:n]
+        self._boltY[:n] += self._boltV[:n]
+
+    def _removeBolt(self):
+        """
+        Removes the bolts that have left the screen. If a player bolt left, the
+        player may fire again.
+        """
+        n = self._boltCount
+        y = self._boltY[:n]
+        top = y-BOLT_HEIGHT/2 >= GAME_HEIGHT
+        gone = top | (y+BOLT_HEIGHT/2 <= 0)
+        if gone.any():
+            if (top & (self._boltV[:n] > 0)).any():
+                self._newBolt = True
+            self._keepBolts(~gone)
+
+    def _oneBolt(self):
+        """
+        Stops the player from firing while a player bolt is on screen.
+        """
+        if (self._boltV[:self._boltCount] > 0).any():
+            self._newBolt = False
+
+    def _chooseAlien(self):
+        """
+        Picks a random column that still has aliens, and the lowest alien in it
+        as the next shooter. If there are no aliens left, the shooter does not
+        change.
+        """
+        count = self._formation.getLiveColumnCount()
+        if count > 0:
+            column = self._formation.getLiveColumn(self._rng.randint(0,count-1))
+            self._shooter = (self._formation.getColumnBottom(column),column)
+
+    def _alienBolt(self):
+        """
+        Fires a bolt from the shooter once the aliens have taken _alienRate
+        steps since the last alien bolt. If no shooter has been chosen yet, one
+        is chosen now, as in Wave.
+        """
+        if self._stepaccum == self._alienRate:
+            if self._shooter is None:
+                self._chooseAlien()
+            row,col = self._shooter
+            self._addBolt(self._alienX[row,col],
+            self._alienY[row,col]-self._config.getAlienHeight()//2,-BOLT_SPEED)
+            self._stepaccum = 0
+            self._alienRate = self._rng.randint(1,BOLT_RATE)
+
+    def _sweeps(self,bx,bottom,top,x,y,width,height):
+        """
+        Returns whether each bolt touched each box anywhere along its last move.
+
+        This is the test Alien.collides and Ship.collides make (see
+        Bolt.sweeps), broadcast over arrays. The result has shape
+        bx.shape+x.shape.
+
+        Parameter bx: the horizontal coordinate of the bolt centers
+        Precondition: bx is a float array
+
+        Parameter bottom, top: the vertical range each bolt covered in its
+        last move (see _sweep)
+        Precondition: bottom and top are float arrays of the shape of bx
+
+        Parameter x, y: the box centers
+        Precondition: x and y are float arrays of the same shape
+
+        Parameter width, height: the box size
+        Precondition: width and height are numbers > 0
+        """
+        extra = (Ellipsis,)+(None,)*x.ndim
+        inx = abs(bx[extra]-x) < (width+BOLT_WIDTH)/2
+        iny = (bottom[extra] < y+height/2) & (top[extra] > y-height/2)
+        return inx & iny
+
+    def _collision(self):
+        """
+        Removes any alien hit by a player bolt and the ship if it is hit by an
+        alien bolt, along with the bolts that hit them.
+
+        All of the bolts are tested against all of the aliens at once. Only the
+        bolts that hit something are then handled one at a time, in the order
+        they were fired.
+        """
+        config = self._config
+        n = self._boltCount
+        if n == 0:
+            return
+        bx = self._boltX[:n]
+        bottom,top = _sweep(self._boltPrevY[:n],self._boltY[:n])
+        player = self._boltV[:n] > 0
+        keep = np.ones(n,dtype=bool)
+
+        shots = np.nonzero(player)[0]
+        if shots.size > 0 and self._alive.any():
+            hits = self._sweeps(bx[shots],bottom[shots],top[shots],self._alienX,
+            self._alienY,config.getAlienWidth(),config.getAlienHeight())
+            hits &= self._alive
+            for pos in np.nonzero(hits.any(axis=(1,2)))[0]:
+                cells = hits[pos] & self._alive
+                if cells.any():
+                    row,col = np.unravel_index(np.argmax(cells),cells.shape)
+                    self._alive[row,col] = False
+                    self._formation.kill(int(row),int(col))
+                    if self._observation is not None:
+                        self._observation.getAlive()[
+                        int(row)*self._config.getAliensInRow()+int(col)] = 0
+                    self._score += int(self._alienScore[row,col])
+                    keep[shots[pos]] = False
+                    self._newBolt = True
+
+        shots = np.nonzero(~player)[0]
+        if shots.size > 0 and self._hasShip:
+            hits = self._sweeps(bx[shots],bottom[shots],top[shots],
+            np.array(self._shipX),np.array(SHIP_BOTTOM+SHIP_HEIGHT/2),
+            SHIP_WIDTH,SHIP_HEIGHT)
+            if hits.any():
+                keep[shots[np.argmax(hits)]] = False
+                self._hasShip = False
+                self._newBolt = True
+                self._lives -= 1
+                if self._lives >= 1:
+                    self._isPaused = True
+
+        self._keepBolts(keep)
+
+    def _writeObservation(self,full=False):
+        """
+        Writes the state of the wave to self._observation, as Wave does.
+
+        The bolts (and the alive mask, if full is True) are copied straight
+        from the arrays into the buffer.
+
+        Parameter full: whether to write the alive mask too
+        Precondition: full is a bool
+        """
+        observation = self._observation
+        fields = observation.getFields()
+        if int(fields[0]) % 2 == 0:
+            fields[0] += 1
+        if full:
+            np.frombuffer(observation.getAlive(),dtype=np.uint8)[:] = \
+            self._alive.ravel()
+        count = min(self._boltCount,OBS_BOLTS)
+        bolts = np.frombuffer(observation.getBolts(),dtype=np.float64).reshape(
+        OBS_BOLTS,OBS_BOLT_SIZE)
+        bolts[:count,0] = self._boltX[:count]
+        bolts[:count,1] = self._boltY[:count]
+        bolts[:count,2] = self._boltV[:count]
+        fields[2] = self._shipX if self._hasShip else 0.0
+        fields[3] = self._hasShip
+        fields[4] = self._formation.getX()
+        fields[5] = self._formation.getY()
+        fields[6] = 1 if self._direction == 'right' else -1
+        fields[7] = self._lives
+        fields[8] = self._score
+        fields[9] = self._formation.getAliveCount()
+        fields[10] = count
+        fields[11] = self._gameDone
+        fields[12] = -1 if self._gameWon is None else self._gameWon
+        fields[0] += 1
+
+
+class VectorWave(object):
+    """
+    This class plays a batch of independent waves in lockstep.
+
+    Each call to step takes one action for every game and advances every game
+    by one frame. The state of all of the games is kept in shared arrays whose
+    first axis is the game, so a step costs about the same number of Python
+    calls no matter how many games there are.
+
+    An action is three flags per game: whether 'left', 'right' and 'up' (fire)
+    are held down. The games follow the rules of Wave, and behave like a
+    headless run of Wave: when the ship is destroyed and lives are left, it is
+    restored at the end of the frame, as if the player pressed 'S' right away.
+    Each game has its own random numbers, drawn from one NumPy generator, so
+    a VectorWave game does not replay the same random sequence as a Wave.
+
+    A game that is done stops changing until it is reset.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _size: the number of games
+    # Invariant: _size is an int > 0
+    #
+    # Attribute _config: the size and speed of every game
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute _rng: the random number generator for every game
+    # Invariant: _rng is a numpy Generator
+    #
+    # Attribute _colX: the horizontal coordinate of each column at the start
+    # Invariant: _colX is a float array of shape (cols,)
+    #
+    # Attribute _rowY: the vertical coordinate of each row at the start
+    # Invariant: _rowY is a float array of shape (rows,)
+    #
+    # Attribute _rowScore: the score value of an alien in each row
+    # Invariant: _rowScore is an int array of shape (rows,)
+    #
+    # Attribute _offX: how far each formation has moved horizontally
+    # Invariant: _offX is a float array of shape (_size,)
+    #
+    # Attribute _offY: how far each formation has moved vertically
+    # Invariant: _offY is a float array of shape (_size,)
+    #
+    # Attribute _alive: which aliens of each game have not been destroyed
+    # Invariant: _alive is a bool array of shape (_size,rows,cols)
+    #
+    # Attribute _boltOn: which bolt slots of each game are in use
+    # Invariant: _boltOn is a bool array of shape (_size,capacity)
+    #
+    # Attribute _boltX, _boltY, _boltV: the position and velocity of each slot
+    # Invariant: each is a float array of shape (_size,capacity)
+    #
+    # Attribute _boltPrevY: the vertical coordinate of each slot before its
+    # last move (see Bolt.getPrevY)
+    # Invariant: _boltPrevY is a float array of shape (_size,capacity)
+    #
+    # Attribute _shipX: the horizontal coordinate of each ship center
+    # Invariant: _shipX is a float array of shape (_size,)
+    #
+    # Attribute _hasShip: whether each ship is on screen
+    # Invariant: _hasShip is a bool array of shape (_size,)
+    #
+    # Attribute _shooterRow, _shooterCol: the cell of each game's next shooter
+    # Invariant: each is an int array of shape (_size,); -1 if there is none yet
+    #
+    # Attribute _shooterX, _shooterY: where each shooter was last seen alive
+    # Invariant: each is a float array of shape (_size,)
+    #
+    # Attribute _direction: the direction each formation is moving, 1 for right
+    # and -1 for left
+    # Invariant: _direction is an int array of shape (_size,)
+    #
+    # Attribute _time, _stepaccum, _alienRate, _newBolt, _lives, _score: the same
+    # as in Wave, one entry per game
+    # Invariant: each is an array of shape (_size,)
+    #
+    # Attribute _done: whether each game is over
+    # Invariant: _done is a bool array of shape (_size,)
+    #
+    # Attribute _won: whether each game that is over was won
+    # Invariant: _won is a bool array of shape (_size,)
+
+    def getSize(self):
+        """
+        Returns the number of games in the batch
+        """
+        return self._size
+
+    def getScores(self):
+        """
+        Returns the score of every game, as an int array
+        """
+        return self._score.copy()
+
+    def getLives(self):
+        """
+        Returns the lives left in every game, as an int array
+        """
+        return self._lives.copy()
+
+    def getDone(self):
+        """
+        Returns whether every game is over, as a bool array
+        """
+        return self._done.copy()
+
+    def getWon(self):
+        """
+        Returns whether every game was won, as a bool array. The entry for a
+        game that is not over is False.
+        """
+        return self._won.copy()
+
+    def getShipX(self):
+        """
+        Returns the horizontal coordinate of every ship, as a float array
+        """
+        return self._shipX.copy()
+
+    def getFormationOffsets(self):
+        """
+        Returns how far every formation has moved from where it started, as a
+        float array of shape (size,2)
+        """
+        return np.stack((self._offX,self._offY),axis=1)
+
+    def getAlive(self):
+        """
+        Returns which aliens are alive in every game, as a bool array of shape
+        (size,rows,cols)
+        """
+        return self._alive.copy()
+
+    def getConfig(self):
+        """
+        Returns the GameConfig giving the size and speed of every game
+        """
+        return self._config
+
+    def __init__(self,size,seed=None,config=None):
+        """
+        Initializes a batch of new games.
+
+        This method raises ImportError if NumPy is not installed.
+
+        Parameter size: the number of games
+        Precondition: size is an int > 0
+
+        Parameter seed: the seed for the random numbers of every game
+        Precondition: seed is an int >= 0, or None for a random seed
+
+        Parameter config: the size and speed of every game
+        Precondition: config is a GameConfig object, or None for the sizes in
+        consts.py
+        """
+        if np is None:
+            raise ImportError('VectorWave needs NumPy, which is not installed')
+        assert type(size) == int and size > 0,repr(size)+' is not a valid size'
+        assert config is None or isinstance(config,GameConfig),repr(config)+\
+        ' is not a GameConfig'
+        if config is None:
+            config = GameConfig()
+        self._size = size
+        self._config = config
+        self._rng = np.random.default_rng(seed)
+
+        width = config.getAlienWidth()
+        height = config.getAlienHeight()
+        bottom = (ALIEN_CEILING+height*(config.getRows()-0.5)+
+                  config.getVSep()*(config.getRows()-1))
+        rows = np.arange(config.getRows())
+        cols = np.arange(config.getAliensInRow())
+        self._colX = config.getHSep()+width//2+cols*(config.getHSep()+width)
+        self._colX = self._colX.astype(float)
+        self._rowY = GAME_HEIGHT-bottom+rows*(config.getVSep()+height)
+        self._rowScore = 20+20*(rows//2)
+
+        self._offX = np.zeros(size)
+        self._offY = np.zeros(size)
+        self._alive = np.ones((size,config.getRows(),config.getAliensInRow()),dtype=bool)
+        self._boltOn = np.zeros((size,8),dtype=bool)
+        self._boltX = np.zeros((size,8))
+        self._boltY = np.zeros((size,8))
+        self._boltV = np.zeros((size,8))
+        self._boltPrevY = np.zeros((size,8))
+        self._shipX = np.full(size,GAME_WIDTH/2)
+        self._hasShip = np.ones(size,dtype=bool)
+        self._shooterRow = np.full(size,-1)
+        self._shooterCol = np.full(size,-1)
+        self._shooterX = np.zeros(size)
+        self._shooterY = np.zeros(size)
+        self._direction = np.ones(size,dtype=np.int64)
+        self._time = np.zeros(size)
+        self._stepaccum = np.zeros(size,dtype=np.int64)
+        self._alienRate = self._rng.integers(1,BOLT_RATE+1,size)
+        self._newBolt = np.ones(size,dtype=bool)
+        self._lives = np.full(size,3)
+        self._score = np.zeros(size,dtype=np.int64)
+        self._done = np.zeros(size,dtype=bool)
+        self._won = np.zeros(size,dtype=bool)
+
+    def reset(self,mask=None):
+        """
+        Starts new games in place of the chosen games.
+
+        Parameter mask: which games to reset
+        Precondition: mask is a bool array of shape (size,), or None for all
+        """
+        if mask is None:
+            mask = np.ones(self._size,dtype=bool)
+        count = int(mask.sum())
+        self._offX[mask] = 0
+        self._offY[mask] = 0
+        self._alive[mask] = True
+        self._boltOn[mask] = False
+        self._shipX[mask] = GAME_WIDTH/2
+        self._hasShip[mask] = True
+        self._shooterRow[mask] = -1
+        self._shooterCol[mask] = -1
+        self._direction[mask] = 1
+        self._time[mask] = 0
+        self._stepaccum[mask] = 0
+        self._alienRate[mask] = self._rng.integers(1,BOLT_RATE+1,count)
+        self._newBolt[mask] = True
+        self._lives[mask] = 3
+        self._score[mask] = 0
+        self._done[mask] = False
+        self._won[mask] = False
+
+    def step(self,actions,dt):
+        """
+        Advances every game that is not over by one frame.
+
+        Returns the tuple (rewards,lives,done,shipX) of arrays with one entry
+        per game: the points scored this frame, the lives left, whether the
+        game is over and the horizontal coordinate of the ship.
+
+        Parameter actions: the keys held down in every game
+        Precondition: actions is an array-like of shape (size,3) whose columns
+        are 'left', 'right' and 'up'
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float) > 0
+        """
+        actions = np.asarray(actions,dtype=bool)
+        assert actions.shape == (self._size,3),repr(actions.shape)+' is not a valid shape'
+        active = ~self._done
+        before = self._score.copy()
+
+        self._gameOver(active)
+        self._changeShip(active,actions[:,0],actions[:,1])
+        self._changeAlien(active,dt)
+        self._verticalMove(active)
+        self._createBolt(active & actions[:,2])
+        self._changeBolt(active)
+        self._removeBolt(active)
+        self._oneBolt(active)
+        self._chooseAlien(active & (self._stepaccum == 0))
+        self._alienBolt(active)
+        self._collision(active)
+
+        restore = active & ~self._hasShip & (self._lives >= 1)
+        self._shipX[restore] = GAME_WIDTH/2
+        self._hasShip[restore] = True
+        return (self._score-before,self._lives.copy(),self._done.copy(),
+        self._shipX.copy())
+
+    def _gameOver(self,active):
+        """
+        Marks the games that are over, and whether they were won.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        rows = self._alive.any(axis=2)
+        left = rows.any(axis=1)
+        lowest = self._rowY[rows.argmax(axis=1)]+self._offY-self._config.getAlienHeight()/2
+        lost = active & ((left & (lowest <= DEFENSE_LINE)) | (self._lives == 0))
+        won = active & ~lost & ~left
+        self._done |= lost | won
+        self._won[won] = True
+
+    def _changeShip(self,active,left,right):
+        """
+        Moves the ships left or right, keeping them on the screen.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+
+        Parameter left, right: which games hold down 'left' and 'right'
+        Precondition: left and right are bool arrays of shape (size,)
+        """
+        da = np.where(left & ~(self._hasShip & (self._shipX <= SHIP_WIDTH/2)),
+        -SHIP_MOVEMENT,0)
+        da = np.where(right,np.where(self._hasShip &
+        (self._shipX >= GAME_WIDTH-SHIP_WIDTH/2),0,da+SHIP_MOVEMENT),da)
+        self._shipX += np.where(active & self._hasShip,da,0)
+
+    def _changeAlien(self,active,dt):
+        """
+        Steps the formations once the speed of the GameConfig has passed,
+        keeping the time past the step as in Wave.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        speed = self._config.getSpeed()
+        self._time[active] += dt
+        stepped = active & (self._time >= speed)
+        self._offX[stepped] += self._direction[stepped]*self._config.getHWalk()
+        self._stepaccum[stepped] += 1
+        self._time[stepped] = (self._time[stepped]-speed) % speed
+
+    def _verticalMove(self,active):
+        """
+        Moves each formation down and turns it around when its outermost live
+        alien is too close to the edge of the screen.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        config = self._config
+        cols = self._alive.any(axis=1)
+        live = active & cols.any(axis=1)
+        left = self._colX[cols.argmax(axis=1)]+self._offX
+        right = self._colX[len(self._colX)-1-cols[:,::-1].argmax(axis=1)]+self._offX
+        half = config.getAlienWidth()//2
+        turnLeft = live & (config.getHSep() > GAME_WIDTH-right-half)
+        turnRight = live & (left-half < config.getHSep())
+        self._offY -= config.getVWalk()*(turnLeft.astype(int)+turnRight)
+        self._offX += config.getHWalk()*(turnRight.astype(int)-turnLeft)
+        self._direction[turnLeft] = -1
+        self._direction[turnRight] = 1
+
+    def _addBolts(self,games,x,y,velocity):
+        """
+        Adds one bolt to each of the given games, in its first free slot.
+
+        Parameter games: which games get a bolt
+        Precondition: games is an int array of game indices
+
+        Parameter x, y: the center of each new bolt
+        Precondition: x and y are float arrays with the same length as games
+
+        Parameter velocity: the velocity of the new bolts
+        Precondition: velocity is an int or float
+        """
+        if games.size == 0:
+            return
+        if self._boltOn[games].all(axis=1).any():
+            grow = self._boltOn.shape[1]
+            self._boltOn = np.pad(self._boltOn,((0,0),(0,grow)))
+            self._boltX = np.pad(self._boltX,((0,0),(0,grow)))
+            self._boltY = np.pad(self._boltY,((0,0),(0,grow)))
+            self._boltV = np.pad(self._boltV,((0,0),(0,grow)))
+            self._boltPrevY = np.pad(self._boltPrevY,((0,0),(0,grow)))
+        slots = (~self._boltOn[games]).argmax(axis=1)
+        self._boltOn[games,slots] = True
+        self._boltX[games,slots] = x
+        self._boltY[games,slots] = y
+        self._boltV[games,slots] = velocity
+        self._boltPrevY[games,slots] = y
+
+    def _createBolt(self,firing):
+        """
+        Fires a player bolt in every game that holds 'up' and may fire.
+
+        Parameter firing: which games hold down 'up' and are being updated
+        Precondition: firing is a bool array of shape (size,)
+        """
+        games = np.nonzero(firing & self._hasShip & self._newBolt)[0]
+        self._addBolts(games,self._shipX[games],
+        SHIP_BOTTOM+SHIP_HEIGHT+BOLT_HEIGHT/2,BOLT_SPEED)
+
+    def _changeBolt(self,active):
+        """
+        Moves every bolt by its velocity, remembering where it was.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        self._boltPrevY[active] = self._boltY[active]
+        self._boltY += np.where(self._boltOn & active[:,None],self._boltV,0)
+
+    def _removeBolt(self,active):
+        """
+        Removes the bolts that have left the screen. If a player bolt left, that
+        player may fire again.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        on = self._boltOn & active[:,None]
+        top = on & (self._boltY-BOLT_HEIGHT/2 >= GAME_HEIGHT)
+        gone = top | (on & (self._boltY+BOLT_HEIGHT/2 <= 0))
+        self._newBolt |= (top & (self._boltV > 0)).any(axis=1)
+        self._boltOn &= ~gone
+
+    def _oneBolt(self,active):
+        """
+        Stops each player from firing while one of their bolts is on screen.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        flying = (self._boltOn & (self._boltV > 0)).any(axis=1)
+        self._newBolt &= ~(active & flying)
+
+    def _chooseAlien(self,choosing):
+        """
+        Picks a random column that still has aliens in each given game, and the
+        lowest alien in it as the next shooter.
+
+        Parameter choosing: which games pick a new shooter
+        Precondition: choosing is a bool array of shape (size,)
+        """
+        games = np.nonzero(choosing)[0]
+        if games.size == 0:
+            return
+        cols = self._alive[games].any(axis=1)
+        counts = cols.sum(axis=1)
+        games = games[counts > 0]
+        cols = cols[counts > 0]
+        counts = counts[counts > 0]
+        pick = (self._rng.random(games.size)*counts).astype(int)
+        column = (cols.cumsum(axis=1) > pick[:,None]).argmax(axis=1)
+        self._shooterCol[games] = column
+        self._shooterRow[games] = self._alive[games,:,column].argmax(axis=1)
+
+    def _shooterAlive(self):
+        """
+        Returns which games have a shooter that has not been destroyed.
+        """
+        chosen = self._shooterRow >= 0
+        games = np.arange(self._size)
+        return chosen & self._alive[games,np.maximum(self._shooterRow,0),
+        np.maximum(self._shooterCol,0)]
+
+    def _alienBolt(self,active):
+        """
+        Fires a bolt from each shooter whose formation has taken _alienRate
+        steps since its last bolt.
+
+        A shooter that was destroyed still fires, from where it was destroyed,
+        as in Wave. A game with no shooter yet chooses one first.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        self._chooseAlien(active & (self._shooterRow < 0) &
+        (self._stepaccum == self._alienRate))
+        alive = self._shooterAlive()
+        self._shooterX[alive] = (self._colX[self._shooterCol[alive]]+
+        self._offX[alive])
+        self._shooterY[alive] = (self._rowY[self._shooterRow[alive]]+
+        self._offY[alive])
+        games = np.nonzero(active & (self._shooterRow >= 0) &
+        (self._stepaccum == self._alienRate))[0]
+        self._addBolts(games,self._shooterX[games],
+        self._shooterY[games]-self._config.getAlienHeight()//2,-BOLT_SPEED)
+        self._stepaccum[games] = 0
+        self._alienRate[games] = self._rng.integers(1,BOLT_RATE+1,games.size)
+
+    def _collision(self,active):
+        """
+        Removes the aliens hit by player bolts and the ships hit by alien bolts,
+        along with the bolts that hit them.
+
+        Each player bolt is mapped to the cells of its formation that it swept
+        over in its last move, and hits the first live one in row order, as in
+        Wave. The slots are handled one at a time, but only slots that hold a
+        player bolt in some game are visited.
+
+        Parameter active: which games are being updated
+        Precondition: active is a bool array of shape (size,)
+        """
+        config = self._config
+        rows = config.getRows()
+        cols = config.getAliensInRow()
+        on = self._boltOn & active[:,None]
+        player = on & (self._boltV > 0)
+        hpitch = config.getHSep()+config.getAlienWidth()
+        vpitch = config.getVSep()+config.getAlienHeight()
+        width = (config.getAlienWidth()+BOLT_WIDTH)/2
+        nowhere = rows*cols
+        for slot in np.nonzero(player.any(axis=0))[0]:
+            games = np.nonzero(player[:,slot])[0]
+            x0 = self._colX[0]+self._offX[games]
+            y0 = self._rowY[0]+self._offY[games]
+            bx = self._boltX[games,slot]
+            bottom,top = _sweep(self._boltPrevY[games,slot],
+            self._boltY[games,slot])
+            first = np.floor((bottom-config.getAlienHeight()/2-y0)/vpitch
+            ).astype(int)
+            span = int(((top-bottom).max()+config.getAlienHeight())//vpitch)+2
+            best = np.full(games.size,nowhere)
+            for dx in (-BOLT_WIDTH/2,BOLT_WIDTH/2):
+                col = np.rint((bx+dx-x0)/hpitch).astype(int)
+                inx = ((col >= 0) & (col < cols) &
+                (abs(bx-(x0+col*hpitch)) < width))
+                col = np.clip(col,0,cols-1)
+                for step in range(span):
+                    row = first+step
+                    cy = y0+row*vpitch
+                    inside = inx & ((row >= 0) & (row < rows) &
+                    (bottom < cy+config.getAlienHeight()/2) &
+                    (top > cy-config.getAlienHeight()/2))
+                    row = np.clip(row,0,rows-1)
+                    inside &= self._alive[games,row,col]
+                    best = np.where(inside,np.minimum(best,row*cols+col),best)
+            hit = best < nowhere
+            games = games[hit]
+            row = best[hit]//cols
+            col = best[hit] % cols
+            self._alive[games,row,col] = False
+            self._score[games] += self._rowScore[row]
+            self._boltOn[games,slot] = False
+            self._newBolt[games] = True
+
+        enemy = on & (self._boltV < 0) & self._hasShip[:,None]
+        shipY = SHIP_BOTTOM+SHIP_HEIGHT/2
+        inx = (abs(self._boltX-self._shipX[:,None]) <
+        (SHIP_WIDTH+BOLT_WIDTH)/2)
+        bottom,top = _sweep(self._boltPrevY,self._boltY)
+        iny = (bottom < shipY+SHIP_HEIGHT/2) & (top > shipY-SHIP_HEIGHT/2)
+        hits = enemy & inx & iny
+        games = np.nonzero(hits.any(axis=1))[0]
+        self._boltOn[games,hits[games].argmax(axis=1)] = False
+        self._hasShip[games] = False
+        self._newBolt[games] = True
+        self._lives[games] -= 1
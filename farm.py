@@ -0,0 +1,671 @@
+"""
+Simulation farm for Alien Invaders
+
+This module runs large numbers of headless games across processes and
+machines. The unit of work is a job: play one Wave until getGameDone() with a
+given seed and policy. A Coordinator hands jobs out over TCP to any number of
+worker processes, and streams the result of every game back to the caller.
+
+Each worker has its own queue of jobs on the coordinator. A worker takes jobs
+from the front of its own queue; when that is empty it takes a share of the
+jobs nobody has claimed yet, and when those are gone too it steals half of
+the back of the longest queue of another worker. Workers send a heartbeat
+while they play, and a worker that goes quiet or disconnects is treated as
+dead: the jobs it was playing are retried on another worker.
+
+Messages in both directions are JSON objects, one per line.
+
+Everything runs on localhost by default, so the whole farm can be tried on
+one machine:
+
+    python farm.py --workers=4 --games=1000 --policy=sweep
+
+To add workers on other machines, start the coordinator with --host=0.0.0.0
+and a fixed --port, then run on each machine
+
+    python farm.py --connect=HOST:PORT
+
+Every job carries the size and speed of its wave (the key of a GameConfig),
+so one farm can play games of many configurations and the workers need no
+arguments of their own. The coordinator takes the default configuration
+from the command line, just like the game itself (python farm.py 3 4 0.5
+--games=100). Write the options with '=' so that their values are not
+mistaken for these.
+
+sjg276
+"""
+import os
+# the workers only play headless games, so they run headless unless
+# INVADERS_HEADLESS is set to 0. This has to happen before consts.py is read
+os.environ.setdefault('INVADERS_HEADLESS','1')
+from consts import *
+from wave import *
+from policies import *
+from leaderboard import *
+import headless
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import queue
+import socket
+import sys
+import threading
+import time
+
+
+def playJob(job,waves=None):
+    """
+    Plays the game described by job and returns its result as a dictionary.
+
+    The result has the keys 'id', 'score', 'lives', 'frames', 'done' and 'won'.
+    If the game hit maxFrames before it was over, 'done' is False and 'won' is
+    None.
+
+    Parameter job: the game to play
+    Precondition: job is a dictionary with the keys 'id', 'seed' and 'policy',
+    and optionally 'config' (the key of a GameConfig, as a list), 'dt' (the
+    seconds per frame) and 'maxFrames'
+
+    Parameter waves: the waves played so far, by the key of their GameConfig,
+    to reset instead of making a new wave
+    Precondition: waves is a dictionary filled only by playJob, or None
+    """
+    config = GameConfig(*job['config']) if 'config' in job else GameConfig()
+    key = config.getKey()
+    if waves is not None and key in waves:
+        wave = waves[key]
+        wave.reset(job['seed'])
+    else:
+        wave = Wave(job['seed'],config)
+        if waves is not None:
+            waves[key] = wave
+    policy = getPolicy(job['policy'],job['seed'])
+    frames = headless.runWave(wave,headless.GInput(),job.get('dt',1/60),
+    job.get('maxFrames'),policy)
+    return {'id': job['id'], 'score': wave.getScore(), 'lives': wave.getLives(),
+            'frames': frames, 'done': wave.getGameDone(),
+            'won': wave.getGameWon()}
+
+
+def _send(sock,lock,message):
+    """
+    Sends message to sock as one line of JSON, holding lock while sending.
+
+    Parameter sock: the socket to send to
+    Precondition: sock is a connected socket
+
+    Parameter lock: the lock that guards sending on sock
+    Precondition: lock is a threading.Lock
+
+    Parameter message: the message to send
+    Precondition: message is a dictionary that can be converted to JSON
+    """
+    data = (json.dumps(message)+'\n').encode()
+    with lock:
+        sock.sendall(data)
+
+
+def runWorker(host,port,name=None):
+    """
+    Connects to a coordinator and plays the jobs it sends until it says stop.
+
+    A background thread sends a heartbeat every second, so the coordinator
+    knows the worker is alive even while it plays a long game. If a job raises
+    an error, the error is reported and the worker carries on.
+
+    Parameter host: the host name or address of the coordinator
+    Precondition: host is a string
+
+    Parameter port: the port of the coordinator
+    Precondition: port is an int > 0
+
+    Parameter name: the name of the worker, used in the results
+    Precondition: name is a string, or None for the host name and process id
+    """
+    if name is None:
+        name = socket.gethostname()+':'+str(multiprocessing.current_process().pid)
+    sock = socket.create_connection((host,port))
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(1.0):
+            try:
+                _send(sock,lock,{'type': 'ping'})
+            except OSError:
+                return
+    threading.Thread(target=beat,daemon=True).start()
+
+    waves = {}
+    try:
+        _send(sock,lock,{'type': 'hello', 'name': name})
+        for line in sock.makefile('r'):
+            message = json.loads(line)
+            if message['type'] == 'stop':
+                break
+            for job in message['jobs']:
+                try:
+                    result = playJob(job,waves)
+                    result['worker'] = name
+                    _send(sock,lock,{'type': 'result', 'result': result})
+                except Exception as e:
+                    _send(sock,lock,{'type': 'error', 'id': job['id'],
+                    'message': repr(e)})
+    except OSError:
+        pass # The coordinator went away
+    finally:
+        stopped.set()
+        sock.close()
+
+
+def startWorkers(host,port,count):
+    """
+    Starts count worker processes on this machine and returns them.
+
+    Parameter host: the host name or address of the coordinator
+    Precondition: host is a string
+
+    Parameter port: the port of the coordinator
+    Precondition: port is an int > 0
+
+    Parameter count: the number of workers to start
+    Precondition: count is an int >= 0
+    """
+    workers = []
+    for pos in range(count):
+        process = multiprocessing.Process(target=runWorker,args=(host,port),
+        daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+class _Link(object):
+    """
+    A class for the coordinator's view of one connected worker.
+    """
+    # Attribute name: the name the worker gave in its hello
+    # Invariant: name is a string
+    #
+    # Attribute writer: the stream used to send to the worker
+    # Invariant: writer is an asyncio.StreamWriter
+    #
+    # Attribute queue: the jobs waiting for this worker, in order
+    # Invariant: queue is a collections.deque of job dictionaries
+    #
+    # Attribute running: the jobs sent to the worker and not yet finished
+    # Invariant: running is a dictionary from job id to job dictionary
+    #
+    # Attribute seen: when a message last came from the worker
+    # Invariant: seen is a float, in the time of time.monotonic
+
+    def __init__(self,writer):
+        """
+        Initializes the link for a worker that has just connected.
+
+        Parameter writer: the stream used to send to the worker
+        Precondition: writer is an asyncio.StreamWriter
+        """
+        self.name = '?'
+        self.writer = writer
+        self.queue = collections.deque()
+        self.running = {}
+        self.seen = time.monotonic()
+
+
+class Coordinator(object):
+    """
+    A class to hand out jobs to workers and collect their results.
+
+    The coordinator runs an asyncio server in a background thread. The methods
+    start, submit, results and stop are called from the caller's thread; every
+    other method runs in the server thread.
+
+    Each job may be tried retries+1 times in all. A job that fails that often
+    gives a result with the key 'error' instead of a score.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _host: the address the server listens on
+    # Invariant: _host is a string
+    #
+    # Attribute _port: the port the server listens on (0 until started, if
+    # the system picks the port)
+    # Invariant: _port is an int >= 0
+    #
+    # Attribute _timeout: how many seconds a worker may stay quiet
+    # Invariant: _timeout is a float > 0
+    #
+    # Attribute _retries: how many times a job is retried after failing
+    # Invariant: _retries is an int >= 0
+    #
+    # Attribute _prefetch: how many jobs a worker may hold at once
+    # Invariant: _prefetch is an int > 0
+    #
+    # Attribute _pending: the jobs not in the queue of any worker
+    # Invariant: _pending is a collections.deque of job dictionaries
+    #
+    # Attribute _links: the connected workers
+    # Invariant: _links is a list of _Link objects
+    #
+    # Attribute _tries: how many times each unfinished job has been sent
+    # Invariant: _tries is a dictionary from job id to int
+    #
+    # Attribute _results: the finished results, for the caller's thread
+    # Invariant: _results is a queue.Queue of result dictionaries
+    #
+    # Attribute _submitted: the number of jobs submitted so far
+    # Invariant: _submitted is an int >= 0
+    #
+    # Attribute _loop: the event loop of the server thread
+    # Invariant: _loop is an asyncio event loop, or None if not started
+    #
+    # Attribute _thread: the server thread
+    # Invariant: _thread is a threading.Thread, or None if not started
+
+    def getAddress(self):
+        """
+        Returns the (host,port) the coordinator is listening on
+        """
+        return (self._host,self._port)
+
+    def __init__(self,host='127.0.0.1',port=0,timeout=5.0,retries=2,prefetch=2):
+        """
+        Initializes a coordinator that is not started yet.
+
+        Parameter host: the address to listen on
+        Precondition: host is a string
+
+        Parameter port: the port to listen on
+        Precondition: port is an int >= 0; 0 lets the system pick a free port
+
+        Parameter timeout: how many seconds a worker may stay quiet before it
+        is treated as dead
+        Precondition: timeout is a number > 0
+
+        Parameter retries: how many times a job is retried after failing
+        Precondition: retries is an int >= 0
+
+        Parameter prefetch: how many jobs a worker may hold at once
+        Precondition: prefetch is an int > 0
+        """
+        assert type(port) == int and port >= 0,repr(port)+' is not a valid port'
+        assert timeout > 0,repr(timeout)+' is not a valid timeout'
+        assert type(retries) == int and retries >= 0,repr(retries)+\
+        ' is not a valid number of retries'
+        assert type(prefetch) == int and prefetch > 0,repr(prefetch)+\
+        ' is not a valid prefetch'
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._retries = retries
+        self._prefetch = prefetch
+        self._pending = collections.deque()
+        self._links = []
+        self._tries = {}
+        self._results = queue.Queue()
+        self._submitted = 0
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the server thread and returns the (host,port) it listens on.
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            server = self._loop.run_until_complete(asyncio.start_server(
+            self._handle,self._host,self._port))
+            self._port = server.sockets[0].getsockname()[1]
+            reaper = self._loop.create_task(self._reap())
+            ready.set()
+            self._loop.run_forever()
+            reaper.cancel()
+            server.close()
+            for link in self._links:
+                link.writer.close()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve,daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.getAddress()
+
+    def submit(self,jobs):
+        """
+        Adds jobs to be played and returns their ids.
+
+        Each job is a dictionary with the keys 'seed' and 'policy', and
+        optionally 'config', 'dt' and 'maxFrames' (see playJob). The coordinator adds the
+        key 'id'. The jobs are shared out between the workers connected now;
+        workers that connect later steal from them.
+
+        Parameter jobs: the jobs to play
+        Precondition: jobs is a list of dictionaries; the coordinator is started
+        """
+        ids = []
+        added = []
+        for job in jobs:
+            job = dict(job)
+            job['id'] = self._submitted
+            self._submitted += 1
+            ids.append(job['id'])
+            added.append(job)
+        self._loop.call_soon_threadsafe(self._add,added)
+        return ids
+
+    def results(self,timeout=None):
+        """
+        Yields the result of every submitted job as soon as it is finished.
+
+        The results come in the order they finish, not the order submitted.
+        This stops once every job submitted so far has a result.
+
+        Parameter timeout: how many seconds to wait for each result before
+        raising queue.Empty
+        Precondition: timeout is a number > 0, or None to wait forever
+        """
+        for pos in range(self._submitted):
+            yield self._results.get(timeout=timeout)
+
+    def stop(self):
+        """
+        Tells every worker to stop and shuts down the server thread.
+        """
+        if self._loop is None:
+            return
+
+        def finish():
+            for link in self._links:
+                self._write(link,{'type': 'stop'})
+            self._loop.stop()
+        self._loop.call_soon_threadsafe(finish)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+
+    def _add(self,jobs):
+        """
+        Shares the given jobs out between the connected workers.
+
+        Parameter jobs: the jobs to add
+        Precondition: jobs is a list of job dictionaries
+        """
+        for job in jobs:
+            self._tries[job['id']] = 0
+        if len(self._links) == 0:
+            self._pending.extend(jobs)
+            return
+        share = -(-len(jobs)//len(self._links))
+        for pos in range(len(self._links)):
+            self._links[pos].queue.extend(jobs[pos*share:(pos+1)*share])
+        for link in self._links:
+            self._feed(link)
+
+    def _take(self,link):
+        """
+        Returns the next job for link, or None if there is no work anywhere.
+
+        The job comes from the worker's own queue if it has one. Otherwise the
+        worker claims a share of the pending jobs, and if there are none, it
+        steals the back half of the longest queue of another worker.
+
+        Parameter link: the worker that needs a job
+        Precondition: link is a _Link object
+        """
+        if len(link.queue) == 0 and len(self._pending) > 0:
+            share = max(1,len(self._pending)//(2*len(self._links)))
+            for pos in range(min(share,len(self._pending))):
+                link.queue.append(self._pending.popleft())
+        if len(link.queue) == 0:
+            victim = max(self._links,key=lambda other: len(other.queue))
+            for pos in range((len(victim.queue)+1)//2):
+                link.queue.appendleft(victim.queue.pop())
+        if len(link.queue) == 0:
+            return None
+        return link.queue.popleft()
+
+    def _feed(self,link):
+        """
+        Sends jobs to link until it holds as many as it may.
+
+        Parameter link: the worker to send to
+        Precondition: link is a _Link object
+        """
+        jobs = []
+        while len(link.running)+len(jobs) < self._prefetch:
+            job = self._take(link)
+            if job is None:
+                break
+            jobs.append(job)
+        if len(jobs) > 0:
+            for job in jobs:
+                link.running[job['id']] = job
+                self._tries[job['id']] += 1
+            self._write(link,{'type': 'jobs', 'jobs': jobs})
+
+    def _write(self,link,message):
+        """
+        Sends message to link as one line of JSON, ignoring a closed stream.
+
+        Parameter link: the worker to send to
+        Precondition: link is a _Link object
+
+        Parameter message: the message to send
+        Precondition: message is a dictionary that can be converted to JSON
+        """
+        if not link.writer.is_closing():
+            link.writer.write((json.dumps(message)+'\n').encode())
+
+    def _finish(self,result):
+        """
+        Records the final result of a job and hands it to the caller.
+
+        Parameter result: the result of the job
+        Precondition: result is a dictionary with the key 'id'
+        """
+        del self._tries[result['id']]
+        self._results.put(result)
+
+    def _retry(self,job,reason):
+        """
+        Puts a failed job back at the front of the pending jobs, or gives up on
+        it if it has been tried too often.
+
+        Parameter job: the job that failed
+        Precondition: job is a job dictionary
+
+        Parameter reason: why the job failed
+        Precondition: reason is a string
+        """
+        if self._tries[job['id']] > self._retries:
+            self._finish({'id': job['id'], 'error': reason})
+        else:
+            self._pending.appendleft(job)
+
+    def _drop(self,link,reason):
+        """
+        Forgets a dead worker, retrying its running jobs and releasing its queue.
+
+        Parameter link: the worker that died
+        Precondition: link is a _Link object
+
+        Parameter reason: why the worker is treated as dead
+        Precondition: reason is a string
+        """
+        if link not in self._links:
+            return
+        self._links.remove(link)
+        link.writer.close()
+        self._pending.extendleft(reversed(link.queue))
+        link.queue.clear()
+        for job in link.running.values():
+            self._retry(job,reason)
+        link.running.clear()
+        for other in self._links:
+            self._feed(other)
+
+    async def _handle(self,reader,writer):
+        """
+        Talks to one worker for as long as it is connected.
+
+        Parameter reader: the stream to read from the worker
+        Precondition: reader is an asyncio.StreamReader
+
+        Parameter writer: the stream to write to the worker
+        Precondition: writer is an asyncio.StreamWriter
+        """
+        link = _Link(writer)
+        self._links.append(link)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                link.seen = time.monotonic()
+                message = json.loads(line)
+                if message['type'] == 'hello':
+                    link.name = message['name']
+                elif message['type'] == 'result':
+                    result = message['result']
+                    if link.running.pop(result['id'],None) is not None:
+                        self._finish(result)
+                elif message['type'] == 'error':
+                    job = link.running.pop(message['id'],None)
+                    if job is not None:
+                        self._retry(job,message['message'])
+                self._feed(link)
+        except (OSError,ValueError):
+            pass # Treat a broken connection or message like a disconnect
+        self._drop(link,'worker '+link.name+' disconnected')
+
+    async def _reap(self):
+        """
+        Drops every worker that has been quiet for longer than the timeout.
+        """
+        while True:
+            await asyncio.sleep(self._timeout/4)
+            now = time.monotonic()
+            for link in list(self._links):
+                if now-link.seen > self._timeout:
+                    self._drop(link,'worker '+link.name+' timed out')
+
+
+def runFarm(jobs,workers=None,timeout=5.0,retries=2):
+    """
+    Plays jobs on local worker processes, yielding each result as it finishes.
+
+    This starts a coordinator on localhost and the workers, and shuts them all
+    down when every result is in.
+
+    Parameter jobs: the jobs to play (see Coordinator.submit)
+    Precondition: jobs is a list of dictionaries
+
+    Parameter workers: the number of worker processes
+    Precondition: workers is an int > 0, or None for one per core
+
+    Parameter timeout: how many seconds a worker may stay quiet
+    Precondition: timeout is a number > 0
+
+    Parameter retries: how many times a job is retried after failing
+    Precondition: retries is an int >= 0
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    coordinator = Coordinator(timeout=timeout,retries=retries)
+    host,port = coordinator.start()
+    processes = startWorkers(host,port,workers)
+    try:
+        coordinator.submit(jobs)
+        for result in coordinator.results():
+            yield result
+    finally:
+        coordinator.stop()
+        for process in processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    """
+    Runs the farm from the command line.
+
+    With --connect, this runs a worker. Otherwise it runs a coordinator, with
+    --workers local workers, that plays --games games and prints each result
+    as a line of JSON followed by a summary. With --leaderboard (or
+    INVADERS_LEADERBOARD), every result is also added to that leaderboard.
+    """
+    parser = argparse.ArgumentParser(description='Play many headless games.')
+    parser.add_argument('rows',nargs='?',type=int,
+    help='the number of rows of aliens (see parseConfig)')
+    parser.add_argument('perrow',nargs='?',type=int,
+    help='the number of aliens in a row (see parseConfig)')
+    parser.add_argument('speed',nargs='?',type=float,
+    help='the seconds between alien steps (see parseConfig)')
+    parser.add_argument('--connect',metavar='HOST:PORT',
+    help='run a worker for the coordinator at HOST:PORT')
+    parser.add_argument('--host',default='127.0.0.1',
+    help='the address the coordinator listens on')
+    parser.add_argument('--port',type=int,default=0,
+    help='the port the coordinator listens on (default: any free port)')
+    parser.add_argument('--workers',type=int,default=multiprocessing.cpu_count(),
+    help='the number of local workers to start')
+    parser.add_argument('--games',type=int,default=100,
+    help='the number of games to play')
+    parser.add_argument('--seed',type=int,default=0,
+    help='the seed of the first game; the others count up from it')
+    parser.add_argument('--policy',default='sweep',choices=sorted(POLICIES),
+    help='the policy that plays every game')
+    parser.add_argument('--max-frames',type=int,default=None,
+    help='the largest number of frames in a game')
+    parser.add_argument('--leaderboard',metavar='PATH',default=LEADERBOARD_PATH,
+    help='the leaderboard database to add every result to (see leaderboard.py)')
+    args = parser.parse_intermixed_args()
+
+    if args.connect is not None:
+        host,port = args.connect.rsplit(':',1)
+        runWorker(host,int(port))
+        return
+
+    words = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    config = list(parseConfig([sys.argv[0]]+words).getKey())
+    jobs = [{'seed': args.seed+pos, 'policy': args.policy, 'config': config,
+             'maxFrames': args.max_frames} for pos in range(args.games)]
+    coordinator = Coordinator(args.host,args.port)
+    host,port = coordinator.start()
+    print('coordinator listening on '+host+':'+str(port),flush=True)
+    processes = startWorkers(host,port,args.workers)
+    board = None
+    if args.leaderboard is not None:
+        board = Leaderboard(args.leaderboard)
+        gameConfig = GameConfig(*config)
+    start = time.perf_counter()
+    won = 0
+    frames = 0
+    coordinator.submit(jobs)
+    for result in coordinator.results():
+        print(json.dumps(result),flush=True)
+        won += 1 if result.get('won') else 0
+        frames += result.get('frames',0)
+        if board is not None and 'error' not in result:
+            board.addResult(result['score'],result['won'] if result['done']
+            else None,result['lives'],result['frames'],result['frames']/60,
+            gameConfig,args.seed+result['id'],args.policy)
+    seconds = time.perf_counter()-start
+    coordinator.stop()
+    for process in processes:
+        process.join()
+    if board is not None:
+        board.close()
+    print('%d games, %d won, %d frames in %.2fs (%.0f frames/s)' %
+    (len(jobs),won,frames,seconds,frames/seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+"""
+Formation module for Alien Invaders
+
+This module contains the class Formation, which keeps track of where the
+alien wave is on screen. The aliens are created on a fixed lattice: columns
+are the alien width plus the horizontal separation apart, and rows are the
+alien height plus the vertical separation apart (see GameConfig).
+Every alien that is still alive moves by the same amount at every step, so the
+whole wave can be described by the position of the alien in row 0, column 0.
+
+Knowing that position, a point on screen maps directly to the one or two
+cells of the lattice that could hold it. Wave uses this to test a bolt
+against only those cells instead of against every alien.
+
+Formation also keeps an index of which cells still hold a live alien. The
+index is only updated when an alien dies, and it answers every question Wave
+asks each frame (how many aliens are left, which columns are the outermost,
+which row is the lowest, which alien is at the bottom of a column) without
+looking at the whole wave.
+
+Like the models, Formation may only access consts.py. Its size comes from
+the GameConfig of the wave, which it is given.
+
+sjg276
+"""
+from consts import *
+import math
+
+
+class Formation(object):
+    """
+    A class to represent the lattice of cells that holds the alien wave.
+
+    Row 0 is the bottom row and column 0 is the leftmost column, matching the
+    2d list of aliens in Wave. A cell is still part of the lattice after its
+    alien is destroyed. Wave must call the method kill whenever it destroys
+    an alien so that the index stays correct.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _rows: the number of rows in the lattice
+    # Invariant: _rows is an int > 0
+    #
+    # Attribute _cols: the number of columns in the lattice
+    # Invariant: _cols is an int > 0
+    #
+    # Attribute _x: the horizontal coordinate of the center of column 0
+    # Invariant: _x is an int or float
+    #
+    # Attribute _y: the vertical coordinate of the center of row 0
+    # Invariant: _y is an int or float
+    #
+    # Attribute _width: the width of an alien
+    # Invariant: _width is an int > 0
+    #
+    # Attribute _height: the height of an alien
+    # Invariant: _height is an int > 0
+    #
+    # Attribute _hpitch: the horizontal distance between column centers
+    # Invariant: _hpitch is the horizontal separation plus _width
+    #
+    # Attribute _vpitch: the vertical distance between row centers
+    # Invariant: _vpitch is the vertical separation plus _height
+    #
+    # Attribute _alive: which cells still hold a live alien
+    # Invariant: _alive is a _rows by _cols 2d list of booleans
+    #
+    # Attribute _count: the number of live aliens
+    # Invariant: _count is an int between 0 and _rows*_cols
+    #
+    # Attribute _colCounts: the number of live aliens in each column
+    # Invariant: _colCounts is a list of _cols ints between 0 and _rows
+    #
+    # Attribute _rowCounts: the number of live aliens in each row
+    # Invariant: _rowCounts is a list of _rows ints between 0 and _cols
+    #
+    # Attribute _colBottoms: the lowest live row of each column
+    # Invariant: _colBottoms is a list of _cols ints; the entry for a column
+    # with no live aliens is _rows
+    #
+    # Attribute _liveCols: the columns that still have a live alien, in no
+    # particular order
+    # Invariant: _liveCols is a list of distinct ints in 0.._cols-1
+    #
+    # Attribute _livePos: where each column is in _liveCols
+    # Invariant: _livePos is a list of _cols ints; _liveCols[_livePos[c]] == c
+    # for every column c in _liveCols
+    #
+    # Attribute _left: the leftmost column with a live alien
+    # Invariant: _left is an int; it is _cols if there are no live aliens
+    #
+    # Attribute _right: the rightmost column with a live alien
+    # Invariant: _right is an int; it is -1 if there are no live aliens
+    #
+    # Attribute _bottom: the lowest row with a live alien
+    # Invariant: _bottom is an int; it is _rows if there are no live aliens
+
+    def getX(self):
+        """
+        Returns the horizontal coordinate of the center of column 0
+        """
+        return self._x
+
+    def getY(self):
+        """
+        Returns the vertical coordinate of the center of row 0
+        """
+        return self._y
+
+    def getColumnX(self,col):
+        """
+        Returns the horizontal coordinate of the center of the given column
+
+        Parameter: col is the column index
+        Precondition: col is an int
+        """
+        return self._x+col*self._hpitch
+
+    def getRowY(self,row):
+        """
+        Returns the vertical coordinate of the center of the given row
+
+        Parameter: row is the row index
+        Precondition: row is an int
+        """
+        return self._y+row*self._vpitch
+
+    def __init__(self,config,x,y):
+        """
+        Initializes a formation with the size of a wave and the center of
+        cell (0,0).
+
+        Parameter: config is the size and speed of the wave
+        Precondition: config is a GameConfig object
+
+        Parameter: x is the horizontal coordinate of the center of column 0
+        Precondition: x is a float or int
+
+        Parameter: y is the vertical coordinate of the center of row 0
+        Precondition: y is a float or int
+        """
+        rows = config.getRows()
+        cols = config.getAliensInRow()
+        assert type(x) == int or type(x) == float,repr(x)+' is not a valid type'
+        assert type(y) == int or type(y) == float,repr(y)+' is not a valid type'
+
+        self._rows = rows
+        self._cols = cols
+        self._x = x
+        self._y = y
+        self._width = config.getAlienWidth()
+        self._height = config.getAlienHeight()
+        self._hpitch = config.getHSep()+self._width
+        self._vpitch = config.getVSep()+self._height
+
+        self._alive = [[True]*cols for row in range(rows)]
+        self._count = rows*cols
+        self._colCounts = [rows]*cols
+        self._rowCounts = [cols]*rows
+        self._colBottoms = [0]*cols
+        self._liveCols = list(range(cols))
+        self._livePos = list(range(cols))
+        self._left = 0
+        self._right = cols-1
+        self._bottom = 0
+
+    def reset(self,x,y):
+        """
+        Moves the lattice so that the center of cell (0,0) is (x,y), and makes
+        every cell hold a live alien again.
+
+        This puts the formation back the way __init__ left it, reusing its
+        lists, so a wave can start again without making a new formation.
+
+        Parameter: x is the horizontal coordinate of the center of column 0
+        Precondition: x is a float or int
+
+        Parameter: y is the vertical coordinate of the center of row 0
+        Precondition: y is a float or int
+        """
+        assert type(x) == int or type(x) == float,repr(x)+' is not a valid type'
+        assert type(y) == int or type(y) == float,repr(y)+' is not a valid type'
+        rows = self._rows
+        cols = self._cols
+        self._x = x
+        self._y = y
+        if self._count < rows*cols:
+            for line in self._alive:
+                if not all(line):
+                    line[:] = (True,)*cols
+            self._count = rows*cols
+            self._colCounts[:] = (rows,)*cols
+            self._rowCounts[:] = (cols,)*rows
+            self._colBottoms[:] = (0,)*cols
+            self._left = 0
+            self._right = cols-1
+            self._bottom = 0
+        self._liveCols[:] = range(cols)
+        self._livePos[:] = range(cols)
+
+    def move(self,dx,dy):
+        """
+        Moves the whole lattice by (dx,dy)
+
+        Wave must call this whenever it moves the aliens, by the same amount.
+
+        Parameter: dx is the horizontal distance to move
+        Precondition: dx is an int or float
+
+        Parameter: dy is the vertical distance to move
+        Precondition: dy is an int or float
+        """
+        self._x += dx
+        self._y += dy
+
+    def getColumnSpan(self,left,right):
+        """
+        Returns the range of columns whose aliens could overlap [left,right]
+
+        The range holds at most two columns when right-left is less than the
+        horizontal separation, and it is empty when the interval misses the lattice.
+        It is allowed to hold a column that does not actually overlap; the
+        caller makes the exact test.
+
+        Parameter: left is the horizontal coordinate of the left edge
+        Precondition: left is an int or float
+
+        Parameter: right is the horizontal coordinate of the right edge
+        Precondition: right is an int or float >= left
+        """
+        first = math.floor((left-self._x-self._width/2)/self._hpitch)
+        last = math.floor((right-self._x+self._width/2)/self._hpitch)
+        return range(max(first,0),min(last,self._cols-1)+1)
+
+    def getRowSpan(self,bottom,top):
+        """
+        Returns the range of rows whose aliens could overlap [bottom,top]
+
+        The range holds at most two rows when top-bottom is less than the
+        vertical separation, and it is empty when the interval misses the lattice.
+        It is allowed to hold a row that does not actually overlap; the
+        caller makes the exact test.
+
+        Parameter: bottom is the vertical coordinate of the bottom edge
+        Precondition: bottom is an int or float
+
+        Parameter: top is the vertical coordinate of the top edge
+        Precondition: top is an int or float >= bottom
+        """
+        first = math.floor((bottom-self._y-self._height/2)/self._vpitch)
+        last = math.floor((top-self._y+self._height/2)/self._vpitch)
+        return range(max(first,0),min(last,self._rows-1)+1)
+
+    def getAliveCount(self):
+        """
+        Returns the number of live aliens
+        """
+        return self._count
+
+    def isAlive(self,row,col):
+        """
+        Returns True if the given cell still holds a live alien
+
+        Parameter: row is the row index
+        Precondition: row is an int in 0..rows-1
+
+        Parameter: col is the column index
+        Precondition: col is an int in 0..cols-1
+        """
+        return self._alive[row][col]
+
+    def getLeftColumn(self):
+        """
+        Returns the leftmost column with a live alien, or None if there are none
+        """
+        return self._left if self._count > 0 else None
+
+    def getRightColumn(self):
+        """
+        Returns the rightmost column with a live alien, or None if there are none
+        """
+        return self._right if self._count > 0 else None
+
+    def getBottomRow(self):
+        """
+        Returns the lowest row with a live alien, or None if there are none
+        """
+        return self._bottom if self._count > 0 else None
+
+    def getColumnBottom(self,col):
+        """
+        Returns the lowest row of the given column with a live alien, or None if
+        the column is empty
+
+        Parameter: col is the column index
+        Precondition: col is an int in 0..cols-1
+        """
+        return self._colBottoms[col] if self._colCounts[col] > 0 else None
+
+    def getLiveColumnCount(self):
+        """
+        Returns the number of columns that still have a live alien
+        """
+        return len(self._liveCols)
+
+    def getLiveColumn(self,index):
+        """
+        Returns one of the columns that still have a live alien
+
+        Every index in 0..getLiveColumnCount()-1 gives a different column, so
+        a random index picks a column uniformly. The order of the columns
+        changes as columns empty out.
+
+        Parameter: index is which live column to return
+        Precondition: index is an int in 0..getLiveColumnCount()-1
+        """
+        return self._liveCols[index]
+
+    def kill(self,row,col):
+        """
+        Records that the alien in the given cell has been destroyed
+
+        This updates every part of the index. Each call takes constant time on
+        average over the life of the wave, since the scans only move forward.
+
+        Parameter: row is the row index
+        Precondition: row is an int in 0..rows-1, and the cell is alive
+
+        Parameter: col is the column index
+        Precondition: col is an int in 0..cols-1
+        """
+        assert self._alive[row][col],repr((row,col))+' is not a live alien'
+        self._alive[row][col] = False
+        self._count -= 1
+        self._rowCounts[row] -= 1
+        self._colCounts[col] -= 1
+
+        bottom = self._colBottoms[col]
+        while bottom < self._rows and not self._alive[bottom][col]:
+            bottom += 1
+        self._colBottoms[col] = bottom
+
+        if self._colCounts[col] == 0:
+            pos = self._livePos[col]
+            last = self._liveCols.pop()
+            if last != col:
+                self._liveCols[pos] = last
+                self._livePos[last] = pos
+            while self._left < self._cols and self._colCounts[self._left] == 0:
+                self._left += 1
+            while self._right >= 0 and self._colCounts[self._right] == 0:
+                self._right -= 1
+        while self._bottom < self._rows and self._rowCounts[self._bottom] == 0:
+            self._bottom += 1
+
+    def getLiveColumns(self):
+        """
+        Returns the columns that still have a live alien, as a tuple in the
+        order getLiveColumn uses
+        """
+        return tuple(self._liveCols)
+
+    def setLiveColumns(self,order):
+        """
+        Puts the columns that still have a live alien in the given order
+
+        The order decides which column each index of getLiveColumn gives, so
+        restoring it makes a restored wave pick the same columns as the saved
+        one did.
+
+        Parameter: order is the new order of the live columns
+        Precondition: order is a list or tuple holding exactly the columns in
+        getLiveColumns(), in any order
+        """
+        assert sorted(order) == sorted(self._liveCols),repr(order)+\
+        ' are not the live columns'
+        self._liveCols = list(order)
+        for pos in range(len(self._liveCols)):
+            self._livePos[self._liveCols[pos]] = pos
+
+    def checkInvariants(self):
+        """
+        Asserts every invariant of the index, recomputing it from _alive
+
+        This takes time proportional to the size of the lattice, so it is
+        only called in strict mode (see contracts.py).
+        """
+        rows = self._rows
+        cols = self._cols
+        assert len(self._alive) == rows and all(len(row) == cols for row in self._alive),\
+        'the lattice is not '+repr(rows)+' by '+repr(cols)
+        colCounts = [sum(self._alive[row][col] for row in range(rows))
+                     for col in range(cols)]
+        rowCounts = [sum(self._alive[row]) for row in range(rows)]
+        assert self._count == sum(rowCounts),repr(self._count)+' is not the live count'
+        assert self._colCounts == colCounts,repr(self._colCounts)+' are not the column counts'
+        assert self._rowCounts == rowCounts,repr(self._rowCounts)+' are not the row counts'
+        for col in range(cols):
+            if colCounts[col] > 0:
+                bottom = min(row for row in range(rows) if self._alive[row][col])
+                assert self._colBottoms[col] == bottom,repr(col)+' has the wrong bottom'
+        live = [col for col in range(cols) if colCounts[col] > 0]
+        assert sorted(self._liveCols) == live,repr(self._liveCols)+' are not the live columns'
+        for pos in range(len(self._liveCols)):
+            assert self._livePos[self._liveCols[pos]] == pos,repr(self._liveCols[pos])+\
+            ' is in the wrong place'
+        if self._count > 0:
+            assert self._left == live[0],repr(self._left)+' is not the left column'
+            assert self._right == live[-1],repr(self._right)+' is not the right column'
+            assert self._bottom == min(row for row in range(rows) if rowCounts[row] > 0),\
+            repr(self._bottom)+' is not the bottom row'
@@ -0,0 +1,339 @@
+"""
+Headless backend for Alien Invaders
+
+This module contains stand-ins for the game2d classes GImage, GRectangle,
+GPath, GLabel and GInput that only keep track of plain geometry. Nothing in
+this module opens a window or loads an image, so a Wave built on top of it
+can be stepped as fast as the CPU allows. This is what we use in CI, batch
+jobs and bot training, where no display exists.
+
+The classes only support the part of the game2d interface that the game
+actually uses: the attributes x, y, width and height, the method contains,
+and a draw method that does nothing. The input class GInput is scriptable,
+so a test or a bot can decide which keys are held down each frame.
+
+models.py and wave.py import this module instead of game2d whenever HEADLESS
+in consts.py is True.
+
+sjg276
+"""
+
+
+class GObject(object):
+    """
+    A class representing a rectangular object with no display.
+
+    The object has a center coordinate (x,y), a width and a height. The
+    colors and the name are kept only so that code written for game2d can
+    pass them as keywords.
+    """
+    # Attribute x: The horizontal coordinate of the object center
+    # Invariant: x is an int or float
+    #
+    # Attribute y: The vertical coordinate of the object center
+    # Invariant: y is an int or float
+    #
+    # Attribute width: The width of the object
+    # Invariant: width is an int or float >= 0
+    #
+    # Attribute height: The height of the object
+    # Invariant: height is an int or float >= 0
+    #
+    # Attribute linecolor: The outline color (ignored)
+    # Invariant: linecolor is any value
+    #
+    # Attribute fillcolor: The fill color (ignored)
+    # Invariant: fillcolor is any value
+    #
+    # Attribute name: The name of the object (ignored)
+    # Invariant: name is any value
+
+    @property
+    def left(self):
+        """
+        The horizontal coordinate of the object's left edge
+        """
+        return self.x-self.width/2
+
+    @property
+    def right(self):
+        """
+        The horizontal coordinate of the object's right edge
+        """
+        return self.x+self.width/2
+
+    @property
+    def top(self):
+        """
+        The vertical coordinate of the object's top edge
+        """
+        return self.y+self.height/2
+
+    @property
+    def bottom(self):
+        """
+        The vertical coordinate of the object's bottom edge
+        """
+        return self.y-self.height/2
+
+    def __init__(self,x=0,y=0,width=0,height=0,linecolor=None,fillcolor=None,
+    name=None,**keywords):
+        """
+        Initializes an object with a center coordinate, width and height.
+
+        Any keyword that game2d accepts but this backend does not need (such
+        as linewidth) is ignored.
+
+        Parameter: x is the horizontal coordinate of the object center
+        Precondition: x is a float or int
+
+        Parameter: y is the vertical coordinate of the object center
+        Precondition: y is a float or int
+
+        Parameter: width is the width of the object
+        Precondition: width is a float or int >= 0
+
+        Parameter: height is the height of the object
+        Precondition: height is a float or int >= 0
+        """
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.linecolor = linecolor
+        self.fillcolor = fillcolor
+        self.name = name
+
+    def contains(self,point):
+        """
+        Returns True if point is strictly inside the object's bounding box
+
+        This matches the game2d test for an object that is not rotated.
+
+        Parameter point: the point to check
+        Precondition: point is a list or tuple of two numbers
+        """
+        return (abs(point[0]-self.x) < self.width/2 and
+                abs(point[1]-self.y) < self.height/2)
+
+    def draw(self,view):
+        """
+        Does nothing, as there is no display to draw to.
+
+        Parameter view: the game view (ignored)
+        Precondition: view is any value
+        """
+        pass
+
+
+class GRectangle(GObject):
+    """
+    A class representing a rectangle with no display.
+    """
+    pass
+
+
+class GImage(GObject):
+    """
+    A class representing an image with no display.
+
+    The image file is never loaded. The name of the file is kept in the
+    attribute source.
+    """
+    # Attribute source: The name of the image file
+    # Invariant: source is a string or None
+
+    def __init__(self,source=None,**keywords):
+        """
+        Initializes an image with a center coordinate, width, height and source.
+
+        Parameter: source is the name of the image file
+        Precondition: source is a string or None
+        """
+        super().__init__(**keywords)
+        self.source = source
+
+
+class GLabel(GObject):
+    """
+    A class representing a text label with no display.
+    """
+    # Attribute text: The text of the label
+    # Invariant: text is a string
+    #
+    # Attribute font_size: The size of the font
+    # Invariant: font_size is an int or float > 0
+    #
+    # Attribute font_name: The name of the font file
+    # Invariant: font_name is a string or None
+
+    def __init__(self,text='',font_size=12,font_name=None,**keywords):
+        """
+        Initializes a label with a center coordinate, text and font.
+
+        Parameter: text is the text of the label
+        Precondition: text is a string
+
+        Parameter: font_size is the size of the font
+        Precondition: font_size is an int or float > 0
+
+        Parameter: font_name is the name of the font file
+        Precondition: font_name is a string or None
+        """
+        super().__init__(**keywords)
+        self.text = text
+        self.font_size = font_size
+        self.font_name = font_name
+
+
+class GPath(GObject):
+    """
+    A class representing a line path with no display.
+    """
+    # Attribute points: The coordinates of the path as a flat list
+    # Invariant: points is a list of numbers with even length
+    #
+    # Attribute linewidth: The width of the path
+    # Invariant: linewidth is an int or float >= 0
+
+    def __init__(self,points=(),linewidth=1,**keywords):
+        """
+        Initializes a path through the given points.
+
+        Parameter: points is the coordinates of the path as a flat list
+        Precondition: points is a list or tuple of numbers with even length
+
+        Parameter: linewidth is the width of the path
+        Precondition: linewidth is an int or float >= 0
+        """
+        super().__init__(**keywords)
+        self.points = list(points)
+        self.linewidth = linewidth
+
+
+class GView(object):
+    """
+    A class representing a game view with no display.
+
+    Drawing to this view does nothing. It exists so that Wave.draw can be
+    called in a headless run.
+    """
+
+    def draw(self,cmd):
+        """
+        Does nothing, as there is no display to draw to.
+
+        Parameter cmd: the drawing command (ignored)
+        Precondition: cmd is any value
+        """
+        pass
+
+
+class GInput(object):
+    """
+    A class representing scriptable keyboard input.
+
+    Instead of listening to a keyboard, the keys that are held down are set
+    with the methods press, release and setKeys. Wave only ever asks whether
+    a key is down, so a script or bot can drive it frame by frame.
+    """
+    # Attribute _keys: The keys that are currently held down
+    # Invariant: _keys is a set of strings
+
+    @property
+    def key_count(self):
+        """
+        The number of keys currently held down
+        """
+        return len(self._keys)
+
+    @property
+    def keys(self):
+        """
+        The keys currently held down, as a tuple
+        """
+        return tuple(self._keys)
+
+    def __init__(self,keys=()):
+        """
+        Initializes the input with the given keys held down.
+
+        Parameter: keys is the keys that start held down
+        Precondition: keys is an iterable of strings
+        """
+        self._keys = set(keys)
+
+    def is_key_down(self,key):
+        """
+        Returns True if key is currently held down
+
+        Parameter key: the key to check
+        Precondition: key is a string
+        """
+        return key in self._keys
+
+    def press(self,*keys):
+        """
+        Holds down the given keys
+
+        Parameter keys: the keys to hold down
+        Precondition: each key is a string
+        """
+        self._keys.update(keys)
+
+    def release(self,*keys):
+        """
+        Releases the given keys. Keys that are not down are ignored.
+
+        Parameter keys: the keys to release
+        Precondition: each key is a string
+        """
+        self._keys.difference_update(keys)
+
+    def setKeys(self,keys):
+        """
+        Sets the keys that are held down, releasing every other key
+
+        Parameter keys: the keys to hold down
+        Precondition: keys is an iterable of strings
+        """
+        self._keys = set(keys)
+
+
+def runWave(wave,input,dt=1/60,maxFrames=None,policy=None):
+    """
+    Steps wave until the game is done and returns the number of frames taken
+
+    This plays the same part as Invaders for a headless run. When the ship is
+    destroyed and the wave pauses, the ship is restored right away, as if the
+    player had pressed 'S' to continue.
+
+    If there is a policy, the keys of input are set to the keys it returns
+    before every frame. Otherwise input is left alone.
+
+    Parameter wave: the wave to play
+    Precondition: wave is a Wave object
+
+    Parameter input: the input the wave reads each frame
+    Precondition: input is a GInput object
+
+    Parameter dt: the time in seconds of each frame
+    Precondition: dt is a float > 0
+
+    Parameter maxFrames: the largest number of frames to step
+    Precondition: maxFrames is an int >= 0, or None for no limit
+
+    Parameter policy: the player choosing the keys (see policies.py)
+    Precondition: policy is a callable taking the wave and the frame number
+    and returning an iterable of keys, or None
+    """
+    frames = 0
+    while not wave.getGameDone() and (maxFrames is None or frames < maxFrames):
+        if policy is not None:
+            input.setKeys(policy(wave,frames))
+        wave.update(input,dt)
+        frames += 1
+        if wave.getIsPaused() and not wave.getGameDone():
+            wave.setIsPaused(False)
+            wave.createShip()
+    return frames
@@ -0,0 +1,128 @@
+"""
+Label cache module for Alien Invaders
+
+Making a GLabel is expensive: the font has to be laid out and the text turned
+into a texture before it can be drawn. The score and the messages only change
+a few times in a game, so making new labels for them every frame is wasted
+work.
+
+This module contains the class LabelCache, which hands out labels keyed by
+their text, font, size and color. A label is only made the first time its key
+is asked for. After that the same label is returned, so it keeps the texture
+it already has. The cache holds a limited number of labels and throws out the
+one that was used least recently when it is full.
+
+Like the models, this module may only access consts.py and the backend.
+
+sjg276
+"""
+from consts import *
+if HEADLESS:
+    from headless import *
+else:
+    from game2d import *
+from collections import OrderedDict
+
+
+class LabelCache(object):
+    """
+    A class to reuse GLabel objects that have the same text and style.
+
+    Labels from the cache are shared, so the caller should only move them or
+    draw them. Changing the text, font, size or color of a label from the
+    cache would break the cache.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _capacity: the largest number of labels kept
+    # Invariant: _capacity is an int > 0
+    #
+    # Attribute _labels: the labels kept, by (text,font,size,color), from the
+    # least recently used to the most recently used
+    # Invariant: _labels is an OrderedDict of GLabel objects with at most
+    # _capacity entries
+    #
+    # Attribute _misses: the number of labels made
+    # Invariant: _misses is an int >= 0
+
+    def getCapacity(self):
+        """
+        Returns the largest number of labels the cache keeps
+        """
+        return self._capacity
+
+    def getSize(self):
+        """
+        Returns the number of labels in the cache
+        """
+        return len(self._labels)
+
+    def getMisses(self):
+        """
+        Returns the number of labels the cache has had to make
+        """
+        return self._misses
+
+    def __init__(self,capacity=LABEL_CACHE_SIZE):
+        """
+        Initializes an empty cache.
+
+        Parameter capacity: the largest number of labels to keep
+        Precondition: capacity is an int > 0
+        """
+        assert type(capacity) == int and capacity > 0,repr(capacity)+\
+        ' is not a valid capacity'
+        self._capacity = capacity
+        self._labels = OrderedDict()
+        self._misses = 0
+
+    def getLabel(self,text,font_name,font_size,color=None,x=0,y=0):
+        """
+        Returns a label with the given text and style, centered at (x,y).
+
+        The label is made only if the cache does not have one with the same
+        text, font, size and color. Otherwise the cached label is moved to
+        (x,y), which does not lay it out again.
+
+        Parameter text: the text of the label
+        Precondition: text is a string
+
+        Parameter font_name: the name of the font file
+        Precondition: font_name is a string
+
+        Parameter font_size: the size of the font
+        Precondition: font_size is an int or float > 0
+
+        Parameter color: the color of the text
+        Precondition: color is a color name string, or None for the default
+
+        Parameter x: the horizontal coordinate of the label center
+        Precondition: x is an int or float
+
+        Parameter y: the vertical coordinate of the label center
+        Precondition: y is an int or float
+        """
+        key = (text,font_name,font_size,color)
+        label = self._labels.get(key)
+        if label is None:
+            if color is None:
+                label = GLabel(text=text,font_size=font_size,font_name=font_name)
+            else:
+                label = GLabel(text=text,font_size=font_size,font_name=font_name,
+                linecolor=color)
+            self._labels[key] = label
+            self._misses += 1
+            if len(self._labels) > self._capacity:
+                self._labels.popitem(last=False)
+        else:
+            self._labels.move_to_end(key)
+        if label.x != x:
+            label.x = x
+        if label.y != y:
+            label.y = y
+        return label
+
+    def clear(self):
+        """
+        Removes every label from the cache
+        """
+        self._labels.clear()
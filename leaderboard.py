@@ -0,0 +1,360 @@
+"""
+Leaderboard module for Alien Invaders
+
+The score of a game used to be thrown away when the wave was over. This
+module contains the class Leaderboard, which keeps the result of every game
+(score, whether it was won, lives left, how long it took, the size and speed
+of the wave, the seed and the policy that played it) in a SQLite database.
+
+Adding a result never touches the disk on the caller's thread: the result
+goes on a queue, and a writer thread takes everything on the queue, up to
+LEADERBOARD_BATCH results at a time, and inserts it in one transaction. So
+the game loop never waits on the disk, and a farm that finishes thousands of
+games a second pays for one commit per batch instead of one per game.
+
+The database is in write-ahead logging mode, so the top scores can be read
+while the writer is writing. The table has an index on the score and one on
+the size and speed of the wave followed by the score, so the best K games,
+overall or of one configuration, are read straight off an index however
+many millions of games are in the table.
+
+The game adds every wave to the leaderboard if the environment variable
+INVADERS_LEADERBOARD is set to the path of the database (see
+LEADERBOARD_PATH in consts.py). To see the best games:
+
+    python leaderboard.py scores.db --top=20
+    python leaderboard.py scores.db 3 4 0.5
+
+sjg276
+"""
+from consts import *
+from config import *
+import argparse
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+# the columns of a result, in the order top returns them. 'won' is 1 or 0, or
+# None if the game was not over; 'seconds' is the time the game took in the
+# game, not on the clock; 'finished' is when it was added, as time.time()
+LEADERBOARD_COLUMNS = ('score','won','lives','frames','seconds','rows',
+                       'perrow','speed','swarm','seed','policy','finished')
+
+# the most results the writer inserts in one transaction
+LEADERBOARD_BATCH = 10000
+
+# how many seconds the writer waits for more results before it commits a
+# batch that is not full
+LEADERBOARD_WAIT = 0.25
+
+# the table and its indexes
+LEADERBOARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    won INTEGER,
+    lives INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    perrow INTEGER NOT NULL,
+    speed REAL NOT NULL,
+    swarm INTEGER NOT NULL,
+    seed INTEGER,
+    policy TEXT,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_config ON scores
+    (rows, perrow, speed, swarm, score DESC);
+"""
+
+# the statement the writer inserts each result with
+LEADERBOARD_INSERT = ('INSERT INTO scores ('+','.join(LEADERBOARD_COLUMNS)+
+                      ') VALUES ('+','.join('?'*len(LEADERBOARD_COLUMNS))+')')
+
+
+class Leaderboard(object):
+    """
+    A class to keep the result of every game in a SQLite database.
+
+    The methods add and addResult only put the result on a queue, and a
+    writer thread inserts it in a moment (see flush). The queries run on the
+    caller's thread, and see every result the writer has committed.
+
+    The seed of a wave is an unsigned 64 bit number, which SQLite can not
+    hold, so the table holds it as the signed number with the same bits; the
+    queries turn it back.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _path: the path of the database
+    # Invariant: _path is a string
+    #
+    # Attribute _reader: the connection the queries use
+    # Invariant: _reader is a sqlite3.Connection, or None once closed
+    #
+    # Attribute _queue: the results (and flush events) for the writer, with
+    # None to stop it
+    # Invariant: _queue is a queue.Queue
+    #
+    # Attribute _thread: the writer thread
+    # Invariant: _thread is a threading.Thread
+    #
+    # Attribute _error: the last error the writer hit, not yet raised
+    # Invariant: _error is a sqlite3.Error, or None
+
+    def getPath(self):
+        """
+        Returns the path of the database
+        """
+        return self._path
+
+    def __init__(self,path=LEADERBOARD_PATH):
+        """
+        Opens the leaderboard in the given database, creating the table if it
+        is not there, and starts the writer thread.
+
+        Parameter path: the path of the database
+        Precondition: path is a string (':memory:' is not allowed, as the
+        writer needs its own connection)
+        """
+        assert type(path) == str and path != ':memory:',repr(path)+\
+        ' is not a valid path'
+        self._path = path
+        self._error = None
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(LEADERBOARD_SCHEMA)
+        connection.commit()
+        self._reader = connection
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write,daemon=True)
+        self._thread.start()
+
+    def add(self,wave,frames,policy=None,dt=FIXED_STEP):
+        """
+        Adds the result of a wave, without waiting for it to be written.
+
+        Parameter wave: the wave to add
+        Precondition: wave is a Wave object (or anything with its getters)
+
+        Parameter frames: the number of updates the wave was played for
+        Precondition: frames is an int >= 0
+
+        Parameter policy: the name of the policy that played the wave
+        Precondition: policy is a string, or None if a person played it
+
+        Parameter dt: the seconds of each update
+        Precondition: dt is a number > 0
+        """
+        self.addResult(wave.getScore(),wave.getGameWon() if wave.getGameDone()
+        else None,wave.getLives(),frames,frames*dt,wave.getConfig(),
+        wave.getSeed(),policy)
+
+    def addResult(self,score,won,lives,frames,seconds,config,seed=None,
+                  policy=None):
+        """
+        Adds the result of a game, without waiting for it to be written.
+
+        Parameter score: the score at the end of the game
+        Precondition: score is an int
+
+        Parameter won: whether the game was won
+        Precondition: won is a bool, or None if the game was not over
+
+        Parameter lives: the lives left at the end of the game
+        Precondition: lives is an int >= 0
+
+        Parameter frames: the number of updates the game took
+        Precondition: frames is an int >= 0
+
+        Parameter seconds: the time the game took, in the game
+        Precondition: seconds is a number >= 0
+
+        Parameter config: the size and speed of the wave
+        Precondition: config is a GameConfig object
+
+        Parameter seed: the seed of the wave
+        Precondition: seed is an int in 0..2**64-1, or None if not known
+
+        Parameter policy: the name of the policy that played the game
+        Precondition: policy is a string, or None if a person played it
+        """
+        assert won is None or type(won) == bool,repr(won)+' is not a valid won'
+        assert isinstance(config,GameConfig),repr(config)+\
+        ' is not a GameConfig'
+        if seed is not None and seed >= 1 << 63:
+            seed -= 1 << 64
+        self._queue.put((score,None if won is None else int(won),lives,frames,
+        float(seconds),*config.getKey(),seed,policy,time.time()))
+
+    def flush(self):
+        """
+        Waits until every result added so far is written.
+
+        This raises the last sqlite3.Error the writer hit since the last
+        flush, if any. The results of a batch that failed are lost.
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        error = self._error
+        self._error = None
+        if error is not None:
+            raise error
+
+    def top(self,count=10,config=None):
+        """
+        Returns the best results, best first, as a list of tuples in the
+        order of LEADERBOARD_COLUMNS
+
+        Results with the same score are in the order they were added.
+
+        Parameter count: the number of results
+        Precondition: count is an int >= 0
+
+        Parameter config: the size and speed of the waves to rank
+        Precondition: config is a GameConfig object, or None for every wave
+        """
+        assert type(count) == int and count >= 0,repr(count)+\
+        ' is not a valid count'
+        query = 'SELECT '+','.join(LEADERBOARD_COLUMNS)+' FROM scores'
+        where,values = self._where(config)
+        rows = self._reader.execute(query+where+
+        ' ORDER BY score DESC, id LIMIT ?',values+(count,)).fetchall()
+        seed = LEADERBOARD_COLUMNS.index('seed')
+        for pos in range(len(rows)):
+            if rows[pos][seed] is not None and rows[pos][seed] < 0:
+                row = list(rows[pos])
+                row[seed] += 1 << 64
+                rows[pos] = tuple(row)
+        return rows
+
+    def getCount(self,config=None):
+        """
+        Returns the number of results written
+
+        Parameter config: the size and speed of the waves to count
+        Precondition: config is a GameConfig object, or None for every wave
+        """
+        where,values = self._where(config)
+        return self._reader.execute('SELECT COUNT(*) FROM scores'+where,
+        values).fetchone()[0]
+
+    def getRank(self,score,config=None):
+        """
+        Returns the place a game with the given score would take, from 1 for
+        the best
+
+        Parameter score: the score of the game
+        Precondition: score is an int
+
+        Parameter config: the size and speed of the waves to rank against
+        Precondition: config is a GameConfig object, or None for every wave
+        """
+        where,values = self._where(config)
+        where += (' AND' if where else ' WHERE')+' score > ?'
+        return self._reader.execute('SELECT COUNT(*) FROM scores'+where,
+        values+(score,)).fetchone()[0]+1
+
+    def close(self):
+        """
+        Writes every result added so far, stops the writer thread and closes
+        the database.
+        """
+        if self._reader is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._reader.close()
+        self._reader = None
+
+    def _where(self,config):
+        """
+        Returns the tuple (where,values) of the clause picking the results of
+        one size and speed, and its values
+
+        Parameter config: the size and speed of the waves
+        Precondition: config is a GameConfig object, or None for every wave
+        """
+        if config is None:
+            return ('',())
+        return (' WHERE rows = ? AND perrow = ? AND speed = ? AND swarm = ?',
+                tuple(config.getKey()))
+
+    def _write(self):
+        """
+        Inserts the results on the queue in batches, until it takes None.
+
+        This runs in the writer thread. It waits for a result, then takes
+        every result that comes in the next LEADERBOARD_WAIT seconds (up to
+        LEADERBOARD_BATCH) and inserts them in one transaction. A flush event
+        or None ends a batch at once.
+        """
+        connection = sqlite3.connect(self._path)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA cache_size=-65536')
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic()+LEADERBOARD_WAIT
+            while (len(batch) < LEADERBOARD_BATCH and
+                   type(batch[-1]) == tuple):
+                try:
+                    batch.append(self._queue.get(
+                    timeout=max(0.0,deadline-time.monotonic())))
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if type(item) == tuple]
+            if len(rows) > 0:
+                try:
+                    with connection:
+                        connection.executemany(LEADERBOARD_INSERT,rows)
+                except sqlite3.Error as error:
+                    self._error = error
+            if batch[-1] is None:
+                running = False
+            elif type(batch[-1]) != tuple:
+                batch[-1].set()
+        connection.close()
+
+
+def main():
+    """
+    Prints the best games in a leaderboard database.
+
+    The size and speed of the wave are read from the command line, just like
+    the game itself; with none, every wave is ranked together.
+    """
+    parser = argparse.ArgumentParser(description='Show the best games.')
+    parser.add_argument('path',help='the leaderboard database')
+    parser.add_argument('rows',nargs='?',type=int,
+    help='the number of rows of aliens (see parseConfig)')
+    parser.add_argument('perrow',nargs='?',type=int,
+    help='the number of aliens in a row (see parseConfig)')
+    parser.add_argument('speed',nargs='?',type=float,
+    help='the seconds between alien steps (see parseConfig)')
+    parser.add_argument('--top',type=int,default=10,
+    help='the number of games to show')
+    args = parser.parse_intermixed_args()
+
+    config = None
+    if args.rows is not None:
+        words = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+        config = parseConfig([sys.argv[0]]+words[1:])
+    board = Leaderboard(args.path)
+    print('%d games' % board.getCount(config))
+    for place,row in enumerate(board.top(args.top,config)):
+        result = dict(zip(LEADERBOARD_COLUMNS,row))
+        won = {None: 'not over', 1: 'won', 0: 'lost'}[result['won']]
+        print('%3d. %6d  %-8s %d lives  %6.1fs  %dx%d %.2f%s  %s' %
+        (place+1,result['score'],won,result['lives'],result['seconds'],
+        result['rows'],result['perrow'],result['speed'],
+        ' swarm' if result['swarm'] else '',result['policy'] or 'player'))
+    board.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -25,12 +25,16 @@ about whether to make a new class or not, please ask on Piazza.
 sjg276
 """
 from consts import *
-from game2d import *
+if HEADLESS:
+    from headless import *
+else:
+    from game2d import *
+from contracts import *
 
 # PRIMARY RULE: Models are not allowed to access anything in any module other
-# than consts.py.  If you need extra information from Gameplay, then it should
-# be a parameter in your method, and Wave should pass it as a argument when it
-# calls the method.
+# than consts.py (and contracts.py, which checks their preconditions).  If you
+# need extra information from Gameplay, then it should be a parameter in your
+# method, and Wave should pass it as a argument when it calls the method.
 
 
 class Ship(GImage):
@@ -80,6 +84,13 @@ class Ship(GImage):
         """
         return self.x
 
+    def _checkX(self,value):
+        """
+        Asserts the precondition of setX
+        """
+        assert isNumber(value),repr(value)+' is not a a valid type'
+
+    @checked(_checkX)
     def setX(self,value):
         """
         Sets the horizontal coordinate of the ship object's center
@@ -92,9 +103,6 @@ class Ship(GImage):
         Parameter: x is the horizontal coordinate of Ship object center
         Precondition: x is a float or int
         """
-        assert type(value)== int or type(value)== float,repr(value)+' is not a'+\
-        ' a valid type'
-
         self.x= value
 
     def getY(self):
@@ -141,31 +149,18 @@ class Ship(GImage):
         """
         Returns True if the alien bolt collides with the ship
 
-        This method returns False if bolt was not fired by an alien.
+        The bolt collides if it touched the ship anywhere along its last move
+        (see Bolt.sweeps), so a bolt can not pass through the ship however
+        far it moves in one frame. This method returns False if bolt was not
+        fired by an alien.
 
         Parameter bolt: The laser bolt to check
         Precondition: bolt is of class Bolt
         """
         assert isinstance(bolt,Bolt),repr(bolt)+' is not a bolt instance'
 
-        if self.contains([bolt.getX()-BOLT_WIDTH/2,
-        bolt.getY()-BOLT_HEIGHT/2]) and not bolt.isPlayerBolt():
-
-            return True
-        elif self.contains([bolt.getX()+BOLT_WIDTH/2,
-        bolt.getY()-BOLT_HEIGHT/2]) and not bolt.isPlayerBolt():
-
-            return True
-        elif self.contains([bolt.getX()-BOLT_WIDTH/2,
-        bolt.getY()+BOLT_HEIGHT/2]) and not bolt.isPlayerBolt():
-
-            return True
-        elif self.contains([bolt.getX()+BOLT_WIDTH/2,
-        bolt.getY()+BOLT_HEIGHT/2]) and not bolt.isPlayerBolt():
-
-            return True
-        else:
-            return False
+        return (not bolt.isPlayerBolt() and
+                bolt.sweeps(self.x,self.y,self.width,self.height))
 
 
 class Alien(GImage):
@@ -173,7 +168,8 @@ class Alien(GImage):
     A class to represent a single alien.
 
     At the very least, you want a __init__ method to initialize the alien
-    dimensions. These dimensions are all specified in consts.py.
+    dimensions. These dimensions are given by the GameConfig of the wave, as
+    they are smaller in a swarm.
 
     You also MIGHT want to add code to detect a collision with a bolt. We
     do not require this.  You could put this method in Wave if you wanted to.
@@ -188,18 +184,17 @@ class Alien(GImage):
     """
     #  IF YOU ADD ATTRIBUTES, LIST THEM BELOW
     # Attribute x: The horizontal coordinate of Alien object center
-    # Invariant: x is a int or float in between ALIEN_WIDTH/2 and GAME_WIDTH-
-    # ALIEN_WIDTH/2
+    # Invariant: x is a int or float in between width/2 and GAME_WIDTH-width/2
 
     # Attribute y: The vertical coordinate of Alien object center
-    # Invariant: y is a int or float in between ALIEN_HEIGHT/2 and GAME_HEIGHT-
-    # ALIEN_HEIGHT/2
+    # Invariant: y is a int or float in between height/2 and GAME_HEIGHT-
+    # height/2
 
     # Attribute width: The width of an alien
-    # Invariant: width is ALIEN_WIDTH
+    # Invariant: width is the alien width of the wave's GameConfig
 
     # Attribute height: The height of an alien
-    # Invariant: height is ALIEN_HEIGHT
+    # Invariant: height is the alien height of the wave's GameConfig
 
     # Attribute source: The image source for an alien
     # Invariant: source is one of the images inside ALIEN_IMAGES
@@ -213,19 +208,23 @@ class Alien(GImage):
         """
         return self.x
 
+    def _checkX(self,value):
+        """
+        Asserts the precondition of setX
+        """
+        assert isNumber(value),repr(value)+' is not a valid type'
+        assert value>=self.width/2 and value<=GAME_WIDTH-self.width/2,repr(value)+\
+        ' is not a width that creates a valid alien'
+
+    @checked(_checkX)
     def setX(self,value):
         """
         Sets the horizontal x coordinate of the alien object's center
 
         Parameter: x is the horizontal coordinate of Alien object center
-        Precondition: x is a float or int in between ALIEN_WIDTH/2 and GAME_WIDTH-
-        ALIEN_WIDTH/2
+        Precondition: x is a float or int in between width/2 and GAME_WIDTH-
+        width/2
         """
-        assert type(value) == int or type(value) == float,repr(value)+' is not'+\
-        ' a valid type'
-        assert value>=ALIEN_WIDTH/2 and value<=GAME_WIDTH-ALIEN_WIDTH/2,repr(value)+\
-        ' is not a width that creates a valid alien'
-
         self.x = value
 
     def getY(self):
@@ -234,20 +233,23 @@ class Alien(GImage):
         """
         return self.y
 
+    def _checkY(self,value):
+        """
+        Asserts the precondition of setY
+        """
+        assert isNumber(value),repr(value)+' is not a valid type'
+        assert value >= self.height/2 and value <= GAME_HEIGHT-self.height/2,\
+        repr(value)+' is not a height that creates a valid alien'
+
+    @checked(_checkY)
     def setY(self,value):
         """
         Sets the vertical y coordinate of the alien object's center
 
         Parameter: y is the vertical coordinate of Alien object center
         Precondition: y is a float or int in between 0 and GAME_HEIGHT-
-        ALIEN_HEIGHT/2
+        height/2
         """
-        var = GAME_HEIGHT-ALIEN_HEIGHT/2
-        assert type(value) == int or type(value) == float,repr(value)+' is not'+\
-        ' a valid type'
-        assert value >= ALIEN_HEIGHT/2 and value <= var,repr(value)+\
-        ' is not a height that creates a valid alien'
-
         self.y = value
 
     def getScore(self):
@@ -256,24 +258,21 @@ class Alien(GImage):
         """
         return self._score
 
-    def __init__(self,x,y,width,height,source,score):
+    def __init__(self,x,y,config,source,score):
         """
-        Initializes an alien object with a center coordinate, width, height,
-        and source.
+        Initializes an alien object with a center coordinate, the size given
+        by config, and source.
 
         Parameter: x is the horizontal coordinate of Alien object center
-        Precondition: x is a float or int in between ALIEN_WIDTH/2 and
-        GAME_WIDTH-ALIEN_WIDTH/2
+        Precondition: x is a float or int in between the alien width/2 and
+        GAME_WIDTH-the alien width/2
 
         Parameter: y is the vertical coordinate of Alien object center
-        Precondition: y is a float or int in between ALIEN_HEIGHT/2 and
-        GAME_HEIGHT-ALIEN_HEIGHT/2
-
-        Parameter: width is width of the Alien object
-        Precondition: width is equal to ALIEN_WIDTH
+        Precondition: y is a float or int in between the alien height/2 and
+        GAME_HEIGHT-the alien height/2
 
-        Parameter: height is height of the Alien object
-        Precondition: height is equal to ALIEN_HEIGHT
+        Parameter: config is the size and speed of the wave
+        Precondition: config is a GameConfig object
 
         Parameter: source is the image of the Alien object
         Precondition: source is an entry in ALIEN_IMAGES
@@ -281,16 +280,16 @@ class Alien(GImage):
         Parameter: _score is the alien's score value
         Precondition: _score is an integer greater than or equal to zero
         """
+        width = config.getAlienWidth()
+        height = config.getAlienHeight()
         assert type(x)== int or type(x)== float,repr(x)+' is not'+\
         ' a valid type'
-        assert x >= ALIEN_WIDTH/2 and x <= GAME_WIDTH-ALIEN_WIDTH/2,repr(x)+\
+        assert x >= width/2 and x <= GAME_WIDTH-width/2,repr(x)+\
         ' is not a width that creates a valid alien'
         assert type(y)== int or type(y)== float,repr(x)+' is not'+\
         ' a valid type'
-        assert y >= ALIEN_HEIGHT/2 and y <= GAME_HEIGHT-ALIEN_HEIGHT/2,repr(x)+\
+        assert y >= height/2 and y <= GAME_HEIGHT-height/2,repr(x)+\
         ' is not a height that creates a valid alien'
-        assert width==ALIEN_WIDTH and height==ALIEN_HEIGHT,repr(width)+' and '+\
-        repr(height)+' are not the valid constants for width and height'
         assert source in ALIEN_IMAGES,repr(source)+' is not a correct alien image'
         assert type(score) == int and score >= 0,repr(score)+' is not a valid score'
 
@@ -301,27 +300,17 @@ class Alien(GImage):
         """
         Returns True if the player bolt collides with this alien
 
-        This method returns False if bolt was not fired by the player.
+        The bolt collides if it touched the alien anywhere along its last move
+        (see Bolt.sweeps). This method returns False if bolt was not fired by
+        the player.
 
         Parameter bolt: The laser bolt to check
         Precondition: bolt is of class Bolt
         """
         assert isinstance(bolt,Bolt),repr(bolt)+' is not a bolt object'
 
-        if self.contains([bolt.getX()-BOLT_WIDTH/2,
-        bolt.getY()-BOLT_HEIGHT/2]) and bolt.isPlayerBolt():
-            return True
-        elif self.contains([bolt.getX()+BOLT_WIDTH/2,
-        bolt.getY()-BOLT_HEIGHT/2]) and bolt.isPlayerBolt():
-            return True
-        elif self.contains([bolt.getX()-BOLT_WIDTH/2,
-        bolt.getY()+BOLT_HEIGHT/2]) and bolt.isPlayerBolt():
-            return True
-        elif self.contains([bolt.getX()+BOLT_WIDTH/2,
-        bolt.getY()+BOLT_HEIGHT/2]) and bolt.isPlayerBolt():
-            return True
-        else:
-            return False
+        return (bolt.isPlayerBolt() and
+                bolt.sweeps(self.x,self.y,self.width,self.height))
 
 
 class Bolt(GRectangle):
@@ -350,6 +339,11 @@ class Bolt(GRectangle):
     # Attribute _velocity: the velocity in y direction
     # Invariant: _velocity is an int or float
 
+    # Attribute _prevY: the vertical coordinate of the center before the last
+    # move
+    # Invariant: _prevY is an int or float, and is y if the bolt has not
+    # moved since it was fired
+
     # Attribute x: The horizontal coordinate of Bolt object's center
     # Invariant: x is a int or float in between BOLT_WIDTH/2 and GAME_WIDTH-
     # BOLT_WIDTH/2 and the same x value as the ship
@@ -376,6 +370,15 @@ class Bolt(GRectangle):
         """
         return self.x
 
+    def _checkX(self,value):
+        """
+        Asserts the precondition of setX
+        """
+        assert isNumber(value),repr(value)+' is not a valid type'
+        assert value >= BOLT_WIDTH/2 and value <= GAME_WIDTH-BOLT_WIDTH/2,\
+        repr(value)+' is not a valid width for a bolt object'
+
+    @checked(_checkX)
     def setX(self,value):
         """
         Sets the x coordinate of bolt object's center
@@ -384,12 +387,6 @@ class Bolt(GRectangle):
         Precondition: x is a float or int in between BOLT_WIDTH/2 and
         GAME_WIDTH-BOLT_WIDTH/2
         """
-        var = GAME_WIDTH-BOLT_WIDTH/2
-        assert type(value)== int or type(value)== float,repr(value)+' is not a'+\
-        ' valid type'
-        assert value >= GAME_WIDTH/2 and value <= var,repr(value)+\
-        ' is not a valid width for a bolt object'
-
         self.x= value
 
     def getY(self):
@@ -398,13 +395,22 @@ class Bolt(GRectangle):
         """
         return self.y
 
+    def _checkY(self,value):
+        """
+        Asserts the precondition of setY
+        """
+        assert isNumber(value),repr(value)+' is not a valid type'
+        assert value >= -BOLT_MARGIN and value <= GAME_HEIGHT+BOLT_MARGIN,\
+        repr(value)+' is not a valid height for a bolt object'
+
+    @checked(_checkY)
     def setY(self,value):
         """
         Sets the y coordinate of bolt object's center
 
         Parameter: y is the vertical coordinate of Bolt object center
-        Precondition: y is a float or int in between -2*BOLT_HEIGHT and
-        GAME_HEIGHT+2*BOLT_HEIGHT
+        Precondition: y is a float or int in between -BOLT_MARGIN and
+        GAME_HEIGHT+BOLT_MARGIN
 
         The reason why the y value isn't in between BOLT_HEIGHT/2 and GAME_HEIGHT-
         BOLT_HEIGHT/2 is because of a small discrepancy in deleting the bolts.
@@ -412,12 +418,6 @@ class Bolt(GRectangle):
         the program crashed because the frames were updating too quickly so a TA
         said we could tweak the preconditions to account for this
         """
-        var = GAME_HEIGHT+2*BOLT_HEIGHT
-        assert type(value)== int or type(value)== float,repr(value)+' is not a'+\
-        ' valid type'
-        assert value >= -2*BOLT_HEIGHT and value <= var,repr(value)+\
-        ' is not a valid height for a bolt object'
-
         self.y= value
 
     # INITIALIZER TO SET THE VELOCITY
@@ -432,8 +432,8 @@ class Bolt(GRectangle):
         GAME_WIDTH-BOLD_WIDTH/2
 
         Parameter: y is the vertical coordinate of Bolt object center
-        Precondition: y is a float or int in between -2*BOLT_HEIGHT and
-        GAME_HEIGHT+2*BOLT_HEIGHT
+        Precondition: y is a float or int in between -BOLT_MARGIN and
+        GAME_HEIGHT+BOLT_MARGIN
 
         Parameter: width is width of the Bolt object
         Precondition: width is equal to BOLT_WIDTH
@@ -448,7 +448,7 @@ class Bolt(GRectangle):
         assert x >= BOLT_WIDTH/2 and x <= GAME_WIDTH-BOLT_WIDTH/2,repr(x)+\
         ' is not a valid width for a bolt object'
         assert type(y)== int or type(y)== float,repr(y)+' is not a valid type'
-        assert y >= -2*BOLT_HEIGHT and y <= GAME_HEIGHT+2*BOLT_HEIGHT,repr(y)+\
+        assert y >= -BOLT_MARGIN and y <= GAME_HEIGHT+BOLT_MARGIN,repr(y)+\
         ' is not a valid height for a bolt object'
         assert width==BOLT_WIDTH and height==BOLT_HEIGHT,repr(width)+' and '+\
         repr(height)+' are not the constants for width and height'
@@ -458,9 +458,86 @@ class Bolt(GRectangle):
         super().__init__(x=x,y=y,width=width,height=height,linecolor='black',
         fillcolor='black')
         self._velocity = velocity
+        self._prevY = y
 
     def isPlayerBolt(self):
         """
         Returns whether or not the bolt is a player bolt(positive velocity)
         """
         return self._velocity > 0
+
+    def fire(self,x,y,velocity):
+        """
+        Fires this bolt again from a new position with a new velocity
+
+        This lets Wave reuse a bolt that has left the screen instead of making
+        a new one. The width, height and colors do not change.
+
+        Parameter: x is the horizontal coordinate of Bolt object center
+        Precondition: x is a float or int in between BOLT_WIDTH/2 and
+        GAME_WIDTH-BOLT_WIDTH/2
+
+        Parameter: y is the vertical coordinate of Bolt object center
+        Precondition: y is a float or int in between -BOLT_MARGIN and
+        GAME_HEIGHT+BOLT_MARGIN
+
+        Parameter: velocity: the velocity in y direction
+        Precondition: velocity is an int or float
+        """
+        if CHECKED:
+            assert isNumber(velocity),repr(velocity)+' is not a valid type'
+
+        self.setX(x)
+        self.setY(y)
+        self._velocity = velocity
+        self._prevY = y
+
+    def getPrevY(self):
+        """
+        Returns the y coordinate of the bolt object's center before its last
+        move
+        """
+        return self._prevY
+
+    def move(self):
+        """
+        Moves the bolt by its velocity, remembering where it was
+        """
+        self._prevY = self.y
+        self.setY(self.y+self._velocity)
+
+    def getSweep(self):
+        """
+        Returns the tuple (bottom,top) of the vertical range the bolt covered
+        in its last move
+
+        The range is the bolt where it is now, stretched back to where its
+        leading edge was before the move. The part behind that was covered by
+        the bolt before the move, and was already tested then. So a bolt that
+        moves less than its height is only its own box, and a faster bolt
+        still covers every point it passed.
+        """
+        move = self.y-self._prevY
+        back = max(abs(move)-BOLT_HEIGHT,0)
+        if move > 0:
+            return (self.y-BOLT_HEIGHT/2-back,self.y+BOLT_HEIGHT/2)
+        return (self.y-BOLT_HEIGHT/2,self.y+BOLT_HEIGHT/2+back)
+
+    def sweeps(self,x,y,width,height):
+        """
+        Returns True if the bolt touched the box anywhere along its last move
+
+        This is true if the range of getSweep, as wide as the bolt, is
+        strictly inside the box somewhere. For a bolt that has moved less than
+        its height, that is the same as a corner of the bolt being inside the
+        box.
+
+        Parameter x, y: the center of the box
+        Precondition: x and y are ints or floats
+
+        Parameter width, height: the size of the box
+        Precondition: width and height are ints or floats > 0
+        """
+        bottom,top = self.getSweep()
+        return (abs(self.x-x) < (width+BOLT_WIDTH)/2 and
+                bottom < y+height/2 and top > y-height/2)
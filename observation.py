@@ -0,0 +1,265 @@
+"""
+Observation module for Alien Invaders
+
+A bot that reads a Wave through its getters every frame makes new Python
+objects for every value it reads, and one that reaches into the aliens and
+bolts has to walk them all. This module contains the class Observation, a
+buffer with a fixed layout that a wave writes its state into at the end of
+every update. A reader (a bot, or a trainer in another process) reads the
+buffer in place, without copying or converting anything.
+
+The buffer is laid out as:
+
+    fields   len(OBS_FIELDS) doubles, in the order of OBS_FIELDS
+    bolts    OBS_BOLTS bolts of 3 doubles each: x, y and velocity (> 0 for a
+             player bolt), in the order the bolts were fired
+    alive    one byte per cell of the alien grid, row by row from the bottom
+             row, 1 if the cell holds a live alien and 0 if not
+
+Only the first 'bolts' entries of the bolts are in use, up to OBS_BOLTS. The
+alive bytes are only written when an alien dies, so they cost nothing on
+the other frames.
+
+The field 'sequence' is odd while the wave is writing and even otherwise,
+and goes up by two with every write. A reader in another process reads it
+before and after reading the rest; if it changed, or was odd, the reader
+read a frame that was half written and should read again.
+
+The buffer can be a bytearray owned by the observation or a block of shared
+memory (see multiprocessing.shared_memory), so that other processes can map
+the same observation by its name.
+
+Like the models, this module may only access consts.py.
+
+sjg276
+"""
+from consts import *
+from multiprocessing import shared_memory
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the names of the fields at the start of the buffer, in order. 'frame' is
+# the number of writes, 'hasShip', 'done' and 'won' are 0 or 1, 'direction'
+# is 1 for right and -1 for left, and 'won' is -1 until the game is over.
+# 'formationX' and 'formationY' are the center of the alien in row 0, column 0
+# (see Formation), and 'aliens' and 'bolts' are how many are on screen
+OBS_FIELDS = ('sequence','frame','shipX','hasShip','formationX','formationY',
+              'direction','lives','score','aliens','bolts','done','won')
+
+# the number of bolts the buffer has room for
+OBS_BOLTS = 64
+
+# the number of doubles for each bolt
+OBS_BOLT_SIZE = 3
+
+
+def observationSize(config):
+    """
+    Returns the size in bytes of the observation of a wave
+
+    Parameter config: the size and speed of the wave
+    Precondition: config is a GameConfig object
+    """
+    return (8*(len(OBS_FIELDS)+OBS_BOLT_SIZE*OBS_BOLTS)+
+            config.getRows()*config.getAliensInRow())
+
+
+class Observation(object):
+    """
+    A class to hold the state of a wave in one flat buffer.
+
+    The wave writes to the views returned by getFields, getBolts and
+    getAlive; everyone else should only read them. The positions of the
+    fields are given by getIndex.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _rows: the number of rows of the alien grid
+    # Invariant: _rows is an int > 0
+    #
+    # Attribute _cols: the number of aliens in a row
+    # Invariant: _cols is an int > 0
+    #
+    # Attribute _memory: the shared memory holding the buffer
+    # Invariant: _memory is a SharedMemory object, or None if the buffer is a
+    # bytearray
+    #
+    # Attribute _owner: whether this observation made _memory
+    # Invariant: _owner is a bool
+    #
+    # Attribute _buffer: the whole buffer
+    # Invariant: _buffer is a memoryview of observationSize bytes, or None
+    # once closed
+    #
+    # Attribute _fields: the fields, as doubles
+    # Invariant: _fields is a memoryview of len(OBS_FIELDS) doubles in _buffer
+    #
+    # Attribute _bolts: the bolts, as doubles
+    # Invariant: _bolts is a memoryview of OBS_BOLT_SIZE*OBS_BOLTS doubles in
+    # _buffer
+    #
+    # Attribute _alive: the alive mask, as bytes
+    # Invariant: _alive is a memoryview of _rows*_cols bytes in _buffer
+
+    def getRows(self):
+        """
+        Returns the number of rows of the alien grid
+        """
+        return self._rows
+
+    def getAliensInRow(self):
+        """
+        Returns the number of aliens in a row of the alien grid
+        """
+        return self._cols
+
+    def getBuffer(self):
+        """
+        Returns the whole buffer, as a memoryview of bytes
+        """
+        return self._buffer
+
+    def getFields(self):
+        """
+        Returns the fields, as a memoryview of doubles in the order of
+        OBS_FIELDS
+        """
+        return self._fields
+
+    def getBolts(self):
+        """
+        Returns the bolts, as a memoryview of doubles, OBS_BOLT_SIZE per bolt
+        """
+        return self._bolts
+
+    def getAlive(self):
+        """
+        Returns the alive mask of the alien grid, as a memoryview of bytes,
+        one per cell, row by row from the bottom row
+        """
+        return self._alive
+
+    def getName(self):
+        """
+        Returns the name of the shared memory holding the buffer, or None if
+        the buffer is not shared
+        """
+        return None if self._memory is None else self._memory.name
+
+    def __init__(self,config,shared=False,name=None):
+        """
+        Initializes an observation for a wave of the given size.
+
+        Every field starts at 0 and every cell starts alive. With shared True
+        the buffer is a new block of shared memory, which the other processes
+        open by passing its name (see getName). With a name the buffer is
+        that existing block, and its contents are kept.
+
+        Parameter config: the size and speed of the wave
+        Precondition: config is a GameConfig object
+
+        Parameter shared: whether to put the buffer in new shared memory
+        Precondition: shared is a bool
+
+        Parameter name: the name of existing shared memory to use
+        Precondition: name is a string naming shared memory of at least
+        observationSize(config) bytes, or None
+        """
+        assert type(shared) == bool,repr(shared)+' is not a bool'
+        assert name is None or type(name) == str,repr(name)+' is not a name'
+        size = observationSize(config)
+        self._rows = config.getRows()
+        self._cols = config.getAliensInRow()
+        self._owner = shared and name is None
+        if name is not None:
+            self._memory = shared_memory.SharedMemory(name=name)
+            self._buffer = self._memory.buf[:size]
+        elif shared:
+            self._memory = shared_memory.SharedMemory(create=True,size=size)
+            self._buffer = self._memory.buf[:size]
+        else:
+            self._memory = None
+            self._buffer = memoryview(bytearray(size))
+        end = 8*len(OBS_FIELDS)
+        self._fields = self._buffer[:end].cast('d')
+        self._bolts = self._buffer[end:end+8*OBS_BOLT_SIZE*OBS_BOLTS].cast('d')
+        self._alive = self._buffer[end+8*OBS_BOLT_SIZE*OBS_BOLTS:]
+        if name is None:
+            self._alive[:] = b'\x01'*len(self._alive)
+            self._fields[OBS_FIELDS.index('won')] = -1.0
+
+    def getIndex(self,field):
+        """
+        Returns the position of a field in getFields()
+
+        Parameter field: the name of the field
+        Precondition: field is in OBS_FIELDS
+        """
+        return OBS_FIELDS.index(field)
+
+    def get(self,field):
+        """
+        Returns the value of one field
+
+        Parameter field: the name of the field
+        Precondition: field is in OBS_FIELDS
+        """
+        return self._fields[OBS_FIELDS.index(field)]
+
+    def isAlive(self,row,col):
+        """
+        Returns True if the cell (row,col) holds a live alien
+
+        Parameter row: the row of the cell
+        Precondition: row is an int in 0..getRows()-1
+
+        Parameter col: the column of the cell
+        Precondition: col is an int in 0..getAliensInRow()-1
+        """
+        return self._alive[row*self._cols+col] == 1
+
+    def getSequence(self):
+        """
+        Returns the sequence number of the last write, which is odd while the
+        wave is writing
+        """
+        return int(self._fields[0])
+
+    def toArrays(self):
+        """
+        Returns the tuple (fields,bolts,alive) of NumPy arrays that share the
+        buffer, so they always hold the latest state
+
+        fields is a float array of shape (len(OBS_FIELDS),), bolts a float
+        array of shape (OBS_BOLTS,OBS_BOLT_SIZE), and alive a uint8 array of
+        shape (rows,aliens in a row). This raises ImportError if NumPy is not
+        installed.
+        """
+        if np is None:
+            raise ImportError('toArrays needs NumPy, which is not installed')
+        return (np.frombuffer(self._fields,dtype=np.float64),
+                np.frombuffer(self._bolts,dtype=np.float64).reshape(
+                OBS_BOLTS,OBS_BOLT_SIZE),
+                np.frombuffer(self._alive,dtype=np.uint8).reshape(
+                self._rows,self._cols))
+
+    def close(self):
+        """
+        Lets go of the buffer, and frees the shared memory if this
+        observation made it.
+
+        The views returned earlier (and the arrays from toArrays) must not be
+        used, or kept, after this.
+        """
+        if self._buffer is None:
+            return
+        self._fields.release()
+        self._bolts.release()
+        self._alive.release()
+        self._buffer.release()
+        self._buffer = None
+        if self._memory is not None:
+            self._memory.close()
+            if self._owner:
+                self._memory.unlink()
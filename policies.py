@@ -0,0 +1,118 @@
+"""
+Policies module for Alien Invaders
+
+This module contains scripted players for headless runs. A policy is any
+callable that takes the wave and the number of the frame, and returns the
+keys to hold down during that frame. runWave in headless.py sets the input to
+those keys before every update.
+
+Policies are looked up by name with getPolicy, so a job that is sent to
+another process only needs to say which policy to use and with what seed.
+
+sjg276
+"""
+import random
+
+
+def idlePolicy(wave,frame):
+    """
+    Returns no keys, so the ship never moves or fires.
+
+    Parameter wave: the wave being played
+    Precondition: wave is a Wave object
+
+    Parameter frame: the number of the frame, starting at 0
+    Precondition: frame is an int >= 0
+    """
+    return ()
+
+
+def firePolicy(wave,frame):
+    """
+    Returns 'up' every frame, so the ship fires whenever it can but never moves.
+
+    Parameter wave: the wave being played
+    Precondition: wave is a Wave object
+
+    Parameter frame: the number of the frame, starting at 0
+    Precondition: frame is an int >= 0
+    """
+    return ('up',)
+
+
+def sweepPolicy(wave,frame):
+    """
+    Returns keys that sweep the ship right and left every 150 frames while
+    firing, with a short pause every 97 frames.
+
+    Parameter wave: the wave being played
+    Precondition: wave is a Wave object
+
+    Parameter frame: the number of the frame, starting at 0
+    Precondition: frame is an int >= 0
+    """
+    if frame % 97 < 5:
+        return ()
+    if (frame//150) % 2 == 0:
+        return ('up','right')
+    return ('up','left')
+
+
+class RandomPolicy(object):
+    """
+    A class for a policy that holds down random keys.
+
+    Every frame, each of 'left', 'right' and 'up' is held down with probability
+    one half. The keys only depend on the seed, so the same seed always gives
+    the same keys.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _rng: the random number generator for the keys
+    # Invariant: _rng is a random.Random object
+
+    def __init__(self,seed=None):
+        """
+        Initializes the policy with a seed.
+
+        Parameter seed: the seed for the keys
+        Precondition: seed is an int, or None for a random seed
+        """
+        self._rng = random.Random(seed)
+
+    def __call__(self,wave,frame):
+        """
+        Returns a random set of keys.
+
+        Parameter wave: the wave being played
+        Precondition: wave is a Wave object
+
+        Parameter frame: the number of the frame, starting at 0
+        Precondition: frame is an int >= 0
+        """
+        bits = self._rng.getrandbits(3)
+        return [key for pos,key in enumerate(('left','right','up')) if bits >> pos & 1]
+
+
+# the policies that can be looked up by name
+POLICIES = {'idle': idlePolicy, 'fire': firePolicy, 'sweep': sweepPolicy,
+            'random': RandomPolicy}
+
+
+def getPolicy(name,seed=None):
+    """
+    Returns the policy with the given name, ready to play a game.
+
+    Policies that are classes are created with the seed; the others do not
+    need it.
+
+    Parameter name: the name of the policy
+    Precondition: name is a key of POLICIES
+
+    Parameter seed: the seed for a policy that uses random numbers
+    Precondition: seed is an int, or None
+    """
+    assert name in POLICIES,repr(name)+' is not a known policy'
+    policy = POLICIES[name]
+    if isinstance(policy,type):
+        return policy(seed)
+    return policy
@@ -0,0 +1,280 @@
+"""
+Profiler module for Alien Invaders
+
+This module contains FrameProfiler, which records where the time of each
+frame goes. Wave.update runs the same phases every frame (see PHASES). When a
+wave has a profiler, it reads the clock between the phases and hands the
+times to the profiler together with the number of live aliens and bolts.
+Invaders also gives it the time Invaders.draw takes.
+
+The times are kept in preallocated arrays that hold the last few thousand
+frames, so recording a frame does not allocate anything. A wave without a
+profiler only pays for one test of None per frame.
+
+The recorded frames can be saved as a Chrome trace (JSON), which can be
+opened in chrome://tracing or https://ui.perfetto.dev, and summarized as text
+for an on-screen overlay.
+
+The game profiles every wave if the environment variable INVADERS_PROFILE is
+set to the path of the trace file (see PROFILE_PATH in consts.py), and shows
+the overlay if INVADERS_OVERLAY is set.
+
+sjg276
+"""
+from consts import *
+import array
+import json
+import time
+
+# the phases of Wave.update, in the order they run
+PHASES = ('_gameOver','_changeShip','_changeAlien','_verticalMove',
+          '_createBolt','_changeBolt','_removeBolt','_oneBolt','_chooseAlien',
+          '_alienBolt','_collision')
+
+# the number of clock readings for each frame: one before every phase, and
+# one after the last phase
+STAMPS = len(PHASES)+1
+
+# the number of frames a profiler keeps by default (five minutes at 60 fps)
+PROFILE_FRAMES = 18000
+
+
+class FrameProfiler(object):
+    """
+    A class to record the time of every phase of the last frames of a wave.
+
+    Frames are numbered from 0 in the order they are recorded. Once more
+    frames than the capacity have been recorded, the oldest ones are
+    overwritten, so only the frames from getFirstFrame() to getFrameCount()-1
+    can be read.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _capacity: the number of frames kept
+    # Invariant: _capacity is an int > 0
+    #
+    # Attribute _stamps: the clock readings of the frames, STAMPS per frame
+    # Invariant: _stamps is an array of _capacity*STAMPS doubles
+    #
+    # Attribute _draws: the start and end of the drawing after each frame
+    # Invariant: _draws is an array of 2*_capacity doubles; both are 0 for a
+    # frame that was not drawn
+    #
+    # Attribute _counts: the live aliens and bolts at the end of each frame
+    # Invariant: _counts is an array of 2*_capacity unsigned ints
+    #
+    # Attribute _frames: the number of frames recorded
+    # Invariant: _frames is an int >= 0
+    #
+    # Attribute _origin: the clock reading that the trace calls time 0
+    # Invariant: _origin is a float
+
+    def getCapacity(self):
+        """
+        Returns the number of frames the profiler keeps
+        """
+        return self._capacity
+
+    def getFrameCount(self):
+        """
+        Returns the number of frames recorded so far
+        """
+        return self._frames
+
+    def getFirstFrame(self):
+        """
+        Returns the oldest frame that is still kept
+        """
+        return max(self._frames-self._capacity,0)
+
+    def __init__(self,capacity=PROFILE_FRAMES):
+        """
+        Initializes a profiler with no frames.
+
+        Parameter capacity: the number of frames to keep
+        Precondition: capacity is an int > 0
+        """
+        assert type(capacity) == int and capacity > 0,repr(capacity)+\
+        ' is not a valid capacity'
+        self._capacity = capacity
+        self._stamps = array.array('d',bytes(8*capacity*STAMPS))
+        self._draws = array.array('d',bytes(16*capacity))
+        self._counts = array.array('I',bytes(8*capacity))
+        self._frames = 0
+        self._origin = time.perf_counter()
+
+    def recordFrame(self,stamps,aliens,bolts):
+        """
+        Records one call of Wave.update.
+
+        Parameter stamps: the clock reading before every phase and after the
+        last one; a phase that did not run starts and ends at the same time
+        Precondition: stamps is a list or tuple of STAMPS floats from
+        time.perf_counter, in increasing order
+
+        Parameter aliens: the number of live aliens after the frame
+        Precondition: aliens is an int >= 0
+
+        Parameter bolts: the number of bolts after the frame
+        Precondition: bolts is an int >= 0
+        """
+        slot = self._frames % self._capacity
+        self._stamps[slot*STAMPS:(slot+1)*STAMPS] = array.array('d',stamps)
+        self._draws[2*slot] = 0.0
+        self._draws[2*slot+1] = 0.0
+        self._counts[2*slot] = aliens
+        self._counts[2*slot+1] = bolts
+        self._frames += 1
+
+    def recordDraw(self,start,end):
+        """
+        Records the time taken to draw the last frame recorded.
+
+        Parameter start: the clock reading before drawing
+        Precondition: start is a float from time.perf_counter
+
+        Parameter end: the clock reading after drawing
+        Precondition: end is a float from time.perf_counter >= start
+        """
+        if self._frames > 0:
+            slot = (self._frames-1) % self._capacity
+            self._draws[2*slot] = start
+            self._draws[2*slot+1] = end
+
+    def getPhaseTimes(self,frame):
+        """
+        Returns the time in seconds of each phase of a frame, as a tuple in
+        the order of PHASES
+
+        Parameter frame: the frame to read
+        Precondition: frame is an int in getFirstFrame()..getFrameCount()-1
+        """
+        assert frame >= self.getFirstFrame() and frame < self._frames,\
+        repr(frame)+' is not a kept frame'
+        base = (frame % self._capacity)*STAMPS
+        stamps = self._stamps
+        return tuple(stamps[base+pos+1]-stamps[base+pos] for pos in range(len(PHASES)))
+
+    def getDrawTime(self,frame):
+        """
+        Returns the time in seconds taken to draw a frame, or 0 if it was not
+        drawn
+
+        Parameter frame: the frame to read
+        Precondition: frame is an int in getFirstFrame()..getFrameCount()-1
+        """
+        assert frame >= self.getFirstFrame() and frame < self._frames,\
+        repr(frame)+' is not a kept frame'
+        slot = frame % self._capacity
+        return self._draws[2*slot+1]-self._draws[2*slot]
+
+    def getCounts(self,frame):
+        """
+        Returns the tuple (aliens,bolts) at the end of a frame
+
+        Parameter frame: the frame to read
+        Precondition: frame is an int in getFirstFrame()..getFrameCount()-1
+        """
+        assert frame >= self.getFirstFrame() and frame < self._frames,\
+        repr(frame)+' is not a kept frame'
+        slot = frame % self._capacity
+        return (self._counts[2*slot],self._counts[2*slot+1])
+
+    def getSummary(self,frames=60):
+        """
+        Returns the average time in seconds of each phase, of the whole update
+        and of drawing over the last frames, as a dictionary
+
+        The keys are the names in PHASES, 'update' and 'draw'. Every value is 0
+        if no frame has been recorded.
+
+        Parameter frames: the number of frames to average over
+        Precondition: frames is an int > 0
+        """
+        first = max(self._frames-frames,self.getFirstFrame())
+        count = self._frames-first
+        totals = [0.0]*len(PHASES)
+        draw = 0.0
+        for frame in range(first,self._frames):
+            times = self.getPhaseTimes(frame)
+            for pos in range(len(PHASES)):
+                totals[pos] += times[pos]
+            draw += self.getDrawTime(frame)
+        summary = {}
+        for pos in range(len(PHASES)):
+            summary[PHASES[pos]] = totals[pos]/count if count else 0.0
+        summary['update'] = sum(totals)/count if count else 0.0
+        summary['draw'] = draw/count if count else 0.0
+        return summary
+
+    def getOverlayText(self,frames=60):
+        """
+        Returns a few lines of text with the average times of the last frames,
+        in milliseconds, for an on-screen overlay
+
+        Parameter frames: the number of frames to average over
+        Precondition: frames is an int > 0
+        """
+        summary = self.getSummary(frames)
+        lines = ['update %.3f ms  draw %.3f ms' %
+                 (1000*summary['update'],1000*summary['draw'])]
+        slowest = sorted(PHASES,key=lambda phase: -summary[phase])[:3]
+        for phase in slowest:
+            lines.append('%s %.3f ms' % (phase,1000*summary[phase]))
+        if self._frames > 0:
+            lines.append('aliens %d  bolts %d' % self.getCounts(self._frames-1))
+        return '\n'.join(lines)
+
+    def toTrace(self):
+        """
+        Returns the kept frames as a Chrome trace, in the JSON object format.
+
+        Every phase and every drawing is a complete event ('X') on its own
+        track, and the live aliens and bolts are a counter event ('C').
+        """
+        events = [{'name':'thread_name','ph':'M','pid':1,'tid':1,
+                   'args':{'name':'Wave.update'}},
+                  {'name':'thread_name','ph':'M','pid':1,'tid':2,
+                   'args':{'name':'Invaders.draw'}}]
+        for frame in range(self.getFirstFrame(),self._frames):
+            base = (frame % self._capacity)*STAMPS
+            start = self._stamps[base]
+            events.append({'name':'update','cat':'frame','ph':'X','pid':1,'tid':1,
+            'ts':self._micros(start),
+            'dur':1e6*(self._stamps[base+len(PHASES)]-start),
+            'args':{'frame':frame}})
+            for pos in range(len(PHASES)):
+                begin = self._stamps[base+pos]
+                end = self._stamps[base+pos+1]
+                if end > begin:
+                    events.append({'name':PHASES[pos],'cat':'phase','ph':'X',
+                    'pid':1,'tid':1,'ts':self._micros(begin),
+                    'dur':1e6*(end-begin)})
+            aliens,bolts = self.getCounts(frame)
+            events.append({'name':'entities','ph':'C','pid':1,
+            'ts':self._micros(start),'args':{'aliens':aliens,'bolts':bolts}})
+            slot = frame % self._capacity
+            if self._draws[2*slot+1] > 0:
+                events.append({'name':'draw','cat':'frame','ph':'X','pid':1,
+                'tid':2,'ts':self._micros(self._draws[2*slot]),
+                'dur':1e6*(self._draws[2*slot+1]-self._draws[2*slot]),
+                'args':{'frame':frame}})
+        return {'traceEvents':events,'displayTimeUnit':'ms'}
+
+    def save(self,path):
+        """
+        Writes the kept frames to a Chrome trace file
+
+        Parameter path: the path of the file
+        Precondition: path is a string
+        """
+        with open(path,'w') as file:
+            json.dump(self.toTrace(),file)
+
+    def _micros(self,stamp):
+        """
+        Returns a clock reading as microseconds since the profiler was made
+
+        Parameter stamp: the clock reading
+        Precondition: stamp is a float from time.perf_counter
+        """
+        return 1e6*(stamp-self._origin)
@@ -0,0 +1,299 @@
+"""
+Raster module for Alien Invaders
+
+An agent that learns from pixels used to need a full Kivy render of the
+window and a screen grab for every frame. This module contains the class
+Rasterizer, which turns the state of a wave straight into a small NumPy
+image with one channel for each kind of thing on screen (see
+RASTER_CHANNELS), without Kivy or a window.
+
+The state is read from an Observation (see observation.py), so any wave
+that writes one (Wave or ArrayWave, in this process or another) can be
+rasterized. Every object on screen is an upright rectangle, and the part of
+a rectangle inside a pixel is the part of its width inside the pixel's
+columns times the part of its height inside the pixel's rows. So a whole
+channel is one matrix product of those parts, and the aliens, which sit on
+a grid, take two products however many of them there are.
+
+A pixel is either the part of it that is covered (intensity) or 1 if any of
+it is covered (occupancy). A rasterizer can also keep the last few frames
+as a stack, which is what an agent needs to see how things move.
+
+Like the observations, this module needs NumPy.
+
+sjg276
+"""
+from consts import *
+from observation import *
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the channels of a raster, in order. 'defense' is the defensive line
+RASTER_CHANNELS = ('aliens','ship','playerBolts','alienBolts','defense')
+
+# the default size of a raster, in pixels (one pixel for every 10 by 10
+# pixels of the game)
+RASTER_WIDTH = 80
+RASTER_HEIGHT = 70
+
+# the ways of filling a pixel
+RASTER_MODES = ('intensity','occupancy')
+
+
+class Rasterizer(object):
+    """
+    A class to draw the state of a wave as a stack of low resolution images.
+
+    A frame is a float32 array of shape (len(RASTER_CHANNELS),height,width),
+    with row 0 at the top of the screen. The stack is an array of shape
+    (stack,len(RASTER_CHANNELS),height,width) holding the last frames pushed,
+    oldest first; the frames that have not been pushed yet are all 0.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _config: the size of the waves drawn
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute _width: the number of columns of pixels
+    # Invariant: _width is an int > 0
+    #
+    # Attribute _height: the number of rows of pixels
+    # Invariant: _height is an int > 0
+    #
+    # Attribute _occupancy: whether a pixel is 1 when any of it is covered
+    # Invariant: _occupancy is a bool
+    #
+    # Attribute _left, _right: the horizontal range of each column of pixels
+    # Invariant: each is a float array of shape (_width,)
+    #
+    # Attribute _bottom, _top: the vertical range of each row of pixels
+    # Invariant: each is a float array of shape (_height,), with row 0 at
+    # the top of the screen
+    #
+    # Attribute _cols, _rows: how far each column and row of aliens is from
+    # the center of the alien in row 0, column 0
+    # Invariant: _cols is a float array of shape (aliens in a row,), and
+    # _rows a float array of shape (rows,)
+    #
+    # Attribute _defense: the defense channel, which never changes
+    # Invariant: _defense is a float array of shape (_height,_width)
+    #
+    # Attribute _frames: the stack of the last frames pushed
+    # Invariant: _frames is a float32 array of shape
+    # (stack,len(RASTER_CHANNELS),_height,_width)
+
+    def getWidth(self):
+        """
+        Returns the number of columns of pixels
+        """
+        return self._width
+
+    def getHeight(self):
+        """
+        Returns the number of rows of pixels
+        """
+        return self._height
+
+    def getStack(self):
+        """
+        Returns the number of frames in the stack
+        """
+        return len(self._frames)
+
+    def getFrames(self):
+        """
+        Returns the stack of the last frames pushed, oldest first
+
+        The array is the rasterizer's own, and changes with the next push;
+        copy it to keep it.
+        """
+        return self._frames
+
+    def __init__(self,config,width=RASTER_WIDTH,height=RASTER_HEIGHT,stack=1,
+                 mode='intensity'):
+        """
+        Initializes a rasterizer for waves of the given size.
+
+        This method raises ImportError if NumPy is not installed.
+
+        Parameter config: the size of the waves to draw
+        Precondition: config is a GameConfig object
+
+        Parameter width: the number of columns of pixels
+        Precondition: width is an int > 0
+
+        Parameter height: the number of rows of pixels
+        Precondition: height is an int > 0
+
+        Parameter stack: the number of frames to keep
+        Precondition: stack is an int > 0
+
+        Parameter mode: how to fill a pixel
+        Precondition: mode is in RASTER_MODES
+        """
+        if np is None:
+            raise ImportError('Rasterizer needs NumPy, which is not installed')
+        assert type(width) == int and width > 0,repr(width)+\
+        ' is not a valid width'
+        assert type(height) == int and height > 0,repr(height)+\
+        ' is not a valid height'
+        assert type(stack) == int and stack > 0,repr(stack)+\
+        ' is not a valid stack'
+        assert mode in RASTER_MODES,repr(mode)+' is not a valid mode'
+        self._config = config
+        self._width = width
+        self._height = height
+        self._occupancy = mode == 'occupancy'
+        edges = np.linspace(0,GAME_WIDTH,width+1)
+        self._left = edges[:-1]
+        self._right = edges[1:]
+        edges = np.linspace(GAME_HEIGHT,0,height+1)
+        self._top = edges[:-1]
+        self._bottom = edges[1:]
+        self._cols = (np.arange(config.getAliensInRow())*
+                      (config.getAlienWidth()+config.getHSep()))
+        self._rows = (np.arange(config.getRows())*
+                      (config.getAlienHeight()+config.getVSep()))
+        self._defense = self._cover(np.array([0.0]),np.array([GAME_WIDTH]),
+        np.array([DEFENSE_LINE-1.0]),np.array([DEFENSE_LINE+1.0]))
+        self._frames = np.zeros((stack,len(RASTER_CHANNELS),height,width),
+                                dtype=np.float32)
+
+    def reset(self):
+        """
+        Clears the stack, as at the start of a new game
+        """
+        self._frames[:] = 0
+
+    def push(self,observation):
+        """
+        Draws the state in observation as the newest frame of the stack, and
+        returns the stack (see getFrames)
+
+        Parameter observation: the state to draw
+        Precondition: observation is an Observation object for a wave of the
+        size of this rasterizer
+        """
+        frames = self._frames
+        frames[:-1] = frames[1:]
+        self.render(observation,frames[-1])
+        return frames
+
+    def render(self,observation,out=None):
+        """
+        Returns the state in observation as one frame
+
+        If the observation is being written by another process, this waits
+        for a whole write, and draws again if a write started while drawing.
+
+        Parameter observation: the state to draw
+        Precondition: observation is an Observation object for a wave of the
+        size of this rasterizer
+
+        Parameter out: the array to draw into
+        Precondition: out is a float32 array of shape
+        (len(RASTER_CHANNELS),height,width), or None for a new array
+        """
+        assert isinstance(observation,Observation),repr(observation)+\
+        ' is not an Observation'
+        assert (observation.getRows() == self._config.getRows() and
+        observation.getAliensInRow() == self._config.getAliensInRow()),\
+        'the observation is for a wave of another size'
+        if out is None:
+            out = np.empty((len(RASTER_CHANNELS),self._height,self._width),
+                           dtype=np.float32)
+        fields,bolts,alive = observation.toArrays()
+        while True:
+            start = observation.getSequence()
+            if start % 2 == 0:
+                self._draw(fields,bolts,alive,out)
+                if observation.getSequence() == start:
+                    return out
+
+    def _draw(self,fields,bolts,alive,out):
+        """
+        Draws every channel of a frame into out.
+
+        Parameter fields, bolts, alive: the arrays of an observation
+        Precondition: they are the arrays returned by Observation.toArrays
+
+        Parameter out: the array to draw into
+        Precondition: out is a float32 array of shape
+        (len(RASTER_CHANNELS),height,width)
+        """
+        config = self._config
+        x = fields[OBS_FIELDS.index('formationX')]+self._cols
+        y = fields[OBS_FIELDS.index('formationY')]+self._rows
+        width = config.getAlienWidth()/2
+        height = config.getAlienHeight()/2
+        across = self._across(x-width,x+width)
+        down = self._down(y-height,y+height)
+        np.matmul(down.T,alive @ across,out=out[0])
+
+        if fields[OBS_FIELDS.index('hasShip')]:
+            x = fields[OBS_FIELDS.index('shipX')]
+            y = SHIP_BOTTOM+SHIP_HEIGHT/2
+            self._cover(np.array([x-SHIP_WIDTH/2]),np.array([x+SHIP_WIDTH/2]),
+            np.array([y-SHIP_HEIGHT/2]),np.array([y+SHIP_HEIGHT/2]),out[1])
+        else:
+            out[1] = 0
+
+        bolts = bolts[:int(fields[OBS_FIELDS.index('bolts')])]
+        player = bolts[:,2] > 0
+        for channel,kind in ((2,player),(3,~player)):
+            if kind.any():
+                x = bolts[kind,0]
+                y = bolts[kind,1]
+                self._cover(x-BOLT_WIDTH/2,x+BOLT_WIDTH/2,
+                y-BOLT_HEIGHT/2,y+BOLT_HEIGHT/2,out[channel])
+            else:
+                out[channel] = 0
+        out[4] = self._defense
+        if self._occupancy:
+            np.greater(out,0,out=out)
+        else:
+            np.minimum(out,1,out=out)
+
+    def _cover(self,left,right,bottom,top,out=None):
+        """
+        Returns how much of each pixel is covered by a set of rectangles, as
+        a float array of shape (height,width)
+
+        Where rectangles overlap, the parts are added together.
+
+        Parameter left, right, bottom, top: the edges of the rectangles
+        Precondition: each is a float array of the same shape (n,)
+
+        Parameter out: the array to put the result in
+        Precondition: out is a float array of shape (height,width), or None
+        for a new array
+        """
+        return np.matmul(self._down(bottom,top).T,self._across(left,right),
+                         out=out)
+
+    def _across(self,left,right):
+        """
+        Returns the part of the width of each column of pixels inside each
+        horizontal range, as a float array of shape (n,width)
+
+        Parameter left, right: the ranges
+        Precondition: each is a float array of the same shape (n,)
+        """
+        part = (np.minimum(right[:,None],self._right)-
+                np.maximum(left[:,None],self._left))
+        np.maximum(part,0,out=part)
+        return part*(self._width/GAME_WIDTH)
+
+    def _down(self,bottom,top):
+        """
+        Returns the part of the height of each row of pixels inside each
+        vertical range, as a float array of shape (n,height)
+
+        Parameter bottom, top: the ranges
+        Precondition: each is a float array of the same shape (n,)
+        """
+        part = (np.minimum(top[:,None],self._top)-
+                np.maximum(bottom[:,None],self._bottom))
+        np.maximum(part,0,out=part)
+        return part*(self._height/GAME_HEIGHT)
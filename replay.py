@@ -0,0 +1,912 @@
+"""
+Recording and replay module for Alien Invaders
+
+Every Wave owns a random number generator started from a seed, so a game only
+depends on its seed and on the input it is given. This module records that
+input and plays it back.
+
+A Recorder wraps a Wave. It passes every call on to the wave, and logs the
+keys that each update sees ('left', 'right', 'up' and 's', plus whether any
+other key is down) along with dt. It also logs when the ship is restored
+with createShip, which always goes with unpausing the wave (see
+restoreShip). The log is a Recording, which can be saved to a small
+binary file.
+
+playRecording re-runs a recording on a new headless Wave as fast as the CPU
+allows. Since the wave, the input and the dt values are all the same, the
+replayed game ends in exactly the same state as the recorded one. This is
+useful for profiling a real game and for catching changes in behavior:
+
+    python replay.py game.rec
+
+A recording file can only be played from the start. A seekable replay file
+(a path ending in REPLAY_SUFFIX) also holds a savestate of the wave (see
+Wave.saveState) every REPLAY_INTERVAL updates. A ReplayFile maps such a
+file into memory with mmap, and seeking to any update loads the savestate
+at or before it and plays on from there, so scrubbing through an hour-long
+game only ever reads a few pages of the file and replays a few updates:
+
+    python replay.py game.rec --index     (writes game.rpl)
+    python replay.py game.rpl
+
+To check that replays end in exactly the states of the games they record
+(see checkReplay):
+
+    python replay.py --check
+
+The game records every wave to a file if the environment variable
+INVADERS_RECORD is set to its path (see RECORD_PATH in consts.py). If the
+path ends in REPLAY_SUFFIX, the file is a seekable replay file.
+
+sjg276
+"""
+from consts import *
+from wave import *
+from policies import *
+import headless
+import array
+import bisect
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+# the keys that are logged, in the order of their bits in a key mask
+RECORD_KEYS = ('left','right','up','s')
+
+# the bit of a key mask that is set when a key not in RECORD_KEYS is down
+OTHER_KEY = 1 << len(RECORD_KEYS)
+
+# the first bytes of a recording file
+RECORD_MAGIC = b'INVR'
+
+# the version of the recording file format. Version 2 recordings are of waves
+# that keep the time past each alien step, and cannot be replayed by older
+# versions of the game (nor can version 1 recordings be replayed by this one).
+# Version 3 added whether the wave was a swarm. Version 4 recordings are of
+# waves whose bolts collide with everything they pass (see Bolt.sweeps),
+# which plays swarms differently, as their aliens are smaller than a bolt
+RECORD_VERSION = 4
+
+# the header of a recording file: magic, version, seed, rows, aliens in a row,
+# alien speed, swarm, frames, ship restores, whether there is a result, score,
+# lives, won (-1 if not over) and the number of updates when the result was
+# taken
+RECORD_HEADER = struct.Struct('<4sHQHHdBIIBqibI')
+
+# the end of the path of a seekable replay file
+REPLAY_SUFFIX = '.rpl'
+
+# the first bytes of a seekable replay file
+REPLAY_MAGIC = b'INVK'
+
+# the number of updates after each ship restore that checkReplay compares
+CHECK_UPDATES = 5
+
+# the version of the seekable replay file format. Version 2 is version 1 with
+# the bolt collisions of recording version 4. Version 3 unpauses the wave
+# when the ship is restored, so its savestates match the recorded game
+REPLAY_VERSION = 3
+
+# the number of updates between the savestates of a seekable replay file (two
+# seconds at 60 updates a second)
+REPLAY_INTERVAL = 120
+
+# the header of a seekable replay file: magic, version, seed, rows, aliens in
+# a row, alien speed, swarm, frames, ship restores, savestates, updates
+# between savestates, whether there is a result, score, lives, won (-1 if
+# not over), the number of updates when the result was taken, and padding
+# to a multiple of 8 bytes. After it come the dts (doubles), the key masks
+# (bytes), the ship restores (unsigned ints), the offset of each savestate
+# and of the end of the last one (unsigned long longs, from the start of the
+# file) and the savestates. The savestate i is of the wave before update
+# i*interval, and before the ship restores at that update
+REPLAY_HEADER = struct.Struct('<4sHQHHdBIIIIBqibI3x')
+
+
+def keyMask(input):
+    """
+    Returns the key mask of the keys input has down.
+
+    Bit i of the mask is set if RECORD_KEYS[i] is down. The bit OTHER_KEY is
+    set if any other key is down, so that the mask tells whether any key at
+    all is down, as Invaders needs to know.
+
+    Parameter input: the input to read
+    Precondition: input is a GInput object
+    """
+    mask = 0
+    count = 0
+    for pos in range(len(RECORD_KEYS)):
+        if input.is_key_down(RECORD_KEYS[pos]):
+            mask |= 1 << pos
+            count += 1
+    if input.key_count > count:
+        mask |= OTHER_KEY
+    return mask
+
+
+def maskKeys(mask):
+    """
+    Returns the keys in a key mask, as a tuple.
+
+    The bit OTHER_KEY adds the key 'other', which the game does not use.
+
+    Parameter mask: the key mask
+    Precondition: mask is an int between 0 and 2*OTHER_KEY-1
+    """
+    keys = tuple(RECORD_KEYS[pos] for pos in range(len(RECORD_KEYS)) if mask >> pos & 1)
+    if mask & OTHER_KEY:
+        keys += ('other',)
+    return keys
+
+
+class Recording(object):
+    """
+    A class to represent the input of one recorded game.
+
+    A recording holds the seed of the wave, the GameConfig of the wave,
+    the key mask and dt of every update, and the times the ship was restored.
+    Once the game is over, it also holds the result, so that a replay can
+    check that it ended the same way.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _seed: the seed of the recorded wave
+    # Invariant: _seed is an int >= 0
+    #
+    # Attribute _config: the size and speed of the wave
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute _masks: the key mask of each update
+    # Invariant: _masks is a bytearray
+    #
+    # Attribute _dts: the dt of each update
+    # Invariant: _dts is an array of doubles, as long as _masks
+    #
+    # Attribute _ships: the number of updates before each createShip
+    # Invariant: _ships is an array of unsigned ints, in increasing order
+    #
+    # Attribute _result: the score, lives, won and number of updates at the end
+    # Invariant: _result is a tuple (int,int,bool or None,int), or None if
+    # there is no result yet
+
+    def getSeed(self):
+        """
+        Returns the seed of the recorded wave
+        """
+        return self._seed
+
+    def getConfig(self):
+        """
+        Returns the GameConfig of the recorded wave
+        """
+        return self._config
+
+    def getFrameCount(self):
+        """
+        Returns the number of updates recorded
+        """
+        return len(self._masks)
+
+    def getFrame(self,frame):
+        """
+        Returns the tuple (mask,dt) of the given update
+
+        Parameter frame: the number of the update
+        Precondition: frame is an int in 0..getFrameCount()-1
+        """
+        return (self._masks[frame],self._dts[frame])
+
+    def getShips(self):
+        """
+        Returns the number of updates before each time the ship was restored,
+        as a tuple
+        """
+        return tuple(self._ships)
+
+    def getResult(self):
+        """
+        Returns the tuple (score,lives,won,updates) at the end of the game, or
+        None if the result was never recorded
+        """
+        return self._result
+
+    def setResult(self,wave):
+        """
+        Records the result of wave as the result of this recording
+
+        Parameter wave: the wave the recording was made from
+        Precondition: wave is a Wave object
+        """
+        self._result = (wave.getScore(),wave.getLives(),wave.getGameWon(),
+        len(self._masks))
+
+    def __init__(self,seed,config=None):
+        """
+        Initializes an empty recording.
+
+        Parameter seed: the seed of the recorded wave
+        Precondition: seed is an int >= 0
+
+        Parameter config: the size and speed of the wave
+        Precondition: config is a GameConfig object, or None for the sizes in
+        consts.py
+        """
+        assert type(seed) == int and seed >= 0,repr(seed)+' is not a valid seed'
+        assert config is None or isinstance(config,GameConfig),repr(config)+\
+        ' is not a GameConfig'
+        if config is None:
+            config = GameConfig()
+        self._seed = seed
+        self._config = config
+        self._masks = bytearray()
+        self._dts = array.array('d')
+        self._ships = array.array('I')
+        self._result = None
+
+    def addFrame(self,mask,dt):
+        """
+        Records one update.
+
+        Parameter mask: the keys down during the update
+        Precondition: mask is a key mask (see keyMask)
+
+        Parameter dt: the dt passed to the update
+        Precondition: dt is a number (int or float)
+        """
+        self._masks.append(mask)
+        self._dts.append(dt)
+
+    def addShip(self):
+        """
+        Records that the ship was restored after the updates recorded so far.
+        """
+        self._ships.append(len(self._masks))
+
+    def toBytes(self):
+        """
+        Returns the recording in the binary recording file format.
+        """
+        if self._result is None:
+            result = (0,0,0,-1,0)
+        else:
+            score,lives,won,updates = self._result
+            result = (1,score,lives,-1 if won is None else int(won),updates)
+        header = RECORD_HEADER.pack(RECORD_MAGIC,RECORD_VERSION,self._seed,
+        *self._config.getKey(),len(self._masks),len(self._ships),*result)
+        dts = array.array('d',self._dts)
+        ships = array.array('I',self._ships)
+        if sys.byteorder == 'big':
+            dts.byteswap()
+            ships.byteswap()
+        return header+bytes(self._masks)+dts.tobytes()+ships.tobytes()
+
+    @classmethod
+    def fromBytes(cls,data):
+        """
+        Returns the recording stored in data.
+
+        This raises ValueError if data is not a recording this version of the
+        game can read.
+
+        Parameter data: the recording in the binary recording file format
+        Precondition: data is a bytes-like object
+        """
+        if len(data) < RECORD_HEADER.size:
+            raise ValueError('recording is too short')
+        (magic,version,seed,rows,cols,speed,swarm,frames,ships,hasResult,score,
+        lives,won,updates) = RECORD_HEADER.unpack_from(data)
+        if magic != RECORD_MAGIC:
+            raise ValueError('not a recording')
+        if version != RECORD_VERSION:
+            raise ValueError('recording version '+str(version)+' is not supported')
+        if len(data) != RECORD_HEADER.size+frames*9+ships*4:
+            raise ValueError('recording has the wrong length')
+
+        try:
+            config = GameConfig(rows,cols,speed,bool(swarm))
+        except AssertionError:
+            raise ValueError('recording has an invalid wave size or speed')
+        recording = cls(seed,config)
+        pos = RECORD_HEADER.size
+        recording._masks = bytearray(data[pos:pos+frames])
+        pos += frames
+        recording._dts = array.array('d',bytes(data[pos:pos+8*frames]))
+        pos += 8*frames
+        recording._ships = array.array('I',bytes(data[pos:pos+4*ships]))
+        if sys.byteorder == 'big':
+            recording._dts.byteswap()
+            recording._ships.byteswap()
+        if hasResult:
+            recording._result = (score,lives,None if won < 0 else bool(won),updates)
+        return recording
+
+    def save(self,path):
+        """
+        Writes the recording to a file
+
+        If path ends in REPLAY_SUFFIX, the file is a seekable replay file (see
+        saveReplay).
+
+        Parameter path: the path of the file
+        Precondition: path is a string
+        """
+        if path.endswith(REPLAY_SUFFIX):
+            saveReplay(self,path)
+            return
+        with open(path,'wb') as file:
+            file.write(self.toBytes())
+
+    @classmethod
+    def load(cls,path):
+        """
+        Returns the recording read from a file
+
+        Parameter path: the path of the file
+        Precondition: path is a string naming a recording file
+        """
+        with open(path,'rb') as file:
+            return cls.fromBytes(file.read())
+
+
+class Recorder(object):
+    """
+    A class that records a Wave while it is being played.
+
+    A Recorder can be used anywhere the wave can: every method it does not
+    define itself is passed on to the wave. The methods update and createShip
+    are logged before they are passed on, and reset starts a new recording.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _wave: the wave being recorded
+    # Invariant: _wave is a Wave object
+    #
+    # Attribute _recording: the input recorded so far
+    # Invariant: _recording is a Recording object with the seed of _wave
+
+    def getRecording(self):
+        """
+        Returns the recording, with the current result of the wave
+        """
+        self._recording.setResult(self._wave)
+        return self._recording
+
+    def __init__(self,wave):
+        """
+        Initializes a recorder for a wave that has not been updated yet.
+
+        Parameter wave: the wave to record
+        Precondition: wave is a new Wave object
+        """
+        self._wave = wave
+        self._recording = Recording(wave.getSeed(),wave.getConfig())
+
+    def __getattr__(self,name):
+        """
+        Returns the attribute of the wave with the given name
+
+        Parameter name: the name of the attribute
+        Precondition: name is a string
+        """
+        return getattr(self._wave,name)
+
+    def update(self,input,dt):
+        """
+        Records the keys of input and dt, then updates the wave.
+
+        Parameter input: Allows functionality with user input
+        Precondition: input is an instance of GInput
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        self._recording.addFrame(keyMask(input),dt)
+        self._wave.update(input,dt)
+
+    def createShip(self):
+        """
+        Records that the ship was restored, then restores it.
+
+        The game always unpauses the wave before it restores the ship, so the
+        replay does both (see restoreShip).
+        """
+        self._recording.addShip()
+        self._wave.createShip()
+
+    def reset(self,seed=None):
+        """
+        Starts a new wave in place of this one (see Wave.reset), and a new
+        recording of it.
+
+        Parameter seed: the seed for the new wave's random numbers
+        Precondition: seed is an int in 0..2**64-1, or None to pick a random
+        seed
+        """
+        self._wave.reset(seed)
+        self._recording = Recording(self._wave.getSeed(),self._wave.getConfig())
+
+
+def restoreShip(wave):
+    """
+    Unpauses the wave and restores the ship, as the game does after the ship
+    is destroyed.
+
+    A recording only logs the createShip, so every replay restores the ship
+    with this to end in the same state as the recorded wave.
+
+    Parameter wave: the wave to restore the ship of
+    Precondition: wave is a Wave object
+    """
+    wave.setIsPaused(False)
+    wave.createShip()
+
+
+def playRecording(recording):
+    """
+    Replays a recording on a new Wave as fast as possible and returns the wave.
+
+    The wave is only updated; it is never drawn. It is made with the
+    GameConfig of the recording, so recordings of any size and speed can be
+    replayed in the same process.
+
+    Parameter recording: the recording to play
+    Precondition: recording is a Recording object
+    """
+    wave = Wave(recording.getSeed(),recording.getConfig())
+    input = headless.GInput()
+    keys = [maskKeys(mask) for mask in range(2*OTHER_KEY)]
+    ships = recording.getShips()
+    nextShip = 0
+    for frame in range(recording.getFrameCount()):
+        while nextShip < len(ships) and ships[nextShip] == frame:
+            restoreShip(wave)
+            nextShip += 1
+        mask,dt = recording.getFrame(frame)
+        input.setKeys(keys[mask])
+        wave.update(input,dt)
+    while nextShip < len(ships):
+        restoreShip(wave)
+        nextShip += 1
+    return wave
+
+
+def saveReplay(recording,path,interval=REPLAY_INTERVAL):
+    """
+    Writes a recording to a seekable replay file.
+
+    The recording is replayed on a new Wave to take its savestates, so this
+    takes about as long as playRecording.
+
+    Parameter recording: the recording to write
+    Precondition: recording is a Recording object
+
+    Parameter path: the path of the file
+    Precondition: path is a string
+
+    Parameter interval: the number of updates between savestates
+    Precondition: interval is an int > 0
+    """
+    assert type(interval) == int and interval > 0,repr(interval)+\
+    ' is not a valid interval'
+    frames = recording.getFrameCount()
+    ships = recording.getShips()
+    count = frames//interval+1
+    result = recording.getResult()
+    if result is None:
+        result = (0,0,0,-1,0)
+    else:
+        score,lives,won,updates = result
+        result = (1,score,lives,-1 if won is None else int(won),updates)
+    steps = [recording.getFrame(frame) for frame in range(frames)]
+    masks = bytes(mask for mask,dt in steps)
+    dts = array.array('d',[dt for mask,dt in steps])
+    shipArray = array.array('I',ships)
+    offsets = array.array('Q',[0]*(count+1))
+    if sys.byteorder == 'big':
+        dts.byteswap()
+        shipArray.byteswap()
+
+    wave = Wave(recording.getSeed(),recording.getConfig())
+    input = headless.GInput()
+    keys = [maskKeys(mask) for mask in range(2*OTHER_KEY)]
+    nextShip = 0
+    with open(path,'wb') as file:
+        file.write(REPLAY_HEADER.pack(REPLAY_MAGIC,REPLAY_VERSION,
+        recording.getSeed(),*recording.getConfig().getKey(),frames,len(ships),
+        count,interval,*result))
+        file.write(dts.tobytes())
+        file.write(masks)
+        file.write(shipArray.tobytes())
+        table = file.tell()
+        file.write(offsets.tobytes())
+        for frame in range(frames+1):
+            if frame % interval == 0:
+                offsets[frame//interval] = file.tell()
+                file.write(wave.saveState())
+            if frame == frames:
+                break
+            while nextShip < len(ships) and ships[nextShip] == frame:
+                restoreShip(wave)
+                nextShip += 1
+            mask,dt = steps[frame]
+            input.setKeys(keys[mask])
+            wave.update(input,dt)
+        offsets[count] = file.tell()
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        file.seek(table)
+        file.write(offsets.tobytes())
+
+
+class ReplayFile(object):
+    """
+    A class to watch a seekable replay file from any update.
+
+    The file is mapped into memory, and nothing is read from it until it is
+    needed. The replay file keeps one Wave, which is at the start of the
+    update getPosition(); seek moves it to any update.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _file: the open file
+    # Invariant: _file is a file object, or None once closed
+    #
+    # Attribute _map: the file, mapped into memory
+    # Invariant: _map is an mmap object
+    #
+    # Attribute _seed: the seed of the recorded wave
+    # Invariant: _seed is an int >= 0
+    #
+    # Attribute _config: the size and speed of the wave
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute _interval: the number of updates between savestates
+    # Invariant: _interval is an int > 0
+    #
+    # Attribute _result: the same as in Recording
+    #
+    # Attribute _dts: the dt of each update
+    # Invariant: _dts is a memoryview of doubles in _map
+    #
+    # Attribute _masks: the key mask of each update
+    # Invariant: _masks is a memoryview of bytes in _map, as long as _dts
+    #
+    # Attribute _ships: the number of updates before each createShip
+    # Invariant: _ships is a memoryview of unsigned ints in _map
+    #
+    # Attribute _offsets: where each savestate starts, and the last one ends
+    # Invariant: _offsets is a memoryview of unsigned long longs in _map
+    #
+    # Attribute _wave: the wave being watched
+    # Invariant: _wave is a Wave object at the start of update _position
+    #
+    # Attribute _position: the next update of _wave
+    # Invariant: _position is an int in 0..getFrameCount()
+    #
+    # Attribute _input: the keys _wave reads
+    # Invariant: _input is a headless GInput object
+    #
+    # Attribute _keys: the keys of every key mask
+    # Invariant: _keys is a list of tuples, indexed by key mask
+
+    def getSeed(self):
+        """
+        Returns the seed of the recorded wave
+        """
+        return self._seed
+
+    def getConfig(self):
+        """
+        Returns the GameConfig of the recorded wave
+        """
+        return self._config
+
+    def getFrameCount(self):
+        """
+        Returns the number of updates recorded
+        """
+        return len(self._masks)
+
+    def getFrame(self,frame):
+        """
+        Returns the tuple (mask,dt) of the given update
+
+        Parameter frame: the number of the update
+        Precondition: frame is an int in 0..getFrameCount()-1
+        """
+        return (self._masks[frame],self._dts[frame])
+
+    def getKeyframeCount(self):
+        """
+        Returns the number of savestates in the file
+        """
+        return len(self._offsets)-1
+
+    def getResult(self):
+        """
+        Returns the tuple (score,lives,won,updates) at the end of the game, or
+        None if the result was never recorded
+        """
+        return self._result
+
+    def getPosition(self):
+        """
+        Returns the update the wave is at the start of
+        """
+        return self._position
+
+    def getWave(self):
+        """
+        Returns the wave being watched, at the start of update getPosition()
+
+        The wave may be drawn, but it should only be changed with seek and
+        step.
+        """
+        return self._wave
+
+    def __init__(self,path):
+        """
+        Opens a seekable replay file, at update 0.
+
+        This raises ValueError if the file is not a seekable replay file this
+        version of the game can read.
+
+        Parameter path: the path of the file
+        Precondition: path is a string
+        """
+        self._file = open(path,'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(),0,access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError('replay file is empty')
+        try:
+            self._open()
+        except ValueError:
+            self.close()
+            raise
+        self._input = headless.GInput()
+        self._keys = [maskKeys(mask) for mask in range(2*OTHER_KEY)]
+        self._wave = Wave(self._seed,self._config)
+        self._position = 0
+        self._load(0)
+
+    def seek(self,frame):
+        """
+        Moves the wave to the start of the given update, and returns it.
+
+        The wave plays on from where it is if that is closer than the last
+        savestate at or before frame; otherwise it loads that savestate first.
+
+        Parameter frame: the update to move to
+        Precondition: frame is an int in 0..getFrameCount()
+        """
+        assert type(frame) == int and frame >= 0 and frame <= len(self._masks),\
+        repr(frame)+' is not a frame of the replay'
+        keyframe = frame//self._interval
+        if frame < self._position or keyframe*self._interval > self._position:
+            self._load(keyframe)
+        self.step(frame-self._position)
+        return self._wave
+
+    def step(self,count=1):
+        """
+        Plays the next count updates, restoring the ship where it was
+        restored in the game.
+
+        Parameter count: the number of updates to play
+        Precondition: count is an int >= 0, and getPosition()+count is at most
+        getFrameCount()
+        """
+        wave = self._wave
+        ships = self._ships
+        nextShip = bisect.bisect_left(ships,self._position)
+        for frame in range(self._position,self._position+count):
+            while nextShip < len(ships) and ships[nextShip] == frame:
+                restoreShip(wave)
+                nextShip += 1
+            self._input.setKeys(self._keys[self._masks[frame]])
+            wave.update(self._input,self._dts[frame])
+        self._position += count
+
+    def close(self):
+        """
+        Closes the file.
+
+        The wave can still be used, but seek and step can not.
+        """
+        if self._file is None:
+            return
+        for view in ('_dts','_masks','_ships','_offsets'):
+            if hasattr(self,view):
+                getattr(self,view).release()
+        self._map.close()
+        self._file.close()
+        self._file = None
+
+    def _open(self):
+        """
+        Reads the header and makes the views of the sections of the file.
+
+        This raises ValueError if the file is not a seekable replay file this
+        version of the game can read.
+        """
+        data = self._map
+        if len(data) < REPLAY_HEADER.size:
+            raise ValueError('replay file is too short')
+        (magic,version,seed,rows,cols,speed,swarm,frames,ships,count,interval,
+        hasResult,score,lives,won,updates) = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError('not a replay file')
+        if version != REPLAY_VERSION:
+            raise ValueError('replay file version '+str(version)+
+            ' is not supported')
+        if sys.byteorder == 'big':
+            raise ValueError('replay files can only be mapped on little-endian '
+            'machines')
+        table = REPLAY_HEADER.size+9*frames+4*ships
+        if (interval == 0 or count != frames//interval+1 or
+            len(data) < table+8*(count+1)):
+            raise ValueError('replay file has the wrong length')
+        try:
+            self._config = GameConfig(rows,cols,speed,bool(swarm))
+        except AssertionError:
+            raise ValueError('replay file has an invalid wave size or speed')
+        self._seed = seed
+        self._interval = interval
+        self._result = None
+        if hasResult:
+            self._result = (score,lives,None if won < 0 else bool(won),updates)
+        view = memoryview(data)
+        pos = REPLAY_HEADER.size
+        self._dts = view[pos:pos+8*frames].cast('d')
+        pos += 8*frames
+        self._masks = view[pos:pos+frames]
+        pos += frames
+        self._ships = view[pos:pos+4*ships].cast('I')
+        self._offsets = view[table:table+8*(count+1)].cast('Q')
+        view.release()
+        if self._offsets[count] != len(data):
+            raise ValueError('replay file has the wrong length')
+
+    def _load(self,keyframe):
+        """
+        Loads a savestate into the wave.
+
+        Parameter keyframe: the number of the savestate
+        Precondition: keyframe is an int in 0..getKeyframeCount()-1
+        """
+        start = self._offsets[keyframe]
+        self._wave.loadState(self._map[start:self._offsets[keyframe+1]])
+        self._position = keyframe*self._interval
+
+
+def checkReplay(seed,config=None,policy='sweep',interval=REPLAY_INTERVAL):
+    """
+    Plays a headless game while recording it, and returns True if the replays
+    of the recording are in exactly the states the game was in.
+
+    The savestate (see Wave.saveState) of playRecording must equal the one
+    of the game at the end, and a seekable replay file must give the same
+    savestate as the game at the end and at the CHECK_UPDATES updates after
+    each time the ship was restored. The replay file is written to a
+    temporary file, which is deleted.
+
+    Parameter seed: the seed of the game
+    Precondition: seed is an int >= 0
+
+    Parameter config: the size and speed of the wave
+    Precondition: config is a GameConfig object, or None for the sizes in
+    consts.py
+
+    Parameter policy: the name of the policy that plays the game
+    Precondition: policy is a key of POLICIES
+
+    Parameter interval: the number of updates between savestates of the
+    replay file
+    Precondition: interval is an int > 0
+    """
+    wave = Recorder(Wave(seed,config))
+    player = getPolicy(policy,seed)
+    input = headless.GInput()
+    states = {}
+    since = None
+    frame = 0
+    while not wave.getGameDone():
+        input.setKeys(player(wave,frame))
+        wave.update(input,FIXED_STEP)
+        frame += 1
+        if wave.getIsPaused() and not wave.getGameDone():
+            wave.setIsPaused(False)
+            wave.createShip()
+            since = 0
+        elif since is not None and since < CHECK_UPDATES:
+            states[frame] = wave.saveState()
+            since += 1
+    states[frame] = wave.saveState()
+    recording = wave.getRecording()
+    same = playRecording(recording).saveState() == states[frame]
+
+    handle,path = tempfile.mkstemp(suffix=REPLAY_SUFFIX)
+    os.close(handle)
+    try:
+        saveReplay(recording,path,interval)
+        replay = ReplayFile(path)
+        for frame in sorted(states):
+            same = same and replay.seek(frame).saveState() == states[frame]
+        replay.close()
+    finally:
+        os.remove(path)
+    return same
+
+
+def main():
+    """
+    Replays the recording files and seekable replay files named on the
+    command line.
+
+    Only the arguments that end in .rec or REPLAY_SUFFIX are read. Each one is
+    replayed with the wave size and speed it was recorded with. For each
+    file, this prints the result of the replay, whether it matches the
+    recorded result, and how many updates per second the replay ran at; for
+    a seekable replay file, it also prints how long a seek to a random update
+    takes. It exits with status 1 if any replay does not match.
+
+    With --index, every recording file is also written as a seekable replay
+    file next to it. With --check, a few games are first played and checked
+    against their replays (see checkReplay).
+    """
+    status = 0
+    if '--check' in sys.argv:
+        for seed in range(10):
+            same = checkReplay(seed)
+            if not same:
+                status = 1
+            print('seed %d: replay %s' % (seed,'matches' if same else
+            'DOES NOT MATCH'))
+    for path in sys.argv[1:]:
+        if path.startswith('-'):
+            continue
+        if path.endswith(REPLAY_SUFFIX):
+            replay = ReplayFile(path)
+            start = time.perf_counter()
+            replay.step(replay.getFrameCount())
+            wave = replay.getWave()
+            seconds = time.perf_counter()-start
+            expected = replay.getResult()
+            updates = replay.getFrameCount()
+            result = (wave.getScore(),wave.getLives(),wave.getGameWon(),updates)
+            rng = random.Random(0)
+            seek = time.perf_counter()
+            for pos in range(100):
+                replay.seek(rng.randint(0,updates))
+            seek = (time.perf_counter()-seek)/100
+            replay.close()
+        elif path.endswith('.rec'):
+            recording = Recording.load(path)
+            start = time.perf_counter()
+            wave = playRecording(recording)
+            seconds = time.perf_counter()-start
+            expected = recording.getResult()
+            updates = recording.getFrameCount()
+            result = (wave.getScore(),wave.getLives(),wave.getGameWon(),updates)
+            seek = None
+            if '--index' in sys.argv:
+                saveReplay(recording,path[:-len('.rec')]+REPLAY_SUFFIX)
+        else:
+            continue
+        match = expected is None or expected == result
+        if not match:
+            status = 1
+        print('%s: score %d, lives %d, won %s, %d updates, %s, %.0f updates/s%s' %
+        (path,result[0],result[1],result[2],result[3],
+        'matches' if match else 'DOES NOT MATCH '+repr(expected),
+        result[3]/max(seconds,1e-9),
+        '' if seek is None else ', %.2f ms per seek' % (1000*seek)))
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
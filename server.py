@@ -0,0 +1,596 @@
+"""
+Game server module for Alien Invaders
+
+This module hosts many headless games in one process, for remote bots and
+thin clients. Every client that connects plays its own Wave (a session),
+with its own tick: the seconds of game time in each update, which is also
+how often the session is updated.
+
+The sessions are all driven by one scheduler on one asyncio event loop, with
+no thread for each session. The scheduler keeps the time each session is
+next due and always updates the session that has been due the longest, so a
+session that falls behind is served before any session that is on time and
+none of them can starve. New sessions are given different phases within
+their tick, so that sessions that start together do not all come due at the
+same moment. A session that falls more than MAX_CATCHUP ticks behind skips
+the ticks it missed, as Invaders does.
+
+For every update, the scheduler notes how late it ran (the tick lag). The
+server reports the lag of each session with getStats.
+
+The protocol is binary. A client starts with a HELLO, giving the size and
+speed of its wave, the seed and the tick. After that, every byte it sends is
+the key mask of the keys it holds down from then on (see keyMask in
+replay.py); a byte with the bit BYE set ends the session. A paused wave goes
+on once the mask holds 's', as in the game. The server answers with the
+same keyframes and deltas as spectate.py, one per update, so a client keeps
+the state in a SpectatorScene. The connection is closed when the game is
+over.
+
+    python server.py --port=7800
+    python server.py --connect=127.0.0.1:7800 --bots=200 3 4 0.5
+
+sjg276
+"""
+from consts import *
+from replay import *
+from spectate import *
+from policies import *
+import headless
+import argparse
+import asyncio
+import heapq
+import struct
+import sys
+import threading
+import time
+
+# the first bytes of a HELLO
+SERVER_MAGIC = b'INVG'
+
+# the version of the protocol
+SERVER_VERSION = 1
+
+# the message that starts a session: magic, version, rows, aliens in a row,
+# alien speed, swarm, seed and the tick in seconds
+HELLO = struct.Struct('<4sBHHdBQd')
+
+# the bit of a key byte that ends the session
+BYE = 0x80
+
+# the largest number of sessions at once
+SERVER_SESSIONS = 1000
+
+# the longest a tick may be, in seconds
+SERVER_MAX_TICK = 1.0
+
+# the seconds the scheduler runs updates before it lets the sockets be served
+SERVER_SLICE = 0.002
+
+# the seconds between reports of the lag in main
+SERVER_REPORT = 5.0
+
+
+def keysMask(keys):
+    """
+    Returns the key mask of a list of keys, as in keyMask in replay.py
+
+    The keys not in RECORD_KEYS are left out.
+
+    Parameter keys: the keys held down
+    Precondition: keys is an iterable of key names
+    """
+    mask = 0
+    for key in keys:
+        if key in RECORD_KEYS:
+            mask |= 1 << RECORD_KEYS.index(key)
+    return mask
+
+
+class _Session(object):
+    """
+    A class for the server's view of one game and its client.
+
+    A session is the sink of the SpectatorFeed of its wave, so every update
+    goes straight to the client. A client that falls SPECTATE_BACKLOG bytes
+    behind is sent nothing until the next keyframe.
+    """
+    # Attribute number: the number of the session, in the order they started
+    # Invariant: number is an int >= 0
+    #
+    # Attribute wave: the game
+    # Invariant: wave is a Wave object
+    #
+    # Attribute writer: the stream used to send to the client
+    # Invariant: writer is an asyncio.StreamWriter
+    #
+    # Attribute input: the keys the wave reads
+    # Invariant: input is a headless GInput object
+    #
+    # Attribute mask: the key mask the client holds down
+    # Invariant: mask is an int >= 0
+    #
+    # Attribute tick: the seconds of game time in each update
+    # Invariant: tick is a float > 0
+    #
+    # Attribute due: when the next update is due
+    # Invariant: due is a float, in the time of the event loop
+    #
+    # Attribute ticks: the number of updates run
+    # Invariant: ticks is an int >= 0
+    #
+    # Attribute skipped: the number of updates skipped to catch up
+    # Invariant: skipped is an int >= 0
+    #
+    # Attribute lag: the total seconds the updates ran late
+    # Invariant: lag is a float >= 0
+    #
+    # Attribute maxLag: the most seconds an update ran late
+    # Invariant: maxLag is a float >= 0
+    #
+    # Attribute lagging: whether the client fell too far behind
+    # Invariant: lagging is a bool
+    #
+    # Attribute closed: whether the session is over
+    # Invariant: closed is a bool
+
+    def __init__(self,number,writer,config,seed,tick):
+        """
+        Initializes a session and sends the client the first keyframe.
+
+        Parameter number: the number of the session
+        Precondition: number is an int >= 0
+
+        Parameter writer: the stream used to send to the client
+        Precondition: writer is an asyncio.StreamWriter
+
+        Parameter config: the size and speed of the wave
+        Precondition: config is a GameConfig object
+
+        Parameter seed: the seed of the wave
+        Precondition: seed is an int >= 0
+
+        Parameter tick: the seconds of game time in each update
+        Precondition: tick is a float > 0
+        """
+        self.number = number
+        self.writer = writer
+        self.input = headless.GInput()
+        self.mask = 0
+        self.tick = tick
+        self.due = 0.0
+        self.ticks = 0
+        self.skipped = 0
+        self.lag = 0.0
+        self.maxLag = 0.0
+        self.lagging = False
+        self.closed = False
+        self.wave = Wave(seed,config)
+        self.wave.setFeed(SpectatorFeed(self))
+
+    def publish(self,data,keyframe):
+        """
+        Sends a message of the feed to the client, unless it is too far
+        behind.
+
+        Parameter data: the message
+        Precondition: data is a bytes object holding one whole message
+
+        Parameter keyframe: whether the message is a keyframe
+        Precondition: keyframe is a bool
+        """
+        if self.writer.is_closing():
+            return
+        behind = self.writer.transport.get_write_buffer_size() > SPECTATE_BACKLOG
+        if keyframe:
+            self.lagging = behind
+        elif behind:
+            self.lagging = True
+        if not self.lagging:
+            self.writer.write(data)
+
+    def update(self):
+        """
+        Runs one tick of the game with the keys the client holds down.
+
+        A paused wave only goes on once the keys hold 's'.
+        """
+        wave = self.wave
+        keys = maskKeys(self.mask)
+        if wave.getIsPaused():
+            if 's' in keys:
+                wave.createShip()
+                wave.setIsPaused(False)
+            return
+        self.input.setKeys(keys)
+        wave.update(self.input,self.tick)
+
+
+class GameServer(object):
+    """
+    A class to host many games at once for remote clients.
+
+    The server runs asyncio in a background thread, like the Coordinator in
+    farm.py. The methods start, getStats and stop are called from the
+    caller's thread; every other method runs in the server thread.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _host: the address the server listens on
+    # Invariant: _host is a string
+    #
+    # Attribute _port: the port the server listens on (0 until started, if
+    # the system picks the port)
+    # Invariant: _port is an int >= 0
+    #
+    # Attribute _limit: the largest number of sessions at once
+    # Invariant: _limit is an int > 0
+    #
+    # Attribute _sessions: the sessions that are not over
+    # Invariant: _sessions is a dictionary from session number to _Session
+    #
+    # Attribute _due: when each session is next due
+    # Invariant: _due is a heap (see heapq) of (due,number) tuples, with one
+    # entry for each session in _sessions that is still playing, and maybe
+    # some for sessions that are over
+    #
+    # Attribute _started: the number of sessions started so far
+    # Invariant: _started is an int >= 0
+    #
+    # Attribute _wake: set when a session is added, to wake the scheduler
+    # Invariant: _wake is an asyncio.Event, or None if not started
+    #
+    # Attribute _loop: the event loop of the server thread
+    # Invariant: _loop is an asyncio event loop, or None if not started
+    #
+    # Attribute _thread: the server thread
+    # Invariant: _thread is a threading.Thread, or None if not started
+
+    def getAddress(self):
+        """
+        Returns the (host,port) the server is listening on
+        """
+        return (self._host,self._port)
+
+    def getSessionCount(self):
+        """
+        Returns the number of sessions that are not over
+        """
+        return len(self._sessions)
+
+    def __init__(self,host='127.0.0.1',port=0,limit=SERVER_SESSIONS):
+        """
+        Initializes a server that is not started yet.
+
+        Parameter host: the address to listen on
+        Precondition: host is a string
+
+        Parameter port: the port to listen on
+        Precondition: port is an int >= 0; 0 lets the system pick a free port
+
+        Parameter limit: the largest number of sessions at once
+        Precondition: limit is an int > 0
+        """
+        assert type(port) == int and port >= 0,repr(port)+' is not a valid port'
+        assert type(limit) == int and limit > 0,repr(limit)+\
+        ' is not a valid limit'
+        self._host = host
+        self._port = port
+        self._limit = limit
+        self._sessions = {}
+        self._due = []
+        self._started = 0
+        self._wake = None
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the server thread and returns the (host,port) it listens on.
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._wake = asyncio.Event()
+            server = self._loop.run_until_complete(asyncio.start_server(
+            self._handle,self._host,self._port))
+            self._port = server.sockets[0].getsockname()[1]
+            scheduler = self._loop.create_task(self._schedule())
+            ready.set()
+            self._loop.run_forever()
+            scheduler.cancel()
+            server.close()
+            for session in self._sessions.values():
+                session.writer.close()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve,daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.getAddress()
+
+    def getStats(self):
+        """
+        Returns the tick lag of every session that is not over, as a list of
+        dictionaries in the order the sessions started
+
+        Each dictionary has the keys 'session', 'tick', 'ticks', 'skipped',
+        'meanLag' and 'maxLag' (in seconds), 'score' and 'lives'. The stats
+        are gathered on the server thread, as that thread adds and removes
+        sessions, so this must not be called from it.
+        """
+        if self._loop is None:
+            return []
+        return asyncio.run_coroutine_threadsafe(self._stats(),
+        self._loop).result()
+
+    def stop(self):
+        """
+        Closes every session and shuts down the server thread.
+        """
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+
+    async def _stats(self):
+        """
+        Returns the stats of getStats, gathered on the server thread
+        """
+        stats = []
+        for session in sorted(self._sessions.values(),
+                              key=lambda session: session.number):
+            stats.append({'session': session.number, 'tick': session.tick,
+            'ticks': session.ticks, 'skipped': session.skipped,
+            'meanLag': session.lag/session.ticks if session.ticks else 0.0,
+            'maxLag': session.maxLag, 'score': session.wave.getScore(),
+            'lives': session.wave.getLives()})
+        return stats
+
+    def _add(self,session):
+        """
+        Adds a session to the scheduler.
+
+        Sessions are given phases spread by the golden ratio, so however many
+        start at once, their updates are spread over the whole tick.
+
+        Parameter session: the new session
+        Precondition: session is a _Session object
+        """
+        phase = (session.number*0.6180339887498949) % 1.0
+        session.due = self._loop.time()+phase*session.tick
+        self._sessions[session.number] = session
+        heapq.heappush(self._due,(session.due,session.number))
+        self._wake.set()
+
+    def _close(self,session):
+        """
+        Ends a session and closes its connection.
+
+        Parameter session: the session to end
+        Precondition: session is a _Session object
+        """
+        if not session.closed:
+            session.closed = True
+            del self._sessions[session.number]
+            session.writer.close()
+
+    async def _schedule(self):
+        """
+        Runs the update of every session when it is due, forever.
+
+        The session that has been due the longest always goes first. After
+        SERVER_SLICE seconds of updates, the scheduler lets the event loop
+        serve the sockets before it goes on.
+        """
+        loop = self._loop
+        due = self._due
+        while True:
+            while due and due[0][1] not in self._sessions:
+                heapq.heappop(due)
+            now = loop.time()
+            if not due or due[0][0] > now:
+                self._wake.clear()
+                delay = due[0][0]-now if due else None
+                try:
+                    await asyncio.wait_for(self._wake.wait(),delay)
+                except asyncio.TimeoutError:
+                    pass # A session is due
+                continue
+
+            start = now
+            while due and due[0][0] <= now and now-start < SERVER_SLICE:
+                when,number = heapq.heappop(due)
+                session = self._sessions.get(number)
+                if session is None:
+                    continue
+                late = now-when
+                if late > session.tick*MAX_CATCHUP:
+                    missed = int(late/session.tick)
+                    session.skipped += missed
+                    when += missed*session.tick
+                    late = now-when
+                session.ticks += 1
+                session.lag += late
+                session.maxLag = max(session.maxLag,late)
+                session.update()
+                if session.wave.getGameDone():
+                    self._close(session)
+                else:
+                    session.due = when+session.tick
+                    heapq.heappush(due,(session.due,number))
+                now = loop.time()
+            await asyncio.sleep(0)
+
+    async def _handle(self,reader,writer):
+        """
+        Starts a session for one client and reads its keys until it leaves.
+
+        A client that sends a bad HELLO, or connects when there are already
+        as many sessions as the limit, is disconnected.
+
+        Parameter reader: the stream to read from the client
+        Precondition: reader is an asyncio.StreamReader
+
+        Parameter writer: the stream to write to the client
+        Precondition: writer is an asyncio.StreamWriter
+        """
+        session = None
+        try:
+            hello = await reader.readexactly(HELLO.size)
+            magic,version,rows,perrow,speed,swarm,seed,tick = HELLO.unpack(hello)
+            if (magic == SERVER_MAGIC and version == SERVER_VERSION and
+                len(self._sessions) < self._limit and
+                tick > 0 and tick <= SERVER_MAX_TICK and
+                rows >= 1 and perrow >= 1 and speed > 0 and speed <= 3 and
+                (swarm or (rows <= 10 and perrow <= 15))):
+                session = _Session(self._started,writer,
+                GameConfig(rows,perrow,speed,bool(swarm)),seed,tick)
+                self._started += 1
+                self._add(session)
+                while not session.closed:
+                    data = await reader.read(256)
+                    if not data or data[-1] & BYE:
+                        break
+                    session.mask = data[-1]
+        except (OSError,asyncio.IncompleteReadError):
+            pass # Treat a broken connection like a disconnect
+        if session is not None:
+            self._close(session)
+        else:
+            writer.close()
+
+
+async def playRemote(host,port,config=None,seed=0,policy=sweepPolicy,
+                     tick=FIXED_STEP):
+    """
+    Plays a game on a server with a policy, and returns the SpectatorScene
+    of the game once it is over (or the server hangs up).
+
+    The policy is asked for keys after every update the server sends, and the
+    keys are only sent when they change. 's' is added whenever there is no
+    ship, so that a paused wave goes on.
+
+    Parameter host: the host name or address of the server
+    Precondition: host is a string
+
+    Parameter port: the port of the server
+    Precondition: port is an int > 0
+
+    Parameter config: the size and speed of the wave
+    Precondition: config is a GameConfig object, or None for the default
+
+    Parameter seed: the seed of the wave
+    Precondition: seed is an int >= 0
+
+    Parameter policy: the player choosing the keys (see policies.py)
+    Precondition: policy is a callable taking the scene and the frame number
+    and returning an iterable of keys
+
+    Parameter tick: the seconds of game time in each update
+    Precondition: tick is a float > 0 and <= SERVER_MAX_TICK
+    """
+    if config is None:
+        config = GameConfig()
+    reader,writer = await asyncio.open_connection(host,port)
+    writer.write(HELLO.pack(SERVER_MAGIC,SERVER_VERSION,config.getRows(),
+    config.getAliensInRow(),config.getSpeed(),config.isSwarm(),seed,tick))
+    scene = SpectatorScene()
+    mask = 0
+    frame = 0
+    while True:
+        message = await readMessage(reader)
+        if message is None:
+            break
+        scene.apply(*message)
+        if scene.getGameDone():
+            break
+        keys = list(policy(scene,frame))
+        frame += 1
+        if scene.getShipX() is None:
+            keys.append('s')
+        if keysMask(keys) != mask:
+            mask = keysMask(keys)
+            writer.write(bytes([mask]))
+    writer.close()
+    return scene
+
+
+async def _playBots(host,port,count,config,seed,policy,tick):
+    """
+    Plays count games on a server at once and prints the result of each one
+    as it ends.
+
+    The parameters are as in playRemote, with count the number of games.
+    """
+    async def play(pos):
+        scene = await playRemote(host,port,config,seed+pos,
+        getPolicy(policy,seed+pos),tick)
+        print('bot %d  score %d  lives %d  won %s' % (pos,scene.getScore(),
+        scene.getLives(),scene.getGameWon()),flush=True)
+    await asyncio.gather(*[play(pos) for pos in range(count)])
+
+
+def main():
+    """
+    Runs a server, or a set of bots that play on one, from the command line.
+
+    Without --connect, this serves games and prints the tick lag every
+    SERVER_REPORT seconds. With --connect, this plays --bots games at once on
+    the server at HOST:PORT.
+    """
+    parser = argparse.ArgumentParser(description='Host many games at once.')
+    parser.add_argument('rows',nargs='?',type=int,
+    help='the number of rows of aliens (see parseConfig)')
+    parser.add_argument('perrow',nargs='?',type=int,
+    help='the number of aliens in a row (see parseConfig)')
+    parser.add_argument('speed',nargs='?',type=float,
+    help='the seconds between alien steps (see parseConfig)')
+    parser.add_argument('--connect',metavar='HOST:PORT',
+    help='play bots on the server at HOST:PORT')
+    parser.add_argument('--host',default='127.0.0.1',
+    help='the address the server listens on')
+    parser.add_argument('--port',type=int,default=0,
+    help='the port the server listens on (default: any free port)')
+    parser.add_argument('--limit',type=int,default=SERVER_SESSIONS,
+    help='the largest number of sessions at once')
+    parser.add_argument('--bots',type=int,default=1,
+    help='the number of games the bots play at once')
+    parser.add_argument('--seed',type=int,default=0,
+    help='the seed of the first bot game; the others count up from it')
+    parser.add_argument('--policy',default='sweep',choices=sorted(POLICIES),
+    help='the policy the bots play with')
+    parser.add_argument('--tick',type=float,default=FIXED_STEP,
+    help='the seconds of game time in each update of a bot game')
+    args = parser.parse_intermixed_args()
+
+    if args.connect is not None:
+        host,port = args.connect.rsplit(':',1)
+        words = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+        asyncio.run(_playBots(host,int(port),args.bots,
+        parseConfig([sys.argv[0]]+words),args.seed,args.policy,args.tick))
+        return
+
+    server = GameServer(args.host,args.port,args.limit)
+    host,port = server.start()
+    print('serving on '+host+':'+str(port),flush=True)
+    try:
+        while True:
+            time.sleep(SERVER_REPORT)
+            stats = server.getStats()
+            if stats:
+                print('%d sessions  mean lag %.2f ms  max lag %.2f ms  skipped %d' %
+                (len(stats),1000*sum(stat['meanLag'] for stat in stats)/len(stats),
+                1000*max(stat['maxLag'] for stat in stats),
+                sum(stat['skipped'] for stat in stats)),flush=True)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,974 @@
+"""
+Spectator streaming module for Alien Invaders
+
+This module streams a live game to any number of viewers on the same
+machine. Sending the whole wave every frame would cost as much as the wave
+is big, but from one frame to the next very little of it changes: a few
+aliens die, the formation takes a step, a bolt is fired or leaves the
+screen, the ship moves, the score goes up. So a frame is sent as only those
+changes (a delta), and the viewers work out the rest:
+
+    aliens    every live alien sits on the formation, so a viewer only needs
+              the position of the formation and which aliens were killed
+    bolts     every bolt moves BOLT_SPEED each frame, so a viewer only needs
+              each bolt once, when it is fired, and then when it is removed
+    the rest  the ship, the lives, the score and the result are sent only in
+              the frames when they change
+
+Every KEYFRAME_FRAMES frames the whole state is sent instead (a keyframe),
+which a viewer can start from. The server keeps the last keyframe and the
+deltas after it, so a viewer that joins late is sent those right away and is
+in sync at once.
+
+A SpectatorFeed is given to a Wave with setFeed. The wave tells it about each
+alien killed and each bolt fired or removed as it happens, and hands it the
+state at the end of every update, so the work of a frame only depends on
+how much changed in it. The feed turns this into messages for a
+SpectatorServer, which serves them over asyncio on localhost. A viewer reads
+the messages with readMessage and keeps the scene in a SpectatorScene, which
+draws it the same way Wave.draw does.
+
+Every message is a MESSAGE_HEADER (the length of the body, the kind of
+message and the frame), followed by the body. The game streams every wave if
+the environment variable INVADERS_SPECTATE is set to a port (see
+SPECTATE_PORT in consts.py). A stream can also be tried without a window:
+
+    python spectate.py --port=7777
+    python spectate.py --connect=127.0.0.1:7777
+
+sjg276
+"""
+from consts import *
+from wave import *
+from policies import *
+import headless
+import argparse
+import asyncio
+import struct
+import sys
+import threading
+import time
+
+# the number of frames between keyframes (two seconds at 60 frames a second)
+KEYFRAME_FRAMES = 120
+
+# the number of bytes a viewer may fall behind by before it is sent nothing
+# more until the next keyframe
+SPECTATE_BACKLOG = 1 << 20
+
+# the kinds of message
+KEYFRAME = 1
+DELTA = 2
+
+# the start of every message: the length of the body, the kind and the frame
+MESSAGE_HEADER = struct.Struct('<IBI')
+
+# the start of a keyframe: rows, aliens in a row, speed, swarm, formation x
+# and y, whether there is a ship, ship x, lives, score, done, won (-1 if not
+# over) and the number of bolts. The bolts and then one bit for each cell of
+# the alien grid (1 if alive), row by row from the bottom row, follow it
+KEYFRAME_HEADER = struct.Struct('<HHdBddBdiqBbH')
+
+# the start of a delta: the flags of the fields that follow, the number of
+# aliens killed, the number of bolts removed and the number of bolts fired.
+# The fields, then the kills, then the removed bolts and then the fired bolts
+# follow it
+DELTA_HEADER = struct.Struct('<BHHH')
+
+# a bolt: its number, x, y and velocity
+BOLT_STATE = struct.Struct('<Iddd')
+
+# a killed alien: row and column
+KILL = struct.Struct('<HH')
+
+# a removed bolt: its number
+DROP = struct.Struct('<I')
+
+# the fields a delta may carry, by flag
+FORMATION_CHANGED = 1
+SHIP_CHANGED = 2
+LIVES_CHANGED = 4
+SCORE_CHANGED = 8
+RESULT_CHANGED = 16
+
+# the formats of the fields, in the order they follow the delta header
+FORMATION_STATE = struct.Struct('<dd')
+SHIP_STATE = struct.Struct('<Bd')
+LIVES_STATE = struct.Struct('<i')
+SCORE_STATE = struct.Struct('<q')
+RESULT_STATE = struct.Struct('<Bb')
+
+
+class SpectatorFeed(object):
+    """
+    A class to turn the updates of one Wave into keyframes and deltas.
+
+    Every bolt gets a number when it is fired, which is how a delta names the
+    bolts it removes. The messages are handed to a sink, an object with a
+    method publish(data,keyframe), such as a SpectatorServer.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _sink: where the messages go
+    # Invariant: _sink is an object with a method publish(data,keyframe)
+    #
+    # Attribute _interval: the number of frames between keyframes
+    # Invariant: _interval is an int > 0
+    #
+    # Attribute _config: the size and speed of the wave
+    # Invariant: _config is a GameConfig object, or None before reset
+    #
+    # Attribute _frame: the number of the last frame sent
+    # Invariant: _frame is an int >= 0
+    #
+    # Attribute _serial: the number of the next bolt fired
+    # Invariant: _serial is an int >= 0
+    #
+    # Attribute _bolts: the bolts on screen, by number
+    # Invariant: _bolts is a dictionary from int to Bolt object
+    #
+    # Attribute _numbers: the number of each bolt on screen
+    # Invariant: _numbers is a dictionary from the id of a Bolt to its number
+    #
+    # Attribute _alive: which aliens are alive, as they are sent in a keyframe
+    # Invariant: _alive is a bytearray with one bit for each cell of the alien
+    # grid, row by row from the bottom row
+    #
+    # Attribute _kills: the aliens killed since the last frame sent
+    # Invariant: _kills is a list of (row,col) tuples
+    #
+    # Attribute _drops: the bolts removed since the last frame sent, which had
+    # been sent
+    # Invariant: _drops is a list of bolt numbers
+    #
+    # Attribute _fired: the bolts fired since the last frame sent
+    # Invariant: _fired is a dictionary from bolt number to Bolt object
+    #
+    # Attribute _state: the fields in the last frame sent
+    # Invariant: _state is a list of formation x, formation y, whether there
+    # is a ship, ship x, lives, score, done and won, or None before reset
+
+    def getFrame(self):
+        """
+        Returns the number of the last frame sent
+        """
+        return self._frame
+
+    def __init__(self,sink,interval=KEYFRAME_FRAMES):
+        """
+        Initializes a feed that sends nothing until it is given to a Wave.
+
+        Parameter sink: where the messages go
+        Precondition: sink is an object with a method publish(data,keyframe)
+
+        Parameter interval: the number of frames between keyframes
+        Precondition: interval is an int > 0
+        """
+        assert type(interval) == int and interval > 0,repr(interval)+\
+        ' is not a valid interval'
+        self._sink = sink
+        self._interval = interval
+        self._config = None
+        self._frame = 0
+        self._serial = 0
+        self._bolts = {}
+        self._numbers = {}
+        self._alive = bytearray()
+        self._kills = []
+        self._drops = []
+        self._fired = {}
+        self._state = None
+
+    def reset(self,wave,formation,ship,bolts):
+        """
+        Forgets everything and sends the whole state of a wave as a keyframe.
+
+        Wave calls this when it is given the feed and when it loads a
+        savestate.
+
+        Parameter wave: the wave
+        Precondition: wave is a Wave object
+
+        Parameter formation: the formation of the wave
+        Precondition: formation is a Formation object
+
+        Parameter ship: the ship of the wave
+        Precondition: ship is a Ship object, or None if there is no ship
+
+        Parameter bolts: the bolts of the wave
+        Precondition: bolts is a list of Bolt objects, in the order fired
+        """
+        self._config = wave.getConfig()
+        self._bolts = {}
+        self._numbers = {}
+        for bolt in bolts:
+            self._numbers[id(bolt)] = self._serial
+            self._bolts[self._serial] = bolt
+            self._serial += 1
+        rows = self._config.getRows()
+        cols = self._config.getAliensInRow()
+        self._alive = bytearray((rows*cols+7)//8)
+        for row in range(rows):
+            for col in range(cols):
+                if formation.isAlive(row,col):
+                    cell = row*cols+col
+                    self._alive[cell >> 3] |= 1 << (cell & 7)
+        self._kills = []
+        self._drops = []
+        self._fired = {}
+        self._state = self._getState(wave,formation,ship)
+        self._sendKeyframe()
+
+    def kill(self,row,col):
+        """
+        Notes that an alien was killed.
+
+        Parameter row: the row of the alien
+        Precondition: row is an int in 0..rows-1
+
+        Parameter col: the column of the alien
+        Precondition: col is an int in 0..aliens in a row-1
+        """
+        self._kills.append((row,col))
+        cell = row*self._config.getAliensInRow()+col
+        self._alive[cell >> 3] &= ~(1 << (cell & 7))
+
+    def fire(self,bolt):
+        """
+        Notes that a bolt was fired (or put back by loading a savestate).
+
+        Parameter bolt: the bolt fired
+        Precondition: bolt is a Bolt object that is not on screen yet
+        """
+        number = self._serial
+        self._serial += 1
+        self._numbers[id(bolt)] = number
+        self._bolts[number] = bolt
+        self._fired[number] = bolt
+
+    def remove(self,bolt):
+        """
+        Notes that a bolt was removed from the screen.
+
+        Parameter bolt: the bolt removed
+        Precondition: bolt is a Bolt object on screen
+        """
+        number = self._numbers.pop(id(bolt))
+        del self._bolts[number]
+        if self._fired.pop(number,None) is None:
+            self._drops.append(number)
+
+    def addFrame(self,wave,formation,ship):
+        """
+        Sends the changes of the update that just finished, or a keyframe
+        every KEYFRAME_FRAMES frames.
+
+        Parameter wave: the wave
+        Precondition: wave is a Wave object
+
+        Parameter formation: the formation of the wave
+        Precondition: formation is a Formation object
+
+        Parameter ship: the ship of the wave
+        Precondition: ship is a Ship object, or None if there is no ship
+        """
+        self._frame += 1
+        state = self._getState(wave,formation,ship)
+        if self._frame % self._interval == 0:
+            self._state = state
+            self._kills = []
+            self._drops = []
+            self._fired = {}
+            self._sendKeyframe()
+            return
+
+        old = self._state
+        flags = 0
+        parts = [b'']
+        if state[0] != old[0] or state[1] != old[1]:
+            flags |= FORMATION_CHANGED
+            parts.append(FORMATION_STATE.pack(state[0],state[1]))
+        if state[2] != old[2] or state[3] != old[3]:
+            flags |= SHIP_CHANGED
+            parts.append(SHIP_STATE.pack(state[2],state[3]))
+        if state[4] != old[4]:
+            flags |= LIVES_CHANGED
+            parts.append(LIVES_STATE.pack(state[4]))
+        if state[5] != old[5]:
+            flags |= SCORE_CHANGED
+            parts.append(SCORE_STATE.pack(state[5]))
+        if state[6] != old[6] or state[7] != old[7]:
+            flags |= RESULT_CHANGED
+            parts.append(RESULT_STATE.pack(state[6],state[7]))
+        for row,col in self._kills:
+            parts.append(KILL.pack(row,col))
+        for number in self._drops:
+            parts.append(DROP.pack(number))
+        for number,bolt in self._fired.items():
+            parts.append(BOLT_STATE.pack(number,bolt.getX(),bolt.getY(),
+            bolt.getVelocity()))
+        parts[0] = DELTA_HEADER.pack(flags,len(self._kills),len(self._drops),
+        len(self._fired))
+        body = b''.join(parts)
+        self._state = state
+        self._kills.clear()
+        self._drops.clear()
+        self._fired.clear()
+        self._sink.publish(MESSAGE_HEADER.pack(len(body),DELTA,self._frame)+
+        body,False)
+
+    def _getState(self,wave,formation,ship):
+        """
+        Returns the fields of a frame, as the list in _state
+
+        Parameter wave: the wave
+        Precondition: wave is a Wave object
+
+        Parameter formation: the formation of the wave
+        Precondition: formation is a Formation object
+
+        Parameter ship: the ship of the wave
+        Precondition: ship is a Ship object, or None if there is no ship
+        """
+        won = wave.getGameWon()
+        return [formation.getX(),formation.getY(),ship is not None,
+                ship.getX() if ship is not None else 0.0,wave.getLives(),
+                wave.getScore(),wave.getGameDone(),-1 if won is None else won]
+
+    def _sendKeyframe(self):
+        """
+        Sends the whole state, from _state, _bolts and _alive
+        """
+        config = self._config
+        state = self._state
+        parts = [KEYFRAME_HEADER.pack(config.getRows(),config.getAliensInRow(),
+        config.getSpeed(),
+        config.isSwarm(),state[0],state[1],state[2],state[3],state[4],
+        state[5],state[6],state[7],len(self._bolts))]
+        for number,bolt in self._bolts.items():
+            parts.append(BOLT_STATE.pack(number,bolt.getX(),bolt.getY(),
+            bolt.getVelocity()))
+        parts.append(bytes(self._alive))
+        body = b''.join(parts)
+        self._sink.publish(MESSAGE_HEADER.pack(len(body),KEYFRAME,self._frame)+
+        body,True)
+
+
+class SpectatorScene(object):
+    """
+    A class for a viewer's copy of a streamed wave.
+
+    A scene is out of sync until it is given a keyframe. After that, it takes
+    the deltas in order; a delta that does not follow the last frame puts it
+    out of sync again until the next keyframe.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _config: the size and speed of the wave
+    # Invariant: _config is a GameConfig object, or None if never in sync
+    #
+    # Attribute _formation: where the formation is and which aliens are alive
+    # Invariant: _formation is a Formation object, or None if never in sync
+    #
+    # Attribute _frame: the number of the last frame applied
+    # Invariant: _frame is an int >= 0, or None if out of sync
+    #
+    # Attribute _bolts: the bolts on screen, by number
+    # Invariant: _bolts is a dictionary from bolt number to a list of its x, y
+    # and velocity and the frame it was at that y
+    #
+    # Attribute _hasShip: whether there is a ship
+    # Invariant: _hasShip is a bool
+    #
+    # Attribute _shipX: the horizontal coordinate of the ship center
+    # Invariant: _shipX is an int or float
+    #
+    # Attribute _lives, _score, _done, _won: the same as in Wave
+    # Invariant: _won is a bool, or None if the game is not over
+    #
+    # Attribute _prevX, _prevY, _prevShipX: the same as in Wave
+    #
+    # Attribute _alienBatches, _boltBatch, _shipBatch: the same as in Wave,
+    # made again when the size of the aliens changes
+    #
+    # Attribute _dline: the defensive line
+    # Invariant: _dline is a GPath object
+
+    def isSynced(self):
+        """
+        Returns True if the scene has the state of the last frame applied
+        """
+        return self._frame is not None
+
+    def getFrame(self):
+        """
+        Returns the number of the last frame applied, or None if out of sync
+        """
+        return self._frame
+
+    def getConfig(self):
+        """
+        Returns the GameConfig of the wave, or None if never in sync
+        """
+        return self._config
+
+    def getFormation(self):
+        """
+        Returns the formation of the wave, or None if never in sync
+        """
+        return self._formation
+
+    def getShipX(self):
+        """
+        Returns the horizontal coordinate of the ship, or None if there is no
+        ship
+        """
+        return self._shipX if self._hasShip else None
+
+    def getLives(self):
+        """
+        Returns the number of lives left
+        """
+        return self._lives
+
+    def getScore(self):
+        """
+        Returns the score
+        """
+        return self._score
+
+    def getGameDone(self):
+        """
+        Returns whether the game is over
+        """
+        return self._done
+
+    def getGameWon(self):
+        """
+        Returns whether the game was won, or None if it is not over
+        """
+        return self._won
+
+    def getBolts(self):
+        """
+        Returns the bolts on screen, as a list of (x,y,velocity) tuples in the
+        order they were fired
+        """
+        return [self._boltPosition(bolt) for bolt in self._bolts.values()]
+
+    def __init__(self):
+        """
+        Initializes a scene that is out of sync.
+        """
+        self._config = None
+        self._formation = None
+        self._frame = None
+        self._bolts = {}
+        self._hasShip = False
+        self._shipX = GAME_WIDTH/2
+        self._lives = SHIP_LIVES
+        self._score = 0
+        self._done = False
+        self._won = None
+        self._prevX = self._prevY = 0
+        self._prevShipX = None
+        self._alienBatches = None
+        self._boltBatch = None
+        self._shipBatch = None
+        self._dline = GPath(points=[0,DEFENSE_LINE,GAME_WIDTH,DEFENSE_LINE],
+        linewidth=2,linecolor='black')
+
+    def apply(self,kind,frame,body):
+        """
+        Applies one message to the scene, and returns True if the scene is in
+        sync afterwards.
+
+        Parameter kind: the kind of message
+        Precondition: kind is KEYFRAME or DELTA
+
+        Parameter frame: the frame of the message
+        Precondition: frame is an int >= 0
+
+        Parameter body: the body of the message
+        Precondition: body is a bytes-like object
+        """
+        if kind == KEYFRAME:
+            self._applyKeyframe(frame,body)
+        elif self._frame is not None and frame == self._frame+1:
+            self._applyDelta(frame,body)
+        else:
+            self._frame = None
+        return self._frame is not None
+
+    def draw(self,view,alpha=1.0):
+        """
+        Draws the scene, like Wave.draw.
+
+        Parameter view: the game view, used in drawing
+        Precondition: view is an instance of GView
+
+        Parameter alpha: how far to draw between the last two frames
+        Precondition: alpha is a float between 0 and 1
+        """
+        if self._formation is None:
+            return
+        config = self._config
+        if self._alienBatches is None:
+            self._alienBatches = [SpriteBatch(source,config.getAlienWidth(),
+            config.getAlienHeight()) for source in ALIEN_IMAGES]
+            self._boltBatch = SpriteBatch(None,BOLT_WIDTH,BOLT_HEIGHT,'black')
+            self._shipBatch = SpriteBatch(SHIP_IMAGE,SHIP_WIDTH,SHIP_HEIGHT)
+        back = 1.0-alpha
+        formation = self._formation
+        dx = (self._prevX-formation.getX())*back
+        dy = (self._prevY-formation.getY())*back
+        for batch in self._alienBatches:
+            batch.begin()
+        for row in range(config.getRows()):
+            batch = self._alienBatches[(row//2) % len(ALIEN_IMAGES)]
+            y = formation.getRowY(row)+dy
+            for col in range(config.getAliensInRow()):
+                if formation.isAlive(row,col):
+                    batch.add(formation.getColumnX(col)+dx,y)
+        for batch in self._alienBatches:
+            batch.draw(view)
+        self._shipBatch.begin()
+        if self._hasShip:
+            x = self._shipX
+            if self._prevShipX is not None:
+                x += (self._prevShipX-x)*back
+            self._shipBatch.add(x,SHIP_BOTTOM+SHIP_HEIGHT/2)
+        self._shipBatch.draw(view)
+        self._dline.draw(view)
+        self._boltBatch.begin()
+        for bolt in self._bolts.values():
+            x,y,velocity = self._boltPosition(bolt)
+            self._boltBatch.add(x,y-velocity*back)
+        self._boltBatch.draw(view)
+
+    def _boltPosition(self,bolt):
+        """
+        Returns the (x,y,velocity) of a bolt in the last frame applied
+
+        Parameter bolt: the bolt
+        Precondition: bolt is a list of x, y, velocity and frame, as in _bolts
+        """
+        step = BOLT_SPEED if bolt[2] > 0 else -BOLT_SPEED
+        return (bolt[0],bolt[1]+step*(self._frame-bolt[3]),bolt[2])
+
+    def _applyKeyframe(self,frame,body):
+        """
+        Replaces the whole scene with the state in a keyframe.
+
+        Parameter frame: the frame of the keyframe
+        Precondition: frame is an int >= 0
+
+        Parameter body: the body of the keyframe
+        Precondition: body is a bytes-like object
+        """
+        (rows,cols,speed,swarm,formX,formY,hasShip,shipX,lives,score,done,won,
+        count) = KEYFRAME_HEADER.unpack_from(body)
+        config = GameConfig(rows,cols,speed,bool(swarm))
+        pos = KEYFRAME_HEADER.size
+        self._bolts = {}
+        for index in range(count):
+            number,x,y,velocity = BOLT_STATE.unpack_from(body,pos)
+            self._bolts[number] = [x,y,velocity,frame]
+            pos += BOLT_STATE.size
+        if config != self._config:
+            self._alienBatches = None
+        self._config = config
+        self._formation = Formation(config,formX,formY)
+        for row in range(rows):
+            for col in range(cols):
+                cell = row*cols+col
+                if not body[pos+(cell >> 3)] >> (cell & 7) & 1:
+                    self._formation.kill(row,col)
+        self._frame = frame
+        self._setShip(bool(hasShip),shipX)
+        self._prevShipX = self.getShipX()
+        self._prevX = formX
+        self._prevY = formY
+        self._lives = lives
+        self._score = score
+        self._done = bool(done)
+        self._won = None if won < 0 else bool(won)
+
+    def _applyDelta(self,frame,body):
+        """
+        Applies the changes in a delta that follows the last frame applied.
+
+        Parameter frame: the frame of the delta
+        Precondition: frame is _frame+1
+
+        Parameter body: the body of the delta
+        Precondition: body is a bytes-like object
+        """
+        flags,kills,drops,fired = DELTA_HEADER.unpack_from(body)
+        pos = DELTA_HEADER.size
+        self._frame = frame
+        formation = self._formation
+        self._prevX = formation.getX()
+        self._prevY = formation.getY()
+        self._prevShipX = self.getShipX()
+        if flags & FORMATION_CHANGED:
+            x,y = FORMATION_STATE.unpack_from(body,pos)
+            formation.move(x-formation.getX(),y-formation.getY())
+            pos += FORMATION_STATE.size
+        if flags & SHIP_CHANGED:
+            hasShip,x = SHIP_STATE.unpack_from(body,pos)
+            self._setShip(bool(hasShip),x)
+            pos += SHIP_STATE.size
+        if flags & LIVES_CHANGED:
+            self._lives = LIVES_STATE.unpack_from(body,pos)[0]
+            pos += LIVES_STATE.size
+        if flags & SCORE_CHANGED:
+            self._score = SCORE_STATE.unpack_from(body,pos)[0]
+            pos += SCORE_STATE.size
+        if flags & RESULT_CHANGED:
+            done,won = RESULT_STATE.unpack_from(body,pos)
+            self._done = bool(done)
+            self._won = None if won < 0 else bool(won)
+            pos += RESULT_STATE.size
+        for index in range(kills):
+            row,col = KILL.unpack_from(body,pos)
+            formation.kill(row,col)
+            pos += KILL.size
+        for index in range(drops):
+            self._bolts.pop(DROP.unpack_from(body,pos)[0],None)
+            pos += DROP.size
+        for index in range(fired):
+            number,x,y,velocity = BOLT_STATE.unpack_from(body,pos)
+            self._bolts[number] = [x,y,velocity,frame]
+            pos += BOLT_STATE.size
+
+    def _setShip(self,hasShip,x):
+        """
+        Sets whether there is a ship and where it is
+
+        Parameter hasShip: whether there is a ship
+        Precondition: hasShip is a bool
+
+        Parameter x: the horizontal coordinate of the ship center
+        Precondition: x is an int or float
+        """
+        if hasShip and not self._hasShip:
+            self._prevShipX = None
+        self._hasShip = hasShip
+        self._shipX = x
+
+
+class _Viewer(object):
+    """
+    A class for the server's view of one connected viewer.
+    """
+    # Attribute writer: the stream used to send to the viewer
+    # Invariant: writer is an asyncio.StreamWriter
+    #
+    # Attribute lagging: whether the viewer fell too far behind, and is sent
+    # nothing until the next keyframe
+    # Invariant: lagging is a bool
+
+    def __init__(self,writer):
+        """
+        Initializes the view of a viewer that has just connected.
+
+        Parameter writer: the stream used to send to the viewer
+        Precondition: writer is an asyncio.StreamWriter
+        """
+        self.writer = writer
+        self.lagging = False
+
+
+class SpectatorServer(object):
+    """
+    A class to send the messages of a feed to every connected viewer.
+
+    The server runs asyncio in a background thread, like the Coordinator in
+    farm.py. The methods start, publish and stop are called from the game's
+    thread; every other method runs in the server thread. Viewers only
+    listen; anything they send is ignored.
+    """
+    # HIDDEN ATTRIBUTES:
+    # Attribute _host: the address the server listens on
+    # Invariant: _host is a string
+    #
+    # Attribute _port: the port the server listens on (0 until started, if
+    # the system picks the port)
+    # Invariant: _port is an int >= 0
+    #
+    # Attribute _keyframe: the last keyframe
+    # Invariant: _keyframe is a bytes object, or None if there was none yet
+    #
+    # Attribute _deltas: the deltas since the last keyframe
+    # Invariant: _deltas is a list of bytes objects
+    #
+    # Attribute _viewers: the connected viewers
+    # Invariant: _viewers is a list of _Viewer objects
+    #
+    # Attribute _sent: the number of bytes sent to all of the viewers
+    # Invariant: _sent is an int >= 0
+    #
+    # Attribute _loop: the event loop of the server thread
+    # Invariant: _loop is an asyncio event loop, or None if not started
+    #
+    # Attribute _thread: the server thread
+    # Invariant: _thread is a threading.Thread, or None if not started
+
+    def getAddress(self):
+        """
+        Returns the (host,port) the server is listening on
+        """
+        return (self._host,self._port)
+
+    def getViewerCount(self):
+        """
+        Returns the number of connected viewers
+        """
+        return len(self._viewers)
+
+    def getBytesSent(self):
+        """
+        Returns the number of bytes sent to all of the viewers so far
+        """
+        return self._sent
+
+    def __init__(self,host='127.0.0.1',port=0):
+        """
+        Initializes a server that is not started yet.
+
+        Parameter host: the address to listen on
+        Precondition: host is a string
+
+        Parameter port: the port to listen on
+        Precondition: port is an int >= 0; 0 lets the system pick a free port
+        """
+        assert type(port) == int and port >= 0,repr(port)+' is not a valid port'
+        self._host = host
+        self._port = port
+        self._keyframe = None
+        self._deltas = []
+        self._viewers = []
+        self._sent = 0
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the server thread and returns the (host,port) it listens on.
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            server = self._loop.run_until_complete(asyncio.start_server(
+            self._handle,self._host,self._port))
+            self._port = server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            server.close()
+            for viewer in self._viewers:
+                viewer.writer.close()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve,daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.getAddress()
+
+    def publish(self,data,keyframe):
+        """
+        Sends a message to every viewer.
+
+        Parameter data: the message
+        Precondition: data is a bytes object holding one whole message
+
+        Parameter keyframe: whether the message is a keyframe
+        Precondition: keyframe is a bool; the server is started
+        """
+        self._loop.call_soon_threadsafe(self._broadcast,data,keyframe)
+
+    def stop(self):
+        """
+        Disconnects every viewer and shuts down the server thread.
+        """
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+
+    def _broadcast(self,data,keyframe):
+        """
+        Sends a message to every viewer that is keeping up, and remembers it
+        for the viewers that join later.
+
+        A viewer that has fallen SPECTATE_BACKLOG bytes behind is skipped until
+        the next keyframe, so a slow viewer never holds up the others.
+
+        Parameter data: the message
+        Precondition: data is a bytes object holding one whole message
+
+        Parameter keyframe: whether the message is a keyframe
+        Precondition: keyframe is a bool
+        """
+        if keyframe:
+            self._keyframe = data
+            self._deltas = []
+        else:
+            self._deltas.append(data)
+        for viewer in self._viewers:
+            writer = viewer.writer
+            if writer.is_closing():
+                continue
+            behind = writer.transport.get_write_buffer_size() > SPECTATE_BACKLOG
+            if keyframe:
+                viewer.lagging = behind
+            elif behind:
+                viewer.lagging = True
+            if not viewer.lagging:
+                writer.write(data)
+                self._sent += len(data)
+
+    async def _handle(self,reader,writer):
+        """
+        Catches up one viewer with the last keyframe and the deltas after it,
+        then keeps it until it disconnects.
+
+        Parameter reader: the stream to read from the viewer
+        Precondition: reader is an asyncio.StreamReader
+
+        Parameter writer: the stream to write to the viewer
+        Precondition: writer is an asyncio.StreamWriter
+        """
+        viewer = _Viewer(writer)
+        if self._keyframe is not None:
+            data = b''.join([self._keyframe]+self._deltas)
+            writer.write(data)
+            self._sent += len(data)
+        self._viewers.append(viewer)
+        try:
+            while await reader.read(4096):
+                pass # Viewers only listen
+        except OSError:
+            pass # Treat a broken connection like a disconnect
+        self._viewers.remove(viewer)
+        writer.close()
+
+
+async def readMessage(reader):
+    """
+    Returns the next message of a stream as a tuple (kind,frame,body), or None
+    if the stream is over.
+
+    Parameter reader: the stream to read from the server
+    Precondition: reader is an asyncio.StreamReader
+    """
+    try:
+        header = await reader.readexactly(MESSAGE_HEADER.size)
+        length,kind,frame = MESSAGE_HEADER.unpack(header)
+        return (kind,frame,await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+async def watch(host,port,frames=None):
+    """
+    Connects to a server, applies its messages to a SpectatorScene and prints
+    what it sees once a second. Returns the scene once the stream is over or
+    frames messages have been read.
+
+    Parameter host: the host name or address of the server
+    Precondition: host is a string
+
+    Parameter port: the port of the server
+    Precondition: port is an int > 0
+
+    Parameter frames: the number of messages to read
+    Precondition: frames is an int > 0, or None to read until the stream is
+    over
+    """
+    reader,writer = await asyncio.open_connection(host,port)
+    scene = SpectatorScene()
+    count = 0
+    received = 0
+    last = time.perf_counter()
+    while frames is None or count < frames:
+        message = await readMessage(reader)
+        if message is None:
+            break
+        scene.apply(*message)
+        count += 1
+        received += MESSAGE_HEADER.size+len(message[2])
+        now = time.perf_counter()
+        if now-last >= 1.0 and scene.isSynced():
+            print('frame %d  score %d  lives %d  aliens %d  bolts %d  %.0f B/s' %
+            (scene.getFrame(),scene.getScore(),scene.getLives(),
+            scene.getFormation().getAliveCount(),len(scene.getBolts()),
+            received/(now-last)),flush=True)
+            received = 0
+            last = now
+    writer.close()
+    return scene
+
+
+def main():
+    """
+    Runs a server with a headless game, or a viewer, from the command line.
+
+    Without --connect, this plays waves with a policy in real time and
+    streams them. With --connect, this watches the stream of a server and
+    prints what it sees.
+    """
+    parser = argparse.ArgumentParser(description='Stream a game to viewers.')
+    parser.add_argument('rows',nargs='?',type=int,
+    help='the number of rows of aliens (see parseConfig)')
+    parser.add_argument('perrow',nargs='?',type=int,
+    help='the number of aliens in a row (see parseConfig)')
+    parser.add_argument('speed',nargs='?',type=float,
+    help='the seconds between alien steps (see parseConfig)')
+    parser.add_argument('--connect',metavar='HOST:PORT',
+    help='watch the server at HOST:PORT')
+    parser.add_argument('--port',type=int,default=SPECTATE_PORT or 0,
+    help='the port to serve on (default: any free port)')
+    parser.add_argument('--policy',default='sweep',choices=sorted(POLICIES),
+    help='the policy that plays the streamed games')
+    parser.add_argument('--seed',type=int,default=0,
+    help='the seed of the first game; the others count up from it')
+    args = parser.parse_args()
+
+    if args.connect is not None:
+        host,port = args.connect.rsplit(':',1)
+        asyncio.run(watch(host,int(port)))
+        return
+
+    server = SpectatorServer(port=args.port)
+    host,port = server.start()
+    print('streaming on '+host+':'+str(port),flush=True)
+    config = parseConfig(sys.argv)
+    input = headless.GInput()
+    seed = args.seed
+    try:
+        while True:
+            wave = Wave(seed,config)
+            wave.setFeed(SpectatorFeed(server))
+            policy = getPolicy(args.policy,seed)
+            frames = 0
+            while not wave.getGameDone():
+                start = time.perf_counter()
+                input.setKeys(policy(wave,frames))
+                wave.update(input,FIXED_STEP)
+                frames += 1
+                if wave.getIsPaused() and not wave.getGameDone():
+                    wave.setIsPaused(False)
+                    wave.createShip()
+                time.sleep(max(FIXED_STEP-(time.perf_counter()-start),0))
+            seed += 1
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,10 +15,35 @@ answer.
 
 sjg276
 """
-from game2d import *
 from consts import *
+if HEADLESS:
+    from headless import *
+else:
+    from game2d import *
 from models import *
+from config import *
+from formation import *
+from batch import *
+from contracts import *
+from observation import *
 import random
+import struct
+import time
+
+# the first bytes of a savestate
+SAVE_MAGIC = b'INVS'
+
+# the version of the savestate format
+SAVE_VERSION = 1
+
+# the fixed part of a savestate: magic, version, rows, aliens in a row, seed,
+# flags, more flags, ship x, formation x and y, time, shooter row and column,
+# shooter x and y, steps, alien rate, lives, score, bolts, live columns and
+# the gauss value of the random number generator
+SAVE_HEADER = struct.Struct('<4sHHHQBBddddhhddiiiqIHd')
+
+# the number of words in the state of a random.Random generator
+SAVE_RNG_WORDS = 625
 
 # PRIMARY RULE: Wave can only access attributes in models.py via getters/setters
 # Wave is NOT allowed to access anything in app.py (Subcontrollers are not
@@ -33,8 +58,8 @@ class Wave(object):
     on screen. It animates the laser bolts, removing any aliens as necessary.
     It also marches the aliens back and forth across the screen until they are
     all destroyed or they reach the defense line (at which point the player
-    loses). When the wave is complete, you  should create a NEW instance of
-    Wave (in Invaders) if you want to make a new wave of aliens.
+    loses). When the wave is complete, the method reset starts a new wave of
+    aliens in place, reusing the ship, the aliens and the bolts of this one.
 
     If you want to pause the game, tell this controller to draw, but do not
     update.  See subcontrollers.py from Lecture 24 for an example.  This
@@ -56,9 +81,29 @@ class Wave(object):
     # Attribute _aliens: the 2d list of aliens in the wave
     # Invariant: _aliens is a rectangular 2d list containing Alien objects or None
     #
+    # Attribute _allAliens: every alien of the wave, destroyed or not
+    # Invariant: _allAliens is a rectangular 2d list of Alien objects, the
+    # same size as _aliens, holding the aliens the wave starts with
+    #
+    # Attribute _startX, _startY: the center of cell (0,0) at the start
+    # Invariant: _startX and _startY are ints or floats
+    #
+    # Attribute _spareShip: the ship object, kept while _ship is None
+    # Invariant: _spareShip is a Ship object
+    #
+    # Attribute _formation: the lattice the aliens are placed on
+    # Invariant: _formation is a Formation object whose cell (row,col) is where
+    # the alien _aliens[row][col] is, and whose cell (row,col) is alive exactly
+    # when _aliens[row][col] is not None. Moving the wave only moves
+    # _formation; the x and y of a live alien are brought up to date (see
+    # _placeAlien) only when that alien is about to be used.
+    #
     # Attribute _bolts: the laser bolts currently on screen
     # Invariant: _bolts is a list of Bolt objects, possibly empty
     #
+    # Attribute _boltPool: bolts that have left the screen, ready to be fired again
+    # Invariant: _boltPool is a list of Bolt objects not in _bolts, possibly empty
+    #
     # Attribute _dline: the defensive line being protected
     # Invariant : _dline is a GPath object
     #
@@ -66,7 +111,8 @@ class Wave(object):
     # Invariant: _lives is an int >= 0
     #
     # Attribute _time: the amount of time since the last Alien "step"
-    # Invariant: _time is a float >= 0s
+    # Invariant: _time is a float >= 0s and < the speed of _config between
+    # updates
     #
     # Attribute _direction: the direction the aliens are moving
     # Invariant: _direction is a string for either left or right
@@ -78,7 +124,10 @@ class Wave(object):
     # Invariant: _alienRate is a int for how many steps until an alien fires
     #
     # Attribute _shooter: the alien in a row that will shoot a bolt
-    # Invariant: _shooter is an alien object
+    # Invariant: _shooter is an alien object, or None if none was chosen yet
+    #
+    # Attribute _shooterCell: the (row,col) _shooter was chosen from
+    # Invariant: _shooterCell is a tuple of two ints, or None if _shooter is None
     #
     # Attribute _stepaccum: counts the amount of steps an alien has taken
     # Invariant: _stepaccum is an int for how many steps have been taken
@@ -95,6 +144,46 @@ class Wave(object):
     #
     # Attribute _score: the score value the player has
     # Invariant: _score is an int >= 0
+    #
+    # Attribute _seed: the seed this wave's random numbers started from
+    # Invariant: _seed is an int in 0..2**64-1
+    #
+    # Attribute _config: the size and speed of this wave
+    # Invariant: _config is a GameConfig object
+    #
+    # Attribute _rng: the random number generator of this wave
+    # Invariant: _rng is a random.Random object started from _seed
+    #
+    # Attribute _alienBatches: the batches that draw the aliens, one for each
+    # image in ALIEN_IMAGES
+    # Invariant: _alienBatches is a list of SpriteBatch objects, or None if the
+    # wave has not been drawn yet
+    #
+    # Attribute _boltBatch: the batch that draws the bolts
+    # Invariant: _boltBatch is a SpriteBatch object, or None if the wave has not
+    # been drawn yet
+    #
+    # Attribute _profiler: the profiler recording the time of each update
+    # Invariant: _profiler is a FrameProfiler object, or None to not profile
+    #
+    # Attribute _shipBatch: the batch that draws the ship
+    # Invariant: _shipBatch is a SpriteBatch object, or None if the wave has not
+    # been drawn yet
+    #
+    # Attribute _prevX, _prevY: where _formation was before the last update
+    # Invariant: _prevX and _prevY are ints or floats
+    #
+    # Attribute _prevShipX: where the ship was before the last update
+    # Invariant: _prevShipX is an int or float, or None if there was no ship
+    #
+    # Attribute _observation: the buffer the state is written to after every
+    # update
+    # Invariant: _observation is an Observation object for a wave of this
+    # size, or None to not write one
+    #
+    # Attribute _feed: the feed told about every change, for spectators
+    # Invariant: _feed is a SpectatorFeed object (see spectate.py), or None to
+    # not stream
 
     def getGameWon(self):
         """
@@ -138,10 +227,89 @@ class Wave(object):
         """
         return self._score
 
-    def __init__(self):
+    def getSeed(self):
+        """
+        Returns self._seed, the seed this wave's random numbers started from.
+        A new Wave with this seed plays the same game given the same input.
+        """
+        return self._seed
+
+    def getConfig(self):
+        """
+        Returns the GameConfig giving the size and speed of this wave
+        """
+        return self._config
+
+    def getProfiler(self):
+        """
+        Returns the profiler recording the time of each update, or None
+        """
+        return self._profiler
+
+    def setProfiler(self,value):
+        """
+        Sets the profiler that records the time of each update
+
+        Parameter value: the new profiler
+        Precondition: value is a FrameProfiler object, or None to stop profiling
+        """
+        self._profiler = value
+
+    def getObservation(self):
+        """
+        Returns the observation buffer the wave writes to, or None
+        """
+        return self._observation
+
+    def setObservation(self,value):
+        """
+        Sets the observation buffer the wave writes its state to after every
+        update, and writes the current state to it
+
+        Parameter value: the new observation buffer
+        Precondition: value is an Observation object for a wave of this size,
+        or None to stop writing one
+        """
+        assert value is None or isinstance(value,Observation),repr(value)+\
+        ' is not an Observation'
+        self._observation = value
+        if value is not None:
+            assert (value.getRows() == self._config.getRows() and
+            value.getAliensInRow() == self._config.getAliensInRow()),\
+            'the observation is for a wave of another size'
+            self._writeObservation(True)
+
+    def getFeed(self):
+        """
+        Returns the spectator feed the wave tells about every change, or None
+        """
+        return self._feed
+
+    def setFeed(self,value):
+        """
+        Sets the spectator feed the wave tells about every change, and sends
+        the current state to it
+
+        Parameter value: the new feed
+        Precondition: value is a SpectatorFeed object (see spectate.py), or
+        None to stop streaming
+        """
+        self._feed = value
+        if value is not None:
+            value.reset(self,self._formation,self._ship,self._bolts)
+
+    def __init__(self,seed=None,config=None):
         """
         Initializes the Wave class
 
+        Parameter seed: the seed for this wave's random numbers
+        Precondition: seed is an int in 0..2**64-1, or None to pick a random
+        seed
+
+        Parameter config: the size and speed of the wave
+        Precondition: config is a GameConfig object, or None for the sizes in
+        consts.py
+
         Parameter _ship: the player ship to control
         Precondition: _ship is a Ship object or None
 
@@ -189,22 +357,97 @@ class Wave(object):
         Parameter _score: the score value the player has
         Precondition: _score is an int >= 0
         """
+        assert seed is None or (type(seed) == int and 0 <= seed < 2**64),\
+        repr(seed)+' is not a valid seed'
+        assert config is None or isinstance(config,GameConfig),repr(config)+\
+        ' is not a GameConfig'
+        if seed is None:
+            seed = random.getrandbits(64)
+        if config is None:
+            config = GameConfig()
+        self._seed = seed
+        self._config = config
+        self._rng = random.Random(seed)
         self._ship = Ship(GAME_WIDTH/2,SHIP_BOTTOM+SHIP_HEIGHT/2,
         SHIP_WIDTH,SHIP_HEIGHT,SHIP_IMAGE)
-        self._aliens = self._createAliens(ALIENS_IN_ROW,ALIEN_ROWS)
+        self._spareShip = self._ship
+        self._aliens = self._createAliens(config.getAliensInRow(),config.getRows())
+        self._allAliens = [list(row) for row in self._aliens]
+        self._startX = self._aliens[0][0].getX()
+        self._startY = self._aliens[0][0].getY()
+        self._formation = Formation(config,self._startX,self._startY)
         self._dline = GPath(points=[0,DEFENSE_LINE,GAME_WIDTH,DEFENSE_LINE],linewidth=2,linecolor='black')
         self._time=0
         self._direction = 'right'
         self._bolts = []
+        self._boltPool = []
         self._newBolt = True
-        self._alienRate = random.randint(1,BOLT_RATE)
+        self._alienRate = self._rng.randint(1,BOLT_RATE)
         self._shooter = None
+        self._shooterCell = None
         self._stepaccum = 0
         self._lives = 3
         self._isPaused = False
         self._gameDone = False
         self._gameWon = None
         self._score = 0
+        self._alienBatches = None
+        self._boltBatch = None
+        self._shipBatch = None
+        self._profiler = None
+        self._observation = None
+        self._feed = None
+        self._prevX = self._formation.getX()
+        self._prevY = self._formation.getY()
+        self._prevShipX = self._ship.getX()
+
+    def reset(self,seed=None):
+        """
+        Starts a new wave in place of this one.
+
+        The wave is put back the way __init__ left it, with the given seed:
+        every alien alive at the start of the formation, the ship at the
+        center, no bolts, three lives and no score. The ship, the aliens and
+        the bolts are reused, so a reset makes almost no new objects. The
+        profiler, observation and feed stay attached; the observation and
+        the feed are sent the new state.
+
+        Parameter seed: the seed for the new wave's random numbers
+        Precondition: seed is an int in 0..2**64-1, or None to pick a random
+        seed
+        """
+        assert seed is None or (type(seed) == int and 0 <= seed < 2**64),\
+        repr(seed)+' is not a valid seed'
+        if seed is None:
+            seed = random.getrandbits(64)
+        self._seed = seed
+        self._rng.seed(seed)
+        self._formation.reset(self._startX,self._startY)
+        for row in range(len(self._aliens)):
+            self._aliens[row][:] = self._allAliens[row]
+        self._ship = self._spareShip
+        self._ship.setX(GAME_WIDTH/2)
+        self._boltPool.extend(self._bolts)
+        self._bolts.clear()
+        self._time=0
+        self._direction = 'right'
+        self._newBolt = True
+        self._alienRate = self._rng.randint(1,BOLT_RATE)
+        self._shooter = None
+        self._shooterCell = None
+        self._stepaccum = 0
+        self._lives = 3
+        self._isPaused = False
+        self._gameDone = False
+        self._gameWon = None
+        self._score = 0
+        self._prevX = self._formation.getX()
+        self._prevY = self._formation.getY()
+        self._prevShipX = self._ship.getX()
+        if self._observation is not None:
+            self._writeObservation(True)
+        if self._feed is not None:
+            self._feed.reset(self,self._formation,self._ship,self._bolts)
 
     def update(self,input,dt):
         """
@@ -216,6 +459,16 @@ class Wave(object):
         Parameter dt: The time in seconds since last update
         Precondition: dt is a number (int or float)
         """
+        self._prevX = self._formation.getX()
+        self._prevY = self._formation.getY()
+        self._prevShipX = self._ship.getX() if self._ship is not None else None
+        if self._observation is not None:
+            fields = self._observation.getFields()
+            fields[0] += 1
+            fields[1] += 1
+        if self._profiler is not None:
+            self._profiledUpdate(input,dt)
+            return
         self._gameOver()
         self._changeShip(input)
         self._changeAlien(dt)
@@ -228,23 +481,173 @@ class Wave(object):
             self._chooseAlien()
         self._alienBolt()
         self._collision()
+        if self._observation is not None:
+            self._writeObservation()
+        if self._feed is not None:
+            self._feed.addFrame(self,self._formation,self._ship)
+        if STRICT:
+            self.checkInvariants()
+
+    def _profiledUpdate(self,input,dt):
+        """
+        Animates a single frame like update, reading the clock between the
+        phases and recording the times in self._profiler.
 
-    def draw(self, view):
+        Parameter input: Allows functionality with user input
+        Precondition: input is an instance of GInput (inherited from GameApp)
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        clock = time.perf_counter
+        t0 = clock()
+        self._gameOver()
+        t1 = clock()
+        self._changeShip(input)
+        t2 = clock()
+        self._changeAlien(dt)
+        t3 = clock()
+        self._verticalMove()
+        t4 = clock()
+        self._createBolt(input)
+        t5 = clock()
+        self._changeBolt()
+        t6 = clock()
+        self._removeBolt()
+        t7 = clock()
+        self._oneBolt()
+        t8 = clock()
+        if self._stepaccum == 0:
+            self._chooseAlien()
+        t9 = clock()
+        self._alienBolt()
+        t10 = clock()
+        self._collision()
+        t11 = clock()
+        self._profiler.recordFrame((t0,t1,t2,t3,t4,t5,t6,t7,t8,t9,t10,t11),
+        self._formation.getAliveCount(),len(self._bolts))
+        if self._observation is not None:
+            self._writeObservation()
+        if self._feed is not None:
+            self._feed.addFrame(self,self._formation,self._ship)
+        if STRICT:
+            self.checkInvariants()
+
+    def draw(self,view,alpha=1.0):
         """
         Draws a single frame of the wave object.
 
+        When the wave is updated with a fixed time step, the screen is usually
+        drawn part of the way between two updates. alpha says how far: the
+        aliens, the ship and the bolts are drawn that far along the way from
+        where they were before the last update to where they are now.
+
         Attribute view: the game view, used in drawing
         Invariant: view is an instance of GView (inherited from GameApp)
+
+        Parameter alpha: how far to draw between the last two updates
+        Precondition: alpha is a float between 0 and 1; 1 draws the wave as
+        it is now
         """
-        for row in self._aliens:
-            for alien in row:
-                if alien is not None:
-                    alien.draw(view)
+        if self._alienBatches is None:
+            self._alienBatches = [SpriteBatch(source,self._config.getAlienWidth(),
+            self._config.getAlienHeight()) for source in ALIEN_IMAGES]
+            self._boltBatch = SpriteBatch(None,BOLT_WIDTH,BOLT_HEIGHT,'black')
+            self._shipBatch = SpriteBatch(SHIP_IMAGE,SHIP_WIDTH,SHIP_HEIGHT)
+        back = 1.0-alpha
+        formation = self._formation
+        dx = (self._prevX-formation.getX())*back
+        dy = (self._prevY-formation.getY())*back
+        for batch in self._alienBatches:
+            batch.begin()
+        for row in range(len(self._aliens)):
+            batch = self._alienBatches[(row//2) % len(ALIEN_IMAGES)]
+            y = formation.getRowY(row)+dy
+            aliens = self._aliens[row]
+            for col in range(len(aliens)):
+                if aliens[col] is not None:
+                    batch.add(formation.getColumnX(col)+dx,y)
+        for batch in self._alienBatches:
+            batch.draw(view)
+        self._shipBatch.begin()
         if self._ship is not None:
-            self._ship.draw(view)
+            x = self._ship.getX()
+            if self._prevShipX is not None:
+                x += (self._prevShipX-x)*back
+            self._shipBatch.add(x,self._ship.getY())
+        self._shipBatch.draw(view)
         self._dline.draw(view)
+        self._boltBatch.begin()
         for bolt in self._bolts:
-            bolt.draw(view)
+            y = bolt.getY()
+            self._boltBatch.add(bolt.getX(),y+(bolt.getPrevY()-y)*back)
+        self._boltBatch.draw(view)
+
+    def checkInvariants(self):
+        """
+        Asserts every invariant in the class comments of Wave, along with the
+        position of every model on screen.
+
+        In strict mode (see contracts.py) this is called at the end of every
+        update. It takes time proportional to the number of aliens.
+        """
+        assert self._ship is None or isinstance(self._ship,Ship),\
+        repr(self._ship)+' is not a ship'
+        if self._ship is not None:
+            # _changeShip stops the ship one step after it reaches the edge
+            assert (self._ship.getX() >= SHIP_WIDTH/2-SHIP_MOVEMENT and
+            self._ship.getX() <= GAME_WIDTH-SHIP_WIDTH/2+SHIP_MOVEMENT),\
+            repr(self._ship.getX())+' is off the screen'
+        rows = self._config.getRows()
+        cols = self._config.getAliensInRow()
+        width = self._config.getAlienWidth()
+        assert len(self._aliens) == rows,'the wave does not have '+\
+        repr(rows)+' rows'
+        self._formation.checkInvariants()
+        for row in range(rows):
+            assert len(self._aliens[row]) == cols,repr(row)+\
+            ' does not have '+repr(cols)+' aliens'
+            for col in range(cols):
+                alien = self._aliens[row][col]
+                assert alien is None or isinstance(alien,Alien),repr(alien)+\
+                ' is not an alien'
+                assert self._formation.isAlive(row,col) == (alien is not None),\
+                repr((row,col))+' does not match the formation'
+        left = self._formation.getLeftColumn()
+        if left is not None:
+            assert (self._formation.getColumnX(left) >= width/2 and
+            self._formation.getColumnX(self._formation.getRightColumn()) <=
+            GAME_WIDTH-width/2),'the wave is off the screen'
+        for bolt in self._bolts:
+            assert isinstance(bolt,Bolt),repr(bolt)+' is not a bolt'
+            assert (bolt.getY() >= -BOLT_MARGIN and
+            bolt.getY() <= GAME_HEIGHT+BOLT_MARGIN),repr(bolt.getY())+\
+            ' is off the screen'
+        pool = set(map(id,self._boltPool))
+        assert not any(id(bolt) in pool for bolt in self._bolts),\
+        'a bolt is both on screen and in the pool'
+        assert type(self._lives) == int and self._lives >= 0,repr(self._lives)+\
+        ' is not a valid number of lives'
+        assert type(self._score) == int and self._score >= 0,repr(self._score)+\
+        ' is not a valid score'
+        assert (isNumber(self._time) and self._time >= 0 and
+        self._time < self._config.getSpeed()),repr(self._time)+\
+        ' is not a valid time'
+        assert self._direction in ('left','right'),repr(self._direction)+\
+        ' is not a direction'
+        assert type(self._newBolt) == bool,repr(self._newBolt)+' is not a bool'
+        assert type(self._isPaused) == bool,repr(self._isPaused)+' is not a bool'
+        assert type(self._gameDone) == bool,repr(self._gameDone)+' is not a bool'
+        assert self._gameWon in (None,True,False),repr(self._gameWon)+\
+        ' is not a valid result'
+        assert type(self._stepaccum) == int and self._stepaccum >= 0,\
+        repr(self._stepaccum)+' is not a valid step count'
+        assert type(self._alienRate) == int and 1 <= self._alienRate <= BOLT_RATE,\
+        repr(self._alienRate)+' is not a valid rate'
+        assert (self._shooter is None) == (self._shooterCell is None),\
+        'the shooter does not match its cell'
+        assert self._shooter is None or isinstance(self._shooter,Alien),\
+        repr(self._shooter)+' is not an alien'
 
     def _gameOver(self):
         """
@@ -255,27 +658,178 @@ class Wave(object):
         line or if the player runs out of lives. The player wins the game if they
         destroy all of the aliens on the screen.
         """
-        aliencount = 0
-        for row in range(ALIEN_ROWS):
-            for alien in range(ALIENS_IN_ROW):
-                if self._aliens[row][alien] is None:
-                    aliencount+= 1
-                if self._aliens[row][alien] is not None and self._aliens[row][alien].getY()-ALIEN_HEIGHT/2 <= DEFENSE_LINE:
-                    self._gameDone = True
-                    self._gameWon = False
+        bottom = self._formation.getBottomRow()
+        if (bottom is not None and self._formation.getRowY(bottom)-
+        self._config.getAlienHeight()/2 <= DEFENSE_LINE):
+            self._gameDone = True
+            self._gameWon = False
         if self._lives == 0:
             self._gameDone = True
             self._gameWon = False
-        elif aliencount == ALIEN_ROWS*ALIENS_IN_ROW:
+        elif self._formation.getAliveCount() == 0:
             self._gameDone = True
             self._gameWon = True
 
     def createShip(self):
         """
-        Creates a ship object with the necessary constants
+        Puts the ship back at the center of the screen, reusing the ship object
         """
-        self._ship = Ship(GAME_WIDTH/2,SHIP_BOTTOM+SHIP_HEIGHT/2,
-        SHIP_WIDTH,SHIP_HEIGHT,SHIP_IMAGE)
+        self._ship = self._spareShip
+        self._ship.setX(GAME_WIDTH/2)
+        if self._observation is not None:
+            self._writeObservation()
+
+    def saveState(self):
+        """
+        Returns the complete state of this wave as a compact savestate.
+
+        The savestate holds the ship, which aliens are left and their scores,
+        where the formation is, the bolts and their velocities, the timers and
+        counters, the shooter, lives, score and the state of the random number
+        generator. loadState on a Wave of the same GameConfig turns it back
+        into this exact game. A savestate of the largest wave is about 3 KB.
+        """
+        flags = ((self._ship is not None) | (self._direction == 'right') << 1 |
+        self._newBolt << 2 | self._isPaused << 3 | self._gameDone << 4 |
+        (self._shooter is not None) << 5 | (self._gameWon is not None) << 6 |
+        (self._gameWon == True) << 7)
+        version,words,gauss = self._rng.getstate()
+        shipX = self._ship.getX() if self._ship is not None else 0
+        shooterX = shooterY = 0
+        shooterRow = shooterCol = -1
+        if self._shooter is not None:
+            row,col = self._shooterCell
+            if self._aliens[row][col] is self._shooter:
+                shooterRow = row
+                shooterCol = col
+                self._placeAlien(row,col)
+            shooterX = self._shooter.getX()
+            shooterY = self._shooter.getY()
+        live = self._formation.getLiveColumns()
+
+        rows = self._config.getRows()
+        cols = self._config.getAliensInRow()
+        alive = bytearray((rows*cols+7)//8)
+        scores = []
+        for row in range(rows):
+            for col in range(cols):
+                alien = self._aliens[row][col]
+                if alien is not None:
+                    cell = row*cols+col
+                    alive[cell >> 3] |= 1 << (cell & 7)
+                    scores.append(alien.getScore())
+        bolts = []
+        for bolt in self._bolts:
+            bolts.extend((bolt.getX(),bolt.getY(),bolt.getVelocity()))
+
+        return b''.join((SAVE_HEADER.pack(SAVE_MAGIC,SAVE_VERSION,rows,
+        cols,self._seed,flags,gauss is not None,shipX,
+        self._formation.getX(),self._formation.getY(),self._time,shooterRow,
+        shooterCol,shooterX,shooterY,self._stepaccum,self._alienRate,
+        self._lives,self._score,len(self._bolts),len(live),
+        gauss if gauss is not None else 0.0),bytes(alive),
+        struct.pack('<%dH' % len(scores),*scores),
+        struct.pack('<%dH' % len(live),*live),
+        struct.pack('<%dd' % len(bolts),*bolts),
+        struct.pack('<%dI' % SAVE_RNG_WORDS,*words)))
+
+    def loadState(self,data):
+        """
+        Puts this wave in the state stored in a savestate, in place.
+
+        The aliens and bolts this wave already has are reused where possible,
+        so loading is about as fast as saving. This raises ValueError if data
+        is not a savestate of a wave of this size. The savestate must come from
+        a wave with the same GameConfig as this one.
+
+        Parameter data: the savestate to load
+        Precondition: data is a bytes-like object made by saveState
+        """
+        if len(data) < SAVE_HEADER.size:
+            raise ValueError('savestate is too short')
+        (magic,version,rows,cols,seed,flags,hasGauss,shipX,formX,formY,time,
+        shooterRow,shooterCol,shooterX,shooterY,stepaccum,alienRate,lives,score,
+        boltCount,liveCount,gauss) = SAVE_HEADER.unpack_from(data)
+        if magic != SAVE_MAGIC:
+            raise ValueError('not a savestate')
+        if version != SAVE_VERSION:
+            raise ValueError('savestate version '+str(version)+' is not supported')
+        if rows != self._config.getRows() or cols != self._config.getAliensInRow():
+            raise ValueError('savestate is for a '+str(rows)+' by '+str(cols)+
+            ' wave')
+        pos = SAVE_HEADER.size
+        alive = data[pos:pos+(rows*cols+7)//8]
+        pos += len(alive)
+        count = sum(bin(byte).count('1') for byte in alive)
+        if len(data) != pos+2*count+2*liveCount+24*boltCount+4*SAVE_RNG_WORDS:
+            raise ValueError('savestate has the wrong length')
+        scores = struct.unpack_from('<%dH' % count,data,pos)
+        pos += 2*count
+        live = struct.unpack_from('<%dH' % liveCount,data,pos)
+        pos += 2*liveCount
+        bolts = struct.unpack_from('<%dd' % (3*boltCount),data,pos)
+        pos += 24*boltCount
+        words = struct.unpack_from('<%dI' % SAVE_RNG_WORDS,data,pos)
+
+        self._formation.reset(formX,formY)
+        index = 0
+        for row in range(rows):
+            for col in range(cols):
+                cell = row*cols+col
+                alien = self._aliens[row][col]
+                if alive[cell >> 3] >> (cell & 7) & 1:
+                    if alien is None:
+                        alien = self._aliens[row][col] = self._allAliens[row][col]
+                    if alien.getScore() != scores[index]:
+                        self._aliens[row][col] = Alien(
+                        self._formation.getColumnX(col),self._formation.getRowY(row),
+                        self._config,ALIEN_IMAGES[(row//2) % len(ALIEN_IMAGES)],scores[index])
+                    index += 1
+                else:
+                    self._aliens[row][col] = None
+                    self._formation.kill(row,col)
+        self._formation.setLiveColumns(live)
+
+        if flags & 1:
+            if self._ship is None:
+                self.createShip()
+            self._ship.setX(shipX)
+        else:
+            self._ship = None
+        self._boltPool.extend(self._bolts)
+        self._bolts = []
+        for index in range(0,len(bolts),3):
+            self._bolts.append(self._fireBolt(bolts[index],bolts[index+1],
+            bolts[index+2]))
+
+        if not flags & 32:
+            self._shooter = None
+            self._shooterCell = None
+        elif shooterRow >= 0:
+            self._shooter = self._aliens[shooterRow][shooterCol]
+            self._shooterCell = (shooterRow,shooterCol)
+        else:
+            self._shooter = Alien(shooterX,shooterY,self._config,ALIEN_IMAGES[0],0)
+            self._shooterCell = (0,0)
+        self._seed = seed
+        self._rng.setstate((3,words,gauss if hasGauss else None))
+        self._direction = 'right' if flags & 2 else 'left'
+        self._newBolt = bool(flags & 4)
+        self._isPaused = bool(flags & 8)
+        self._gameDone = bool(flags & 16)
+        self._gameWon = bool(flags & 128) if flags & 64 else None
+        self._time = time
+        self._stepaccum = stepaccum
+        self._alienRate = alienRate
+        self._lives = lives
+        self._score = score
+        self._prevX = self._formation.getX()
+        self._prevY = self._formation.getY()
+        self._prevShipX = self._ship.getX() if self._ship is not None else None
+        if self._observation is not None:
+            self._writeObservation(True)
+        if self._feed is not None:
+            self._feed.reset(self,self._formation,self._ship,self._bolts)
 
     def _collision(self):
         """
@@ -285,24 +839,68 @@ class Wave(object):
         it becomes a None value). If the ship is hit by an alien bolt, the player
         loses a life.
         """
-        for row in range(ALIEN_ROWS):
-            for alien in range(ALIENS_IN_ROW):
-                for bolt in range(len(self._bolts)):
-                    if self._aliens[row][alien] is not None:
-                        if self._aliens[row][alien].collides(self._bolts[bolt]):
-                            self._score += self._aliens[row][alien].getScore()
-                            self._aliens[row][alien] = None
-                            del self._bolts[bolt]
-                            self._newBolt = True
-        for bolt in range(len(self._bolts)):
-            if self._ship is not None:
-                if self._ship.collides(self._bolts[bolt]):
-                    self._ship = None
-                    del self._bolts[bolt]
-                    self._newBolt = True
-                    self._lives -= 1
-                    if self._lives >= 1:
-                        self._isPaused = True
+        kept = 0
+        for bolt in self._bolts:
+            if bolt.isPlayerBolt():
+                hit = self._alienCollision(bolt)
+            else:
+                hit = self._shipCollision(bolt)
+            if hit:
+                self._boltPool.append(bolt)
+                self._newBolt = True
+                if self._feed is not None:
+                    self._feed.remove(bolt)
+            else:
+                self._bolts[kept] = bolt
+                kept += 1
+        del self._bolts[kept:]
+
+    def _alienCollision(self,bolt):
+        """
+        Returns True if the player bolt hit an alien, removing the alien and
+        adding its score.
+
+        Only the cells of the formation that the bolt swept over in its last
+        move are tested, so this takes the same time no matter how many aliens
+        there are. The cells are tested from the bottom row up, so the bolt
+        hits the first alien in its way.
+
+        Parameter bolt: The player bolt to check
+        Precondition: bolt is a Bolt object
+        """
+        x = bolt.getX()
+        rows = self._formation.getRowSpan(*bolt.getSweep())
+        cols = self._formation.getColumnSpan(x-BOLT_WIDTH/2,x+BOLT_WIDTH/2)
+        for row in rows:
+            for col in cols:
+                alien = self._aliens[row][col]
+                if alien is not None and self._placeAlien(row,col).collides(bolt):
+                    self._score += alien.getScore()
+                    self._aliens[row][col] = None
+                    self._formation.kill(row,col)
+                    if self._observation is not None:
+                        self._observation.getAlive()[
+                        row*self._config.getAliensInRow()+col] = 0
+                    if self._feed is not None:
+                        self._feed.kill(row,col)
+                    return True
+        return False
+
+    def _shipCollision(self,bolt):
+        """
+        Returns True if the alien bolt hit the ship, destroying the ship and
+        taking a life. If the player has lives left, the game is paused.
+
+        Parameter bolt: The alien bolt to check
+        Precondition: bolt is a Bolt object
+        """
+        if self._ship is not None and self._ship.collides(bolt):
+            self._ship = None
+            self._lives -= 1
+            if self._lives >= 1:
+                self._isPaused = True
+            return True
+        return False
 
     def _changeBolt(self):
         """
@@ -310,10 +908,7 @@ class Wave(object):
         directions.
         """
         for bolt in self._bolts:
-            if bolt.isPlayerBolt()==True:
-                bolt.setY(bolt.getY()+BOLT_SPEED)
-            else:
-                bolt.setY(bolt.getY()-BOLT_SPEED)
+            bolt.move()
 
     def _changeShip(self,input):
         """
@@ -344,95 +939,68 @@ class Wave(object):
     def _changeAlien(self, dt):
         """
         A method to move the alien wave either to the right or the left by the
-        amount ALIEN_H_WALK.
+        horizontal walk of the GameConfig, once every speed seconds.
+
+        Only the formation is moved, so a step takes the same time however many
+        aliens there are. The time past the speed is kept for the next step,
+        so the march does not slow down when dt does not divide the speed.
+        More than one step's worth is dropped, so one very long frame never
+        makes the aliens step on many frames in a row.
 
         Parameter dt: The time in seconds since last update
         Precondition: dt is a number (int or float)
         """
+        speed = self._config.getSpeed()
         self._time += dt
-        if self._time >= ALIEN_SPEED:
-            for row in range(ALIEN_ROWS):
-                for alien in range(ALIENS_IN_ROW):
-                    alienvar = self._aliens[row][alien]
-                    if self._direction == 'right' and alienvar is not None:
-                        alienvar.setX(alienvar.getX()+ALIEN_H_WALK)
-                    elif self._direction == 'left' and alienvar is not None:
-                        alienvar.setX(alienvar.getX()-ALIEN_H_WALK)
+        if self._time >= speed:
+            if self._direction == 'right':
+                self._formation.move(self._config.getHWalk(),0)
+            else:
+                self._formation.move(-self._config.getHWalk(),0)
             self._stepaccum += 1
-            self._time = 0
+            self._time = (self._time-speed) % speed
 
     def _verticalMove(self):
         """
-        A method to move the alien wave down ALIEN_V_WALK when it reaches the edge
+        A method to move the alien wave down its vertical walk when it reaches the edge
         of the screen. It checks whether or not the furthest alien on the left
         or right is too close to move the aliens
         """
+        config = self._config
         leftAlien = self._verticalMoveHelperLeft()
         rightAlien = self._verticalMoveHelperRight()
         if rightAlien is not None and leftAlien is not None:
-            rightBoundary = GAME_WIDTH-rightAlien.getX()-ALIEN_WIDTH//2
-            leftBoundary = leftAlien.getX()-ALIEN_WIDTH//2
-
-        if rightAlien is not None and ALIEN_H_SEP > rightBoundary:
-            for row in range(ALIEN_ROWS):
-                for alien in range(ALIENS_IN_ROW):
-                    alienvar = self._aliens[row][alien]
-                    if self._aliens[row][alien] is not None:
-                        alienvar.setY(alienvar.getY()-ALIEN_V_WALK)
-                        alienvar.setX(alienvar.getX()-ALIEN_H_WALK)
+            rightBoundary = GAME_WIDTH-rightAlien-config.getAlienWidth()//2
+            leftBoundary = leftAlien-config.getAlienWidth()//2
+
+        if rightAlien is not None and config.getHSep() > rightBoundary:
+            self._formation.move(-config.getHWalk(),-config.getVWalk())
             self._direction = 'left'
-        if leftAlien is not None and leftBoundary < ALIEN_H_SEP:
-            for row in range(ALIEN_ROWS):
-                for alien in range(ALIENS_IN_ROW):
-                    alienvar = self._aliens[row][alien]
-                    if self._aliens[row][alien] is not None:
-                        alienvar.setY(alienvar.getY()-ALIEN_V_WALK)
-                        alienvar.setX(alienvar.getX()+ALIEN_H_WALK)
+        if leftAlien is not None and leftBoundary < config.getHSep():
+            self._formation.move(config.getHWalk(),-config.getVWalk())
             self._direction = 'right'
 
     def _verticalMoveHelperRight(self):
         """
-        A helper method to find the most right column in the alien wave that still
-        has an alien.
-        """
-        rightcolumn = ALIENS_IN_ROW-1
-        rightrow = ALIEN_ROWS-1
-        flag1 = False
-        while not flag1:
-            if self._aliens[rightrow][rightcolumn] is not None:
-                rightAlien = self._aliens[rightrow][rightcolumn]
-                flag1 = True
-            elif rightcolumn == 0 and rightrow == 0:
-                rightAlien = None
-                flag1 = True
-            elif rightrow == 0:
-                rightcolumn -= 1
-                rightrow = ALIEN_ROWS-1
-            else:
-                rightrow -= 1
-        return rightAlien
+        A helper method to find the horizontal coordinate of the most right
+        column in the alien wave that still has an alien. Returns None if there
+        are no aliens left.
+        """
+        column = self._formation.getRightColumn()
+        if column is None:
+            return None
+        return self._formation.getColumnX(column)
 
     def _verticalMoveHelperLeft(self):
         """
-        A helper method to find the most right column in the alien wave that still
-        has an alien.
-        """
-        leftcolumn = 0
-        leftrow = ALIEN_ROWS-1
-        flag2 = False
-        while not flag2:
-            if self._aliens[leftrow][leftcolumn] is not None:
-                leftAlien = self._aliens[leftrow][leftcolumn]
-                flag2 = True
-            elif leftcolumn == ALIENS_IN_ROW-1 and leftrow == 0:
-                leftAlien = None
-                flag2 = True
-            elif leftrow == 0:
-                leftcolumn += 1
-                leftrow = ALIEN_ROWS-1
-            else:
-                leftrow -= 1
-        return leftAlien
+        A helper method to find the horizontal coordinate of the most left
+        column in the alien wave that still has an alien. Returns None if there
+        are no aliens left.
+        """
+        column = self._formation.getLeftColumn()
+        if column is None:
+            return None
+        return self._formation.getColumnX(column)
 
     def _createBolt(self,input):
         """
@@ -446,29 +1014,23 @@ class Wave(object):
             xbolt = self._ship.getX()
             ybolt = self._ship.getY()+SHIP_HEIGHT/2+BOLT_HEIGHT/2
             if input.is_key_down('up') and self._newBolt == True:
-                self._bolts.append(Bolt(xbolt,ybolt,BOLT_WIDTH,
-                BOLT_HEIGHT,BOLT_SPEED))
+                self._bolts.append(self._fireBolt(xbolt,ybolt,BOLT_SPEED))
 
         return self._bolts
 
     def _chooseAlien(self):
         """
         This method determines a random column of aliens to fire a bolt as well
-        as the lowest alien in that random column to fire. It makes sure that
-        a None value Alien doesn't fire and crash the program.
-        """
-        flag = False
-        while flag == False:
-            noneind = 0
-            column = random.randint(0,ALIENS_IN_ROW-1)
-            for row in range(ALIEN_ROWS):
-                if self._aliens[row][column] is None:
-                    noneind += 1
-            if ALIEN_ROWS != noneind:
-                flag = True
-        for row in range(ALIEN_ROWS-1,-1,-1):
-            if self._aliens[row][column] is not None:
-                self._shooter=self._aliens[row][column]
+        as the lowest alien in that random column to fire. It only picks from
+        the columns that still have aliens, so a None value Alien never fires.
+        If there are no aliens left, the shooter does not change.
+        """
+        count = self._formation.getLiveColumnCount()
+        if count > 0:
+            column = self._formation.getLiveColumn(self._rng.randint(0,count-1))
+            row = self._formation.getColumnBottom(column)
+            self._shooter = self._aliens[row][column]
+            self._shooterCell = (row,column)
 
     def _alienBolt(self):
         """
@@ -477,13 +1039,21 @@ class Wave(object):
         it from a ship bolt and then appends the newly created bolt to self._bolts.
         It also resets self._stepaccum to make sure there is a delay between
         the next alien firing.
+
+        If no alien has been chosen yet, because the first frame was already an
+        alien step, one is chosen now.
         """
         if self._stepaccum == self._alienRate:
-            boltYCoor = self._shooter.getY()-ALIEN_HEIGHT//2
-            self._bolts.append(Bolt(self._shooter.getX(),boltYCoor,BOLT_WIDTH,
-            BOLT_HEIGHT,-BOLT_SPEED))
+            if self._shooter is None:
+                self._chooseAlien()
+            row,col = self._shooterCell
+            if self._aliens[row][col] is self._shooter:
+                self._placeAlien(row,col)
+            boltYCoor = self._shooter.getY()-self._config.getAlienHeight()//2
+            self._bolts.append(self._fireBolt(self._shooter.getX(),boltYCoor,
+            -BOLT_SPEED))
             self._stepaccum = 0
-            self._alienRate = random.randint(1,BOLT_RATE)
+            self._alienRate = self._rng.randint(1,BOLT_RATE)
 
     def _oneBolt(self):
         """
@@ -499,17 +1069,113 @@ class Wave(object):
         """
         Removes bolts from the screen once they are out of bounds. For player bolts,
         it then allows the player to fire another bolt.
+
+        The bolts that stay are moved to the front of self._bolts in a single
+        pass, and the removed bolts go back to self._boltPool to be fired again.
         """
-        boltPos = []
-        for bolt in range(len(self._bolts)):
-            if self._bolts[bolt].getY()-BOLT_HEIGHT/2 >= GAME_HEIGHT:
-                if self._bolts[bolt].isPlayerBolt():
+        kept = 0
+        for bolt in self._bolts:
+            if bolt.getY()-BOLT_HEIGHT/2 >= GAME_HEIGHT:
+                if bolt.isPlayerBolt():
                     self._newBolt = True
-                boltPos.append(bolt)
-            elif self._bolts[bolt].getY()+BOLT_HEIGHT/2 <= 0:
-                boltPos.append(bolt)
-        for pos in boltPos:
-            del self._bolts[pos]
+                self._boltPool.append(bolt)
+                if self._feed is not None:
+                    self._feed.remove(bolt)
+            elif bolt.getY()+BOLT_HEIGHT/2 <= 0:
+                self._boltPool.append(bolt)
+                if self._feed is not None:
+                    self._feed.remove(bolt)
+            else:
+                self._bolts[kept] = bolt
+                kept += 1
+        del self._bolts[kept:]
+
+    def _fireBolt(self,x,y,velocity):
+        """
+        Returns a bolt at (x,y) with the given velocity, reusing a bolt from
+        self._boltPool if there is one.
+
+        Parameter x: the horizontal coordinate of the bolt center
+        Precondition: x is a float or int in between BOLT_WIDTH/2 and
+        GAME_WIDTH-BOLT_WIDTH/2
+
+        Parameter y: the vertical coordinate of the bolt center
+        Precondition: y is a float or int in between -BOLT_MARGIN and
+        GAME_HEIGHT+BOLT_MARGIN
+
+        Parameter velocity: the velocity of the bolt, > 0 for a player bolt
+        Precondition: velocity is an int or float
+        """
+        if len(self._boltPool) == 0:
+            bolt = Bolt(x,y,BOLT_WIDTH,BOLT_HEIGHT,velocity)
+        else:
+            bolt = self._boltPool.pop()
+            bolt.fire(x,y,velocity)
+        if self._feed is not None:
+            self._feed.fire(bolt)
+        return bolt
+
+    def _writeObservation(self,full=False):
+        """
+        Writes the state of the wave to self._observation.
+
+        The alive mask is only written if full is True; otherwise the wave
+        clears the cell of each alien as it dies. The sequence number is left
+        even, as the last step of the write.
+
+        Parameter full: whether to write the alive mask too
+        Precondition: full is a bool
+        """
+        observation = self._observation
+        fields = observation.getFields()
+        if int(fields[0]) % 2 == 0:
+            fields[0] += 1
+        if full:
+            alive = observation.getAlive()
+            cols = self._config.getAliensInRow()
+            for row in range(len(self._aliens)):
+                for col in range(cols):
+                    alive[row*cols+col] = self._aliens[row][col] is not None
+        bolts = observation.getBolts()
+        count = min(len(self._bolts),OBS_BOLTS)
+        for pos in range(count):
+            bolt = self._bolts[pos]
+            bolts[OBS_BOLT_SIZE*pos] = bolt.getX()
+            bolts[OBS_BOLT_SIZE*pos+1] = bolt.getY()
+            bolts[OBS_BOLT_SIZE*pos+2] = bolt.getVelocity()
+        ship = self._ship
+        fields[2] = ship.getX() if ship is not None else 0.0
+        fields[3] = ship is not None
+        fields[4] = self._formation.getX()
+        fields[5] = self._formation.getY()
+        fields[6] = 1 if self._direction == 'right' else -1
+        fields[7] = self._lives
+        fields[8] = self._score
+        fields[9] = self._formation.getAliveCount()
+        fields[10] = count
+        fields[11] = self._gameDone
+        fields[12] = -1 if self._gameWon is None else self._gameWon
+        fields[0] += 1
+
+    def _placeAlien(self,row,col):
+        """
+        Moves the alien in the given cell to where the formation says it is,
+        and returns it.
+
+        A destroyed alien is never placed again, so it keeps the position it
+        was destroyed at.
+
+        Parameter row: the row of the alien
+        Precondition: row is an int in 0..rows-1 of the GameConfig
+
+        Parameter col: the column of the alien
+        Precondition: col is an int in 0..aliens in a row-1, and the cell holds
+        an Alien
+        """
+        alien = self._aliens[row][col]
+        alien.setX(self._formation.getColumnX(col))
+        alien.setY(self._formation.getRowY(row))
+        return alien
 
     def _createAliens(self,row,col):
         """
@@ -517,19 +1183,23 @@ class Wave(object):
         self._aliens in the wave object.
 
         Parameter: row is the amount of aliens in a rows
-        Precondition: row is an integer equal to ALIENS_IN_ROW
+        Precondition: row is an integer equal to the aliens in a row of the
+        GameConfig
 
         Parameter; col is the amount of alien rows
-        Precondition: col is an integer equal to ALIEN_ROWS
+        Precondition: col is an integer equal to the rows of the GameConfig
         """
-        assert type(row) == int and row == ALIENS_IN_ROW,repr(row)+ 'is not a '+\
+        config = self._config
+        assert type(row) == int and row == config.getAliensInRow(),repr(row)+ 'is not a '+\
         'valid type and does not equal the correct constant'
-        assert type(col) == int and col == ALIEN_ROWS,repr(col)+' is not a valid type '+\
+        assert type(col) == int and col == config.getRows(),repr(col)+' is not a valid type '+\
         ' and does not equal the correct constant'
+        width = config.getAlienWidth()
+        height = config.getAlienHeight()
         accum = []
-        noSpace=ALIEN_ROWS-0.5
+        noSpace=col-0.5
 
-        bottom = ALIEN_CEILING+ALIEN_HEIGHT*(noSpace)+ALIEN_V_SEP*(ALIEN_ROWS-1)
+        bottom = ALIEN_CEILING+height*(noSpace)+config.getVSep()*(col-1)
         bottombegin = GAME_HEIGHT-bottom
         rowcounter = 0
         alienimage = 0
@@ -537,12 +1207,12 @@ class Wave(object):
             variable = []
             if alienimage == len(ALIEN_IMAGES):
                 alienimage = 0
-            leftbegin = ALIEN_H_SEP+ALIEN_WIDTH//2
+            leftbegin = config.getHSep()+width//2
             for alien in range(0,row):
-                variable.append(Alien(leftbegin,bottombegin,ALIEN_WIDTH,
-                ALIEN_HEIGHT,ALIEN_IMAGES[alienimage],self._setAlienScore(col)))
-                leftbegin +=ALIEN_H_SEP+ALIEN_WIDTH
-            bottombegin +=ALIEN_V_SEP+ALIEN_HEIGHT
+                variable.append(Alien(leftbegin,bottombegin,config,
+                ALIEN_IMAGES[alienimage],self._setAlienScore(col)))
+                leftbegin +=config.getHSep()+width
+            bottombegin +=config.getVSep()+height
             rowcounter += 1
             if rowcounter == 2:
                 rowcounter =0
@@ -556,9 +1226,9 @@ class Wave(object):
         alien, the score value should increase by 20 points.
 
         Parameter: row is the row to which assign a score to
-        Precondition: row is an int >= 0 and <= to ALIEN_ROWS
+        Precondition: row is an int >= 0 and <= to the rows of the GameConfig
         """
-        assert type(row) == int and row >= 0 and row <= ALIEN_ROWS,repr(row)+\
+        assert type(row) == int and row >= 0 and row <= self._config.getRows(),repr(row)+\
         ' is not a valid type or valid row'
         isEven = None
         score = 20